@@ -0,0 +1,476 @@
+"""
+Micro-benchmarks for the backend's hot paths, with JSON baselines.
+
+Benchmarks:
+    image.*        save_base64_image on a 1024x1024 PNG (decode, transcode, both)
+    cleanup.*      cleanup_old_images over 10k and 100k files (scan, and purge of 10% expired)
+    checkpoint.*   AsyncSqliteSaver and the tuned checkpointer (with and without a reader pool),
+                   put/get one at a time and under concurrency
+    mcp.*          MCPClient tool round-trip to the real MCP server subprocess
+    prompt.*       load_system_prompt time and system prompt / assembled prompt size
+    route.*        /health and /chat through the full middleware stack (stubbed chatbot)
+
+Every metric is lower-is-better. `compare` flags gated metrics (medians, mean
+checkpoint read/write times, prompt sizes) that got worse by more than the
+threshold, and exits non-zero if any did. It refuses (exit 2) runs with a
+different `--quick` setting or workload size unless given `--force`, and warns
+when the CPU count or Python version differs.
+
+Usage:
+    python backend/benchmarks/bench_hot_paths.py run --output backend/benchmarks/baselines/local.json
+    python backend/benchmarks/bench_hot_paths.py run --only image cleanup --baseline backend/benchmarks/baselines/local.json
+    python backend/benchmarks/bench_hot_paths.py compare baseline.json current.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import base64
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SRC_DIR = BENCH_DIR.parent / "src"
+sys.path.append(str(SRC_DIR))
+
+# Configuration is read at import time: keep the app quiet and out of the real data directory
+_DATA_DIR = tempfile.mkdtemp(prefix="bench-data-")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CHAT_DATA_DIR", _DATA_DIR)
+
+# Metrics `compare` gates on; the rest are reported for context
+GATED_METRICS = ("median_ms", "read_mean_ms", "write_mean_ms", "chars", "approx_tokens")
+# Result fields that size the workload: runs that differ in them measured different things
+WORKLOAD_FIELDS = ("turns", "concurrency", "files", "input_kb", "messages")
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str, quick: bool = True):
+    """Register a benchmark. `quick=False` ones are skipped by `run --quick`."""
+    def decorator(func):
+        BENCHMARKS[name] = (func, quick)
+        return func
+    return decorator
+
+
+def summarize(samples) -> dict:
+    samples = sorted(samples)
+    return {
+        "median_ms": round(1000 * statistics.median(samples), 4),
+        "p95_ms": round(1000 * samples[min(len(samples) - 1, int(0.95 * len(samples)))], 4),
+        "min_ms": round(1000 * samples[0], 4),
+        "runs": len(samples),
+    }
+
+
+def time_calls(func, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+async def time_async_calls(func, repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        await func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+# --- Images ---
+
+def _flux_like_png() -> str:
+    """A noisy 1024x1024 PNG data URL, about the size of a real generated image."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.effect_noise((1024, 1024), 48).convert("RGB").save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def _image_benchmarks(repeat: int) -> dict:
+    from unittest.mock import patch
+    from PIL import Image
+    import utils.image_utils as image_utils
+
+    data_url = _flux_like_png()
+    encoded = data_url.split(",", 1)[1]
+    raw = base64.b64decode(encoded)
+
+    def transcode():
+        img = Image.open(io.BytesIO(raw))
+        if img.mode in ("RGBA", "P"):
+            img = img.convert("RGB")
+        img.save(io.BytesIO(), "JPEG", quality=85)
+
+    with tempfile.TemporaryDirectory() as images_dir, patch.object(image_utils, "IMAGES_DIR", Path(images_dir)):
+        results = {
+            "image.b64decode": time_calls(lambda: base64.b64decode(encoded), repeat),
+            "image.transcode": time_calls(transcode, repeat),
+            "image.save_base64_image": time_calls(lambda: image_utils.save_base64_image(data_url, "http://localhost"), repeat),
+        }
+    for result in results.values():
+        result["input_kb"] = round(len(raw) / 1024, 1)
+    return results
+
+
+@benchmark("image")
+def bench_images(quick: bool) -> dict:
+    return _image_benchmarks(5 if quick else 20)
+
+
+# --- Image cleanup ---
+
+def _cleanup_benchmark(files: int, repeat: int) -> dict:
+    from unittest.mock import patch
+    import utils.image_utils as image_utils
+
+    label = f"{files // 1000}k"
+    with tempfile.TemporaryDirectory() as images_dir, patch.object(image_utils, "IMAGES_DIR", Path(images_dir)):
+        expired_at = time.time() - 7 * 24 * 3600
+        for i in range(files):
+            path = os.path.join(images_dir, f"{i:07d}.jpg")
+            with open(path, "wb"):
+                pass
+            if i % 10 == 0:
+                os.utime(path, (expired_at, expired_at))
+
+        started = time.perf_counter()
+        image_utils.cleanup_old_images()
+        purge = time.perf_counter() - started
+        remaining = len(os.listdir(images_dir))
+
+        scan = time_calls(image_utils.cleanup_old_images, repeat, warmup=0)
+    return {
+        f"cleanup.scan_{label}": dict(scan, files=remaining),
+        f"cleanup.purge_{label}": dict(summarize([purge]), files=files, deleted=files - remaining),
+    }
+
+
+@benchmark("cleanup.10k")
+def bench_cleanup_10k(quick: bool) -> dict:
+    return _cleanup_benchmark(10_000, 3 if quick else 5)
+
+
+@benchmark("cleanup.100k", quick=False)
+def bench_cleanup_100k(quick: bool) -> dict:
+    return _cleanup_benchmark(100_000, 3)
+
+
+# --- Checkpoints ---
+
+@benchmark("checkpoint")
+def bench_checkpoints(quick: bool) -> dict:
+    from bench_checkpoints import open_baseline, run_workload
+    from utils.checkpoint_storage import PooledSqliteSaver, create_checkpointer
+
+    threads, turns, concurrency = (20, 5, 16) if quick else (50, 20, 16)
+
+    async def run():
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            savers = (
+                ("checkpoint.async_sqlite_saver", open_baseline),
+                ("checkpoint.tuned", create_checkpointer),
+                ("checkpoint.tuned_reader_pool", lambda path: create_checkpointer(path, reader_pool_size=4)),
+            )
+            for name, open_saver in savers:
+                # One at a time gives the cost of a read/write; under concurrency, times also include
+                # queueing for the single writer, which reads from the reader pool no longer share
+                passes = {}
+                for level in (1, concurrency):
+                    saver = await open_saver(os.path.join(tmp, f"{name}-{level}.sqlite"))
+                    try:
+                        passes[level] = await run_workload(saver, threads, turns, level)
+                    finally:
+                        await (saver.aclose() if isinstance(saver, PooledSqliteSaver) else saver.conn.close())
+                results[name] = {
+                    "read_mean_ms": round(passes[1]["read_ms"], 4),
+                    "write_mean_ms": round(passes[1]["write_ms"], 4),
+                    "concurrent_read_ms": round(passes[concurrency]["read_ms"], 4),
+                    "concurrent_write_ms": round(passes[concurrency]["write_ms"], 4),
+                    "seconds": round(passes[concurrency]["seconds"], 4),
+                    "turns": threads * turns,
+                    "concurrency": concurrency,
+                }
+        return results
+
+    return asyncio.run(run())
+
+
+# --- MCP ---
+
+@benchmark("mcp")
+def bench_mcp(quick: bool) -> dict:
+    from utils.mcp_client import MCPClient
+    from utils.tool_cache import ToolResultCache
+
+    repeat = 50 if quick else 300
+    # Without Meta credentials the tool returns at once, so this times the protocol round-trip
+    env = {k: v for k, v in os.environ.items() if k not in ("WHATSAPP_ACCESS_TOKEN", "WHATSAPP_PHONE_NUMBER_ID")}
+
+    async def run():
+        client = MCPClient(command=sys.executable, args=[str(SRC_DIR / "utils" / "mcp_server.py")], env=env, cache=ToolResultCache())
+        started = time.perf_counter()
+        tools = {tool.name: tool for tool in await client.get_tools()}
+        startup = time.perf_counter() - started
+        try:
+            send = tools["send_whatsapp_message"]
+            counter = iter(range(10 ** 9))
+
+            # Invoked as a model tool call; distinct call ids so the idempotency window doesn't answer from cache
+            async def call():
+                n = next(counter)
+                args = {"to_number": "+15550000000", "message_body": f"bench {n}"}
+                await send.ainvoke({"args": args, "name": send.name, "type": "tool_call", "id": f"call_{n}"})
+
+            sequential = await time_async_calls(call, repeat, warmup=3)
+
+            async def burst():
+                await asyncio.gather(*[call() for _ in range(10)])
+            concurrent = await time_async_calls(burst, max(5, repeat // 10))
+        finally:
+            await client.close()
+        return {
+            # Dominated by interpreter start-up, so reported but not gated
+            "mcp.startup": {"ms": round(1000 * startup, 1)},
+            "mcp.tool_round_trip": sequential,
+            "mcp.tool_round_trip_x10_concurrent": concurrent,
+        }
+
+    return asyncio.run(run())
+
+
+# --- Prompt ---
+
+@benchmark("prompt")
+def bench_prompt(quick: bool) -> dict:
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    from agent import load_system_prompt
+
+    load = time_calls(load_system_prompt, 20 if quick else 100)
+    system_message = load_system_prompt()
+
+    # What the model sees on turn 11 of a conversation
+    history = []
+    for i in range(10):
+        history += [HumanMessage(content=f"Question {i} about opening hours and prices?"), AIMessage(content="We are open nine to five. " * 8)]
+    messages = [SystemMessage(content=system_message)] + history + [HumanMessage(content="And on weekends?")]
+    assembled_chars = sum(len(str(m.content)) for m in messages)
+
+    return {
+        "prompt.load_training_data": load,
+        # ~4 characters per token for English text
+        "prompt.system": {"chars": len(system_message), "approx_tokens": len(system_message) // 4},
+        "prompt.turn_11": {"chars": assembled_chars, "approx_tokens": assembled_chars // 4, "messages": len(messages)},
+    }
+
+
+# --- Routes ---
+
+class _StubChatbot:
+    async def chat(self, message: str, thread_id: str = "default") -> str:
+        return "We are open nine to five."
+
+    async def reset_history(self, thread_id: str):
+        pass
+
+
+@benchmark("route")
+def bench_routes(quick: bool) -> dict:
+    import httpx
+    from unittest.mock import patch
+    import app_state
+    from main import app
+
+    repeat = 200 if quick else 2000
+
+    async def run():
+        # ASGITransport skips the lifespan, so no MCP server or databases are started
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def health():
+                response = await client.get("/health")
+                response.raise_for_status()
+
+            async def chat():
+                response = await client.post("/chat", json={"message": "What are your opening hours?", "session_id": "bench"})
+                response.raise_for_status()
+
+            return {
+                "route.health": await time_async_calls(health, repeat, warmup=10),
+                "route.chat": await time_async_calls(chat, repeat, warmup=10),
+            }
+
+    with patch.object(app_state, "chatbot", _StubChatbot()):
+        return asyncio.run(run())
+
+
+# --- Running and comparing ---
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run_benchmarks(patterns, quick: bool) -> dict:
+    results = {}
+    for name, (func, in_quick) in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, p) or name.startswith(p + ".") or name == p for p in patterns):
+            continue
+        if quick and not in_quick and not patterns:
+            continue
+        print(f"running {name} ...", file=sys.stderr)
+        results.update(func(quick))
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def comparability(baseline: dict, current: dict) -> tuple:
+    """(errors, warnings) about differences between two runs that make comparing them misleading.
+
+    Errors are a different `--quick` setting or workload size; warnings are a
+    different machine shape (CPU count, Python version). Older files without a
+    field are not checked for it.
+    """
+    errors, warnings = [], []
+    base_meta, meta = baseline.get("meta", {}), current.get("meta", {})
+    if "quick" in base_meta and "quick" in meta and base_meta["quick"] != meta["quick"]:
+        errors.append(f"--quick differs: baseline quick={base_meta['quick']}, current quick={meta['quick']}")
+    for name, metrics in current["results"].items():
+        base_metrics = baseline["results"].get(name, {})
+        for field in WORKLOAD_FIELDS:
+            if field in metrics and field in base_metrics and metrics[field] != base_metrics[field]:
+                errors.append(f"{name}: {field} differs: baseline {base_metrics[field]}, current {metrics[field]}")
+    for field in ("cpus", "python"):
+        if base_meta.get(field) is not None and meta.get(field) is not None and base_meta[field] != meta[field]:
+            warnings.append(f"{field} differs: baseline {base_meta[field]}, current {meta[field]}")
+    return errors, warnings
+
+
+def check_comparable(baseline: dict, current: dict, force: bool) -> bool:
+    """Print why two runs are not like for like. False when the comparison should be refused."""
+    errors, warnings = comparability(baseline, current)
+    for message in warnings:
+        print(f"warning: {message}", file=sys.stderr)
+    for message in errors:
+        print(f"{'warning' if force else 'error'}: {message}", file=sys.stderr)
+    if errors and not force:
+        print("Runs are not comparable; re-run with matching settings or pass --force", file=sys.stderr)
+        return False
+    return True
+
+
+def compare(baseline: dict, current: dict, threshold: float, min_delta_ms: float) -> list:
+    """Rows of (benchmark, metric, baseline, current, change, status) for metrics in both runs."""
+    rows = []
+    for name, metrics in current["results"].items():
+        base_metrics = baseline["results"].get(name)
+        if base_metrics is None:
+            continue
+        for metric, value in metrics.items():
+            base = base_metrics.get(metric)
+            if metric not in GATED_METRICS or not isinstance(base, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            change = (value - base) / base if base else 0.0
+            status = "ok"
+            if change > threshold and not (metric.endswith("_ms") and value - base < min_delta_ms):
+                status = "REGRESSION"
+            elif change < -threshold:
+                status = "improved"
+            rows.append((name, metric, base, value, change, status))
+    return rows
+
+
+def print_results(report: dict):
+    print(f"{'benchmark':<38} metrics")
+    for name, metrics in report["results"].items():
+        print(f"{name:<38} " + "  ".join(f"{k}={v}" for k, v in metrics.items()))
+
+
+def print_comparison(rows) -> bool:
+    print(f"{'benchmark':<38} {'metric':<14} {'baseline':>12} {'current':>12} {'change':>8}  status")
+    for name, metric, base, value, change, status in rows:
+        print(f"{name:<38} {metric:<14} {base:>12.4g} {value:>12.4g} {change:>+8.1%}  {status}")
+    regressions = [row for row in rows if row[5] == "REGRESSION"]
+    print(f"\n{len(regressions)} regression(s) in {len(rows)} compared metric(s)")
+    return bool(regressions)
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run benchmarks and optionally save/compare the results")
+    run_parser.add_argument("--only", nargs="+", help=f"Benchmarks to run (names or globs): {', '.join(BENCHMARKS)}")
+    run_parser.add_argument("--quick", action="store_true", help="Fewer repetitions; skips cleanup.100k unless named in --only")
+    run_parser.add_argument("--output", help="Write results JSON here (e.g. a new baseline)")
+    run_parser.add_argument("--baseline", help="Compare against this baseline JSON after running")
+
+    compare_parser = sub.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    for p in (run_parser, compare_parser):
+        p.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown/growth flagged as a regression (default 0.2 = 20%%)")
+        p.add_argument("--min-delta-ms", type=float, default=0.05, help="Ignore time changes smaller than this (noise floor)")
+        p.add_argument("--force", action="store_true", help="Compare even if --quick or workload sizes differ")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run_benchmarks(args.only, args.quick)
+        print_results(report)
+        if args.output:
+            Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+                f.write("\n")
+            print(f"\nResults written to {args.output}")
+        if args.baseline:
+            print()
+            baseline = _load(args.baseline)
+            if not check_comparable(baseline, report, args.force):
+                sys.exit(2)
+            sys.exit(1 if print_comparison(compare(baseline, report, args.threshold, args.min_delta_ms)) else 0)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+        if not check_comparable(baseline, current, args.force):
+            sys.exit(2)
+        rows = compare(baseline, current, args.threshold, args.min_delta_ms)
+        sys.exit(1 if print_comparison(rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Local stand-ins for the external services the chatbot calls, for load testing.
+
+One FastAPI app serves:
+    - Azure OpenAI / OpenAI chat completions, with first-token latency plus a
+      tokens-per-second output rate; asks for the generate_image tool when the
+      user message contains "draw"
+    - Azure Whisper transcriptions
+    - the Azure Flux image endpoint (a small base64 JPEG)
+    - Twilio's Messages API and Meta's Graph API (media lookup/download, messages)
+
+Outbound Twilio/Meta sends are recorded per recipient, so the load tester can
+measure each webhook's end-to-end latency (webhook in -> reply sent).
+
+Usage (standalone, to point a separately started app at it):
+    python backend/benchmarks/fake_services.py --port 8765
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from PIL import Image
+
+IMAGE_MARKDOWN_RE = re.compile(r"!\[.*?\]\(.*?\)")
+WORDS = "the quick assistant answers every question about opening hours prices and services".split()
+
+
+def _tiny_jpeg() -> str:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (90, 140, 200)).save(buffer, "JPEG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeServices:
+    """Fake upstream APIs with configurable latency; records outbound sends by recipient."""
+
+    def __init__(self, first_token_ms: float = 300, tokens_per_second: float = 60, output_tokens: int = 60,
+                 jitter: float = 0.2, image_ms: float = 1500, whisper_ms: float = 400, send_ms: float = 80, seed: int = 0):
+        self.first_token_ms = first_token_ms
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.jitter = jitter
+        self.image_ms = image_ms
+        self.whisper_ms = whisper_ms
+        self.send_ms = send_ms
+        self.random = random.Random(seed)
+        self.image_b64 = _tiny_jpeg()
+        # recipient -> [(perf_counter at delivery, text)]
+        self.deliveries: Dict[str, List[Tuple[float, str]]] = {}
+        self.calls: Dict[str, int] = {}
+        self.app = self._build_app()
+
+    async def _delay(self, ms: float):
+        if ms > 0:
+            factor = self.random.lognormvariate(0, self.jitter) if self.jitter else 1.0
+            await asyncio.sleep(ms * factor / 1000)
+
+    def _count(self, name: str):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _deliver(self, to: str, text: str):
+        self.deliveries.setdefault(to, []).append((time.perf_counter(), text or ""))
+
+    async def _chat_completion(self, request: Request):
+        self._count("chat")
+        body = await request.json()
+        messages = body.get("messages", [])
+        last = messages[-1] if messages else {}
+        user_text = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        wants_image = last.get("role") == "user" and "draw" in str(user_text).lower() and body.get("tools")
+
+        if wants_image:
+            await self._delay(self.first_token_ms)
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                "function": {"name": "generate_image", "arguments": json.dumps({"prompt": str(user_text)[:200]})},
+            }]}
+            output_tokens = 20
+        else:
+            output_tokens = self.output_tokens
+            await self._delay(self.first_token_ms + 1000 * output_tokens / self.tokens_per_second)
+            words = [self.random.choice(WORDS) for _ in range(max(1, int(output_tokens * 0.75)))]
+            content = " ".join(words).capitalize() + "."
+            if last.get("role") == "tool":
+                image = IMAGE_MARKDOWN_RE.search(str(last.get("content")))
+                if image:
+                    content = f"{image.group(0)}\n{content}"
+            message = {"role": "assistant", "content": content}
+        input_tokens = sum(len(str(m.get("content") or "")) // 4 for m in messages)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-gpt"),
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if wants_image else "stop"}],
+            "usage": {"prompt_tokens": input_tokens, "completion_tokens": output_tokens, "total_tokens": input_tokens + output_tokens},
+        }
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake upstream services")
+
+        @app.post("/openai/deployments/{deployment}/chat/completions")
+        async def azure_chat(deployment: str, request: Request):
+            return await self._chat_completion(request)
+
+        @app.post("/v1/chat/completions")
+        async def openai_chat(request: Request):
+            return await self._chat_completion(request)
+
+        @app.post("/openai/deployments/{deployment}/audio/transcriptions")
+        async def whisper(deployment: str):
+            self._count("whisper")
+            await self._delay(self.whisper_ms)
+            return {"text": "What are your opening hours?"}
+
+        @app.post("/flux")
+        async def flux():
+            self._count("flux")
+            await self._delay(self.image_ms)
+            return {"data": [{"b64_json": self.image_b64}]}
+
+        @app.post("/2010-04-01/Accounts/{account_sid}/Messages.json")
+        async def twilio_message(account_sid: str, request: Request):
+            self._count("twilio_send")
+            form = await request.form()
+            await self._delay(self.send_ms)
+            self._deliver(form.get("To", ""), form.get("Body", ""))
+            sid = f"SM{uuid.uuid4().hex}"
+            return Response(status_code=201, media_type="application/json", content=json.dumps({
+                "sid": sid, "account_sid": account_sid, "status": "queued", "to": form.get("To"), "from": form.get("From"),
+                "body": form.get("Body"), "num_media": str(len(form.getlist("MediaUrl"))),
+            }))
+
+        @app.get("/media/{media_id}")
+        async def media_download(media_id: str):
+            self._count("media_download")
+            return Response(content=b"OggS" + bytes(2048), media_type="audio/ogg")
+
+        @app.get("/graph/{media_id}")
+        async def graph_media(media_id: str, request: Request):
+            self._count("graph_media")
+            return {"url": f"{str(request.base_url).rstrip('/')}/media/{media_id}"}
+
+        @app.post("/graph/{phone_number_id}/messages")
+        async def graph_message(phone_number_id: str, request: Request):
+            self._count("meta_send")
+            body = await request.json()
+            await self._delay(self.send_ms)
+            self._deliver(body.get("to", ""), body.get("text", {}).get("body", ""))
+            return {"messaging_product": "whatsapp", "messages": [{"id": f"wamid.{uuid.uuid4().hex}"}]}
+
+        return app
+
+    def app_env(self, base_url: str) -> Dict[str, str]:
+        """Environment that points the chatbot at these fakes."""
+        return {
+            "CHAT_MODEL_PROVIDER": "azure",
+            "AZURE_OPENAI_ENDPOINT": base_url,
+            "AZURE_OPENAI_API_KEY": "fake-key",
+            "AZURE_OPENAI_DEPLOYMENT_NAME": "fake-gpt",
+            "AZURE_OPENAI_WHISPER_DEPLOYMENT": "fake-whisper",
+            "AZURE_OPENAI_FLUX_DEPLOYMENT": "fake-flux",
+            "AZURE_OPENAI_FLUX_URL": f"{base_url}/flux",
+            "IMAGE_MODEL_PROVIDER": "azure-flux",
+            "AUDIO_MODEL_PROVIDER": "azure-whisper",
+            "TWILIO_ACCOUNT_SID": "ACfake",
+            "TWILIO_AUTH_TOKEN": "fake",
+            "TWILIO_FROM_NUMBER": "whatsapp:+15550000000",
+            "TWILIO_API_BASE_URL": base_url,
+            "WHATSAPP_ACCESS_TOKEN": "fake",
+            "WHATSAPP_PHONE_NUMBER_ID": "1000",
+            "META_GRAPH_API_URL": f"{base_url}/graph",
+        }
+
+
+class BackgroundServer:
+    """Runs an ASGI app with uvicorn on a daemon thread."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", access_log=False))
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> str:
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Fake services failed to start")
+            time.sleep(0.02)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self.server.should_exit = True
+        if self.thread:
+            self.thread.join(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=60)
+    args = parser.parse_args()
+    fakes = FakeServices(first_token_ms=args.first_token_ms, tokens_per_second=args.tokens_per_second)
+    base_url = f"http://127.0.0.1:{args.port}"
+    print("Start the backend with:")
+    for key, value in fakes.app_env(base_url).items():
+        print(f"  export {key}={value}")
+    uvicorn.run(fakes.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+End-to-end load test of the chatbot API against local fake upstreams.
+
+Starts the fakes from fake_services.py in-process and the real backend
+(`uvicorn main:app`) as a subprocess pointed at them, with its databases in a
+temporary directory. It then drives /chat, /twilio/whatsapp and /meta/whatsapp
+at fixed request rates (open loop: requests go out on schedule whether or not
+earlier ones finished) and reports throughput, latency percentiles and error
+rates.
+
+Webhooks are acknowledged before the agent runs, so for them the report also
+has the end-to-end latency: webhook sent -> reply received by the fake Twilio
+or Meta API.
+
+Each simulated user has at most one message in flight. A scheduled request with
+no idle user is counted as a "no_idle_user" error (the system is falling behind).
+
+Usage:
+    python backend/benchmarks/load_test.py --chat-rps 5 --twilio-rps 2 --meta-rps 2 --duration 30
+    python backend/benchmarks/load_test.py --chat-rps 20 --first-token-ms 800 --image-share 0.1 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from fake_services import BackgroundServer, FakeServices
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+QUESTIONS = [
+    "What are your opening hours?",
+    "How much does a consultation cost?",
+    "Can I book an appointment for next Tuesday?",
+    "Do you offer services on weekends?",
+    "Where are you located and is there parking nearby?",
+]
+IMAGE_REQUEST = "Please draw a picture of a friendly robot receptionist"
+# Replies the agent and routes send when a turn failed or was shed (utils/admission.py BUSY_MESSAGE)
+ERROR_REPLIES = ("I encountered an error", "Sorry, I encountered an error", "I'm handling a lot of messages")
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, `q` in [0, 100]."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))]
+
+
+class ScenarioStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.sent = 0
+        self.ok = 0
+        self.errors: Counter = Counter()
+        self.latencies: List[float] = []
+        self.e2e_latencies: List[float] = []
+
+    def error(self, reason: str):
+        self.errors[reason] += 1
+
+    def summary(self, duration: float) -> dict:
+        def ms(values, q):
+            value = percentile(values, q)
+            return round(value * 1000, 1) if value is not None else None
+
+        failed = sum(self.errors.values())
+        return {
+            "sent": self.sent,
+            "ok": self.ok,
+            "error_rate": round(failed / self.sent, 4) if self.sent else 0.0,
+            "throughput_rps": round(self.ok / duration, 2) if duration else 0.0,
+            "latency_ms": {f"p{q}": ms(self.latencies, q) for q in (50, 95, 99)},
+            "e2e_latency_ms": {f"p{q}": ms(self.e2e_latencies, q) for q in (50, 95, 99)} if self.e2e_latencies else None,
+            "errors": dict(self.errors),
+        }
+
+
+class LoadTester:
+    def __init__(self, client: httpx.AsyncClient, fakes: FakeServices, fake_url: str, users: int,
+                 image_share: float, audio_share: float, reply_timeout: float, seed: int = 0):
+        self.client = client
+        self.fakes = fakes
+        self.fake_url = fake_url
+        self.users = users
+        self.image_share = image_share
+        self.audio_share = audio_share
+        self.reply_timeout = reply_timeout
+        self.random = random.Random(seed)
+        self.stats: Dict[str, ScenarioStats] = {}
+
+    def _message(self) -> str:
+        return IMAGE_REQUEST if self.random.random() < self.image_share else self.random.choice(QUESTIONS)
+
+    async def run(self, scenario: str, rps: float, duration: float, poisson: bool):
+        """Send `rps` requests per second for `duration` seconds, then wait for the stragglers."""
+        stats = self.stats[scenario] = ScenarioStats(scenario)
+        send = getattr(self, f"_{scenario}")
+        idle: asyncio.Queue = asyncio.Queue()
+        for user in range(self.users):
+            idle.put_nowait(user)
+        tasks = []
+
+        async def one(user: int):
+            try:
+                await send(user, stats)
+            except httpx.HTTPError as e:
+                stats.error(type(e).__name__)
+            finally:
+                idle.put_nowait(user)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        next_at = started
+        while next_at < started + duration:
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            stats.sent += 1
+            if idle.empty():
+                stats.error("no_idle_user")
+            else:
+                tasks.append(asyncio.create_task(one(idle.get_nowait())))
+            next_at += self.random.expovariate(rps) if poisson else 1 / rps
+        await asyncio.gather(*tasks)
+
+    async def _wait_for_reply(self, to: str, sent_at: float) -> Optional[Tuple[float, str]]:
+        deadline = time.perf_counter() + self.reply_timeout
+        while time.perf_counter() < deadline:
+            for entry in self.fakes.deliveries.get(to, []):
+                if entry[0] >= sent_at:
+                    self.fakes.deliveries[to].remove(entry)
+                    return entry
+            await asyncio.sleep(0.01)
+        return None
+
+    def _check_reply(self, stats: ScenarioStats, reply, sent_at: float):
+        if reply is None:
+            stats.error("reply_timeout")
+            return
+        delivered_at, text = reply
+        if any(marker in text for marker in ERROR_REPLIES):
+            stats.error("error_reply")
+            return
+        stats.e2e_latencies.append(delivered_at - sent_at)
+        stats.ok += 1
+
+    async def _chat(self, user: int, stats: ScenarioStats):
+        started = time.perf_counter()
+        response = await self.client.post("/chat", json={"message": self._message(), "session_id": f"loadtest-web-{user}"})
+        stats.latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            stats.error(f"http_{response.status_code}")
+        elif response.json()["message"].startswith(ERROR_REPLIES[0]):
+            stats.error("error_reply")
+        else:
+            stats.ok += 1
+
+    async def _twilio(self, user: int, stats: ScenarioStats):
+        sender = f"whatsapp:+1555{user:07d}"
+        form = {"From": sender, "Body": self._message()}
+        if self.random.random() < self.audio_share:
+            form = {"From": sender, "Body": "", "MediaUrl0": f"{self.fake_url}/media/{uuid.uuid4().hex}", "MediaContentType0": "audio/ogg"}
+        started = time.perf_counter()
+        response = await self.client.post("/twilio/whatsapp", data=form)
+        stats.latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            stats.error(f"http_{response.status_code}")
+            return
+        self._check_reply(stats, await self._wait_for_reply(sender, started), started)
+
+    async def _meta(self, user: int, stats: ScenarioStats):
+        sender = f"1556{user:07d}"
+        if self.random.random() < self.audio_share:
+            message = {"from": sender, "type": "audio", "audio": {"id": uuid.uuid4().hex}}
+        else:
+            message = {"from": sender, "type": "text", "text": {"body": self._message()}}
+        payload = {"object": "whatsapp_business_account", "entry": [{"changes": [{"value": {"messages": [message]}}]}]}
+        started = time.perf_counter()
+        response = await self.client.post("/meta/whatsapp", json=payload)
+        stats.latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            stats.error(f"http_{response.status_code}")
+            return
+        self._check_reply(stats, await self._wait_for_reply(sender, started), started)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(env: dict, log_path: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_until_healthy(client: httpx.AsyncClient, process: Optional[subprocess.Popen], timeout: float = 90):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError("Backend did not become healthy")
+
+
+def print_report(results: dict):
+    print(f"\n{'scenario':<8} {'sent':>6} {'ok':>6} {'err%':>6} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}   {'e2e p50':>9} {'e2e p95':>9} {'e2e p99':>9}")
+    for name, result in results["scenarios"].items():
+        latency, e2e = result["latency_ms"], result["e2e_latency_ms"] or {}
+        cells = [latency[f"p{q}"] for q in (50, 95, 99)] + [e2e.get(f"p{q}") for q in (50, 95, 99)]
+        formatted = [f"{c:>9.1f}" if c is not None else f"{'-':>9}" for c in cells]
+        print(f"{name:<8} {result['sent']:>6} {result['ok']:>6} {100 * result['error_rate']:>5.1f}% {result['throughput_rps']:>7.2f} "
+              f"{' '.join(formatted[:3])}   {' '.join(formatted[3:])}")
+        if result["errors"]:
+            print(f"{'':<8} errors: {result['errors']}")
+    print(f"\nupstream calls: {results['upstream_calls']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chat-rps", type=float, default=2, help="Requests per second to /chat (0 to skip)")
+    parser.add_argument("--twilio-rps", type=float, default=1, help="Requests per second to /twilio/whatsapp")
+    parser.add_argument("--meta-rps", type=float, default=1, help="Requests per second to /meta/whatsapp")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load per scenario (scenarios run concurrently)")
+    parser.add_argument("--users", type=int, default=200, help="Simulated users per scenario")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times instead of a fixed rate")
+    parser.add_argument("--image-share", type=float, default=0.0, help="Share of messages asking for an image (tool call + Flux)")
+    parser.add_argument("--audio-share", type=float, default=0.0, help="Share of webhook messages sent as voice notes (Whisper)")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Fake model time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=60, help="Fake model output rate")
+    parser.add_argument("--output-tokens", type=int, default=60, help="Fake model tokens per answer")
+    parser.add_argument("--image-ms", type=float, default=1500, help="Fake Flux latency")
+    parser.add_argument("--whisper-ms", type=float, default=400, help="Fake Whisper latency")
+    parser.add_argument("--send-ms", type=float, default=80, help="Fake Twilio/Meta send latency")
+    parser.add_argument("--reply-timeout", type=float, default=120, help="Seconds to wait for a webhook's outbound reply")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    fakes = FakeServices(first_token_ms=args.first_token_ms, tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens,
+                         image_ms=args.image_ms, whisper_ms=args.whisper_ms, send_ms=args.send_ms, seed=args.seed)
+    fake_server = BackgroundServer(fakes.app)
+    fake_url = fake_server.start()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = {**os.environ, **fakes.app_env(fake_url), "CHAT_DATA_DIR": data_dir,
+               "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"), "BASE_URL": ""}
+        log_path = os.path.join(tempfile.gettempdir(), "chatbot-loadtest.log")
+        process, app_url = start_backend(env, log_path)
+        limits = httpx.Limits(max_connections=2000, max_keepalive_connections=200)
+        try:
+            async with httpx.AsyncClient(base_url=app_url, timeout=args.reply_timeout, limits=limits) as client:
+                await wait_until_healthy(client, process)
+                tester = LoadTester(client, fakes, fake_url, args.users, args.image_share, args.audio_share, args.reply_timeout, args.seed)
+                scenarios = [(name, rps) for name, rps in (("chat", args.chat_rps), ("twilio", args.twilio_rps), ("meta", args.meta_rps)) if rps > 0]
+                print(f"Driving {', '.join(f'{name} at {rps}/s' for name, rps in scenarios)} for {args.duration}s against {app_url}")
+                started = time.perf_counter()
+                await asyncio.gather(*[tester.run(name, rps, args.duration, args.poisson) for name, rps in scenarios])
+                elapsed = time.perf_counter() - started
+        except RuntimeError as e:
+            print(f"{e}; backend log: {log_path}")
+            raise SystemExit(1)
+        finally:
+            process.terminate()
+            try:
+                process.wait(15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            fake_server.stop()
+
+    results = {
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "scenarios": {name: stats.summary(args.duration) for name, stats in tester.stats.items()},
+        "upstream_calls": dict(fakes.calls),
+    }
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
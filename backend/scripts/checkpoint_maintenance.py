@@ -0,0 +1,55 @@
+"""
+Offline maintenance for the checkpoint database (chat_history.sqlite).
+
+Stop the app before running any of these commands.
+
+Usage:
+    python backend/scripts/checkpoint_maintenance.py convert-vacuum backend/data/chat_history.sqlite
+    python backend/scripts/checkpoint_maintenance.py reshard backend/data/chat_history.sqlite --from 1 --to 4
+    python backend/scripts/checkpoint_maintenance.py migrate-serde backend/data/chat_history.sqlite --shards 1 --to compact
+    python backend/scripts/checkpoint_maintenance.py migrate-serde backend/data/chat_history.sqlite --shards 1 --to default
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from utils.checkpoint_retention import convert_to_incremental_vacuum
+from utils.sharded_checkpointer import reshard, shard_paths
+from utils.checkpoint_serde import CompactSerializer, migrate_serialization
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert-vacuum", help="Enable incremental auto_vacuum on an existing database")
+    convert.add_argument("db_path", help="Path to chat_history.sqlite")
+
+    resharding = commands.add_parser("reshard", help="Redistribute threads across a new number of shards")
+    resharding.add_argument("db_path", help="Base path, e.g. chat_history.sqlite")
+    resharding.add_argument("--from", dest="old_shards", type=int, required=True, help="Current CHECKPOINT_SHARDS")
+    resharding.add_argument("--to", dest="new_shards", type=int, required=True, help="New CHECKPOINT_SHARDS")
+
+    migrate = commands.add_parser("migrate-serde", help="Rewrite existing checkpoints in another serialization format")
+    migrate.add_argument("db_path", help="Base path, e.g. chat_history.sqlite")
+    migrate.add_argument("--shards", type=int, default=1, help="Current CHECKPOINT_SHARDS")
+    migrate.add_argument("--to", choices=["compact", "default"], default="compact",
+                         help="Target CHECKPOINT_SERDE (run --to default before switching back to default)")
+
+    args = parser.parse_args()
+    if args.command == "convert-vacuum":
+        convert_to_incremental_vacuum(args.db_path)
+        print(f"{args.db_path} converted to auto_vacuum=INCREMENTAL")
+    elif args.command == "reshard":
+        reshard(args.db_path, args.old_shards, args.new_shards)
+        print(f"Resharded {args.db_path} from {args.old_shards} to {args.new_shards} shards; set CHECKPOINT_SHARDS={args.new_shards}")
+    elif args.command == "migrate-serde":
+        serde = CompactSerializer()
+        for path in shard_paths(args.db_path, args.shards):
+            print(f"{path}: {migrate_serialization(path, serde, to=args.to)} rows migrated to {args.to}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,16 +2,17 @@ import logging
 import operator
 import os
 import sys
+import time
 from typing import Annotated, Sequence, TypedDict
 
-import aiosqlite
-from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
 from langchain_openai import AzureChatOpenAI, ChatOpenAI
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import ToolNode
 
-from config import APP_NAME
+from config import APP_NAME, TOOL_CACHE_PERSIST, CHECKPOINT_WRITE_BEHIND, CHECKPOINT_SHARDS, CHECKPOINT_SERDE, CHECKPOINT_BACKEND
+from config import SQLITE_HOT_COPY, SQLITE_HOT_COPY_DIR, RESPONSE_CACHE_ENABLED, FAQ_FAST_PATH_ENABLED, REQUEST_COALESCING_ENABLED
+from config import FAST_MODEL_PROVIDER, FAST_MODEL_DEPLOYMENT, USAGE_LEDGER_ENABLED, CHAT_DATA_DIR
 from utils.model_registry import ModelFactory
 from utils.chat_providers import register_builtin_providers
 
@@ -22,10 +23,59 @@ try:
     from backend.src.utils.mcp_client import MCPClient
 except ImportError:
     from utils.mcp_client import MCPClient
+from utils.tool_cache import ToolResultCache
+from utils.sharded_checkpointer import create_sharded_checkpointer
+from utils.checkpoint_retention import CheckpointRetention
+from utils.checkpoint_cache import WriteBehindCheckpointer
+from utils.checkpoint_serde import CompactSerializer
+from utils.message_log import create_message_log_checkpointer
+from utils.sqlite_hot_copy import SqliteHotCopy
+from utils.response_cache import SemanticResponseCache
+from utils.faq_matcher import FaqMatcher
+from utils.admission import AdmissionController, ServiceBusyError
+from utils.single_flight import SingleFlight, normalise_message
+from utils.model_router import ModelRouter, ROUTE_FAST, ROUTE_PRIMARY
+from utils.metrics import AGENT_TURN_SECONDS, LLM_CALL_SECONDS, LLM_TOKENS
+from utils.request_timing import PHASE_ADMISSION, PHASE_LLM, record_phase
+from utils.structured_logging import conversation_id
+from utils.tracing import span
+from utils.usage_ledger import UsageLedger, usage_tokens, request_channel, BUDGET_DOWNGRADE, BUDGET_REFUSE, BUDGET_EXCEEDED_MESSAGE
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(__file__), "..", "training", "knowledge_base.md")
+# Re-check knowledge_base.md for edits at most this often
+KNOWLEDGE_BASE_CHECK_SECONDS = 5
+
+def _knowledge_base_mtime():
+    try:
+        return os.path.getmtime(KNOWLEDGE_BASE_PATH)
+    except OSError:
+        return None
+
+def _render_knowledge_base(content: str) -> str:
+    content = content.replace("{{APP_NAME}}", APP_NAME)
+    return content.replace("{{APP_NAME_LOWER}}", APP_NAME.lower())
+
+def load_system_prompt(path: str = KNOWLEDGE_BASE_PATH) -> str:
+    """The system prompt: the assistant's identity plus the rendered knowledge base, if readable"""
+    base_message = f"You are {APP_NAME}, a helpful AI assistant."
+    try:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                content = _render_knowledge_base(f.read())
+                return f"{base_message}\n\n{content}"
+    except Exception as e:
+        logger.error(f"Failed to load knowledge base: {e}")
+    return base_message
+
+def _is_first_turn(messages) -> bool:
+    """True when `messages` hold a single user turn, i.e. no earlier conversation"""
+    if not messages or not isinstance(messages[0], HumanMessage):
+        return False
+    return not any(isinstance(m, HumanMessage) for m in list(messages)[1:])
+
 # --- Types ---
 
 class AgentState(TypedDict):
@@ -33,53 +83,92 @@ class AgentState(TypedDict):
 
 class ChatbotAgent:
     def __init__(self):
+        self._setup_storage()
+        tool_cache_db = os.path.join(self.data_dir, "tool_cache.sqlite") if TOOL_CACHE_PERSIST else None
         self.mcp_client = MCPClient(
             command=sys.executable,
             args=[os.path.join(os.path.dirname(__file__), "utils/mcp_server.py")],
-            env=os.environ.copy()
+            env=os.environ.copy(),
+            cache=ToolResultCache(db_path=tool_cache_db)
         )
         self.tools = []
         self.model = None
+        # Cheap untooled model for simple turns; set when FAST_MODEL_* is configured
+        self.fast_model = None
+        self.router = None
+        # Token usage per thread/channel; created with the other databases in initialize()
+        self.usage = None
         self.workflow = None
         self.app = None
-        self._setup_storage()
+        # Bounds concurrent model calls across every thread and channel
+        self.admission = AdmissionController()
+        self.single_flight = SingleFlight() if REQUEST_COALESCING_ENABLED else None
+        self.provider = None
         
+        self._kb_mtime = _knowledge_base_mtime()
+        self._kb_checked = time.monotonic()
         self.system_message = self._load_training_data()
+        self.response_cache = SemanticResponseCache(KNOWLEDGE_BASE_PATH, render=_render_knowledge_base) if RESPONSE_CACHE_ENABLED else None
+        self.faq_matcher = self._load_faq_matcher()
 
     def _setup_storage(self):
         """Setup data directory and database path"""
         # Database setup: Use /home/data on Azure App Service for persistence across deployments
-        if os.environ.get("WEBSITE_SITE_NAME"):
+        if CHAT_DATA_DIR:
+            self.data_dir = CHAT_DATA_DIR
+        elif os.environ.get("WEBSITE_SITE_NAME"):
             self.data_dir = "/home/data"
         else:
             self.data_dir = os.path.join(os.path.dirname(__file__), "..", "data")
             
         os.makedirs(self.data_dir, exist_ok=True)
+        self.hot_copy = None
+        if SQLITE_HOT_COPY:
+            # Run the databases from local disk; data_dir only receives backups
+            self.hot_copy = SqliteHotCopy(self.data_dir, SQLITE_HOT_COPY_DIR)
+            self.hot_copy.restore()
+            self.data_dir = SQLITE_HOT_COPY_DIR
         self.db_path = os.path.join(self.data_dir, "chat_history.sqlite")
 
     async def _init_memory(self):
-        """Initialize async sqlite server if not exists"""
-        if not hasattr(self, 'conn') or self.conn is None:
-            self.conn = await aiosqlite.connect(self.db_path)
-            self.memory = AsyncSqliteSaver(self.conn)
-            # aiosqlite requires initialization
-            await self.memory.setup()
+        """Initialize the history backend (sharded checkpoints or message log) if not exists"""
+        if getattr(self, 'memory', None) is None:
+            # Compact also reads rows written by the default serializer
+            serde = CompactSerializer() if CHECKPOINT_SERDE == "compact" else None
+            if CHECKPOINT_BACKEND == "message_log":
+                # Separate file: the two backends use different schemas
+                self.storage = await create_message_log_checkpointer(os.path.join(self.data_dir, "chat_messages.sqlite"), serde=serde)
+            else:
+                self.storage = await create_sharded_checkpointer(self.db_path, CHECKPOINT_SHARDS, serde=serde)
+            if CHECKPOINT_WRITE_BEHIND:
+                # Serve hot threads from memory and write behind to sqlite
+                self.memory = WriteBehindCheckpointer(self.storage)
+                self.memory.start()
+            else:
+                self.memory = self.storage
+            if self.hot_copy:
+                self.hot_copy.start()
+
+    def _init_usage(self):
+        """Start the token usage ledger if enabled and not yet running"""
+        if USAGE_LEDGER_ENABLED and self.usage is None:
+            self.usage = UsageLedger(os.path.join(self.data_dir, "usage.sqlite"))
+            self.usage.start()
 
 
     def _load_training_data(self) -> str:
-        base_message = f"You are {APP_NAME}, a helpful AI assistant."
+        return load_system_prompt(KNOWLEDGE_BASE_PATH)
+
+    def _load_faq_matcher(self):
+        """Index the knowledge base Q/A pairs for the FAQ fast path"""
+        if not FAQ_FAST_PATH_ENABLED:
+            return None
         try:
-            kb_path = os.path.join(os.path.dirname(__file__), "..", "training", "knowledge_base.md")
-            if os.path.exists(kb_path):
-                with open(kb_path, "r") as f:
-                    content = f.read()
-                    content = content.replace("{{APP_NAME}}", APP_NAME)
-                    content = content.replace("{{APP_NAME_LOWER}}", APP_NAME.lower())
-                    return f"{base_message}\n\n{content}"
+            with open(KNOWLEDGE_BASE_PATH, "r") as f:
+                return FaqMatcher.from_knowledge_base(_render_knowledge_base(f.read()))
         except Exception as e:
-            logger.error(f"Failed to load knowledge base: {e}")
-            pass
-        return base_message
+            logger.error(f"Failed to build FAQ index: {e}")
+            return None
         
     async def initialize(self):
         # 1. Initialize MCP Connection
@@ -93,15 +182,26 @@ class ChatbotAgent:
             provider = "azure" if os.getenv("AZURE_OPENAI_API_KEY") else "openai"
             
         self.model = ModelFactory.get_model(provider, tools=self.tools)
+        self.provider = provider
+        if FAST_MODEL_PROVIDER or FAST_MODEL_DEPLOYMENT:
+            self.fast_model = ModelFactory.get_model(FAST_MODEL_PROVIDER or provider, deployment=FAST_MODEL_DEPLOYMENT or None)
+            self.router = ModelRouter(self.tools)
         
         # 3. Define Graph
         await self._init_memory()
+        self._init_usage()
         
         workflow = StateGraph(AgentState)
         workflow.add_node("agent", self.call_model)
         workflow.add_node("tools", ToolNode(self.tools))
         
-        workflow.set_entry_point("agent")
+        if self.router:
+            # Simple turns are answered by the fast model in one step; the rest enter the tool loop
+            workflow.add_node("fast_agent", self.call_fast_model)
+            workflow.set_conditional_entry_point(self.route_turn, {ROUTE_FAST: "fast_agent", ROUTE_PRIMARY: "agent"})
+            workflow.add_edge("fast_agent", END)
+        else:
+            workflow.set_entry_point("agent")
         workflow.add_conditional_edges(
             "agent",
             self.should_continue,
@@ -112,50 +212,252 @@ class ChatbotAgent:
         self.app = workflow.compile(checkpointer=self.memory)
         logger.info(f"Agent Initialized with Tools: {[t.name for t in self.tools]}")
 
-    async def call_model(self, state):
-        messages = state['messages']
+    async def call_model(self, state, config=None):
+        response = await self._invoke_model(self.model, ROUTE_PRIMARY, state['messages'], config)
+        return {"messages": [response]}
+
+    async def call_fast_model(self, state, config=None):
+        response = await self._invoke_model(self.fast_model, ROUTE_FAST, state['messages'], config)
+        return {"messages": [response]}
+
+    def route_turn(self, state, config=None):
+        if config and config.get("configurable", {}).get("downgrade"):
+            # The thread is close to its daily token budget
+            return ROUTE_FAST
+        return self.router.route(state['messages'])
+
+    async def _invoke_model(self, model, route: str, messages, config=None):
         # Ensure system message is first if not present
         if not messages or not isinstance(messages[0], SystemMessage):
             messages = [SystemMessage(content=self.system_message)] + list(messages)
             
-        response = await self.model.ainvoke(messages)
-        return {"messages": [response]}
+        with span("llm.call", route=route) as call_span:
+            requested = time.monotonic()
+            async with self.admission.slot():
+                started = time.monotonic()
+                response = await model.ainvoke(messages)
+            elapsed = time.monotonic() - started
+            input_tokens, output_tokens = usage_tokens(response)
+            call_span.set_attribute("admission_wait_ms", round((started - requested) * 1000, 1))
+            call_span.set_attribute("input_tokens", input_tokens)
+            call_span.set_attribute("output_tokens", output_tokens)
+        LLM_CALL_SECONDS.observe(elapsed, route=route)
+        record_phase(PHASE_ADMISSION, started - requested)
+        record_phase(PHASE_LLM, elapsed)
+        LLM_TOKENS.inc(input_tokens, route=route, kind="input")
+        LLM_TOKENS.inc(output_tokens, route=route, kind="output")
+        if self.router:
+            self.router.record(route, elapsed, response)
+        if self.usage is not None and config:
+            thread_id = config.get("configurable", {}).get("thread_id", "unknown")
+            self.usage.record(thread_id, request_channel.get(), route, input_tokens, output_tokens)
+        return response
 
     def should_continue(self, state):
-        messages = state['messages']
-        last_message = messages[-1]
-        if last_message.tool_calls:
-            return "continue"
-        return "end"
+        with span("agent.should_continue") as decision_span:
+            messages = state['messages']
+            last_message = messages[-1]
+            decision = "continue" if last_message.tool_calls else "end"
+            decision_span.set_attribute("decision", decision)
+            return decision
 
     async def chat(self, message: str, thread_id: str):
         if not self.app:
             await self.initialize()
             
+        # Stays set for the rest of the request, so reply sending logs carry it too
+        conversation_id.set(thread_id)
+        with span("agent.turn", thread_id=thread_id, channel=request_channel.get()) as turn_span:
+            return await self._answer(message, thread_id, turn_span)
+
+    async def _answer(self, message: str, thread_id: str, turn_span) -> str:
+        """One chat turn: FAQ, cache, budget check, then the graph"""
         config = {"configurable": {"thread_id": thread_id}}
         inputs = {"messages": [HumanMessage(content=message)]}
+        started = time.perf_counter()
+        outcome = "error"
         
         try:
+            self._refresh_knowledge_base()
+            answer = await self._faq_response(message, config)
+            if answer is not None:
+                outcome = "faq"
+                return answer
+            answer = await self._cached_response(message, config)
+            if answer is not None:
+                outcome = "cache"
+                return answer
+            if self.usage is not None:
+                budget = await self.usage.check_budget(thread_id)
+                if budget == BUDGET_REFUSE:
+                    logger.warning(f"Thread {thread_id} is over its daily token budget")
+                    outcome = "budget_refused"
+                    return BUDGET_EXCEEDED_MESSAGE
+                if budget == BUDGET_DOWNGRADE and self.router:
+                    config["configurable"]["downgrade"] = True
             # Invoke gets the final state of the graph
-            final_state = await self.app.ainvoke(inputs, config=config)
+            final_state = await self._run_graph(inputs, message, config)
+            self._remember_response(message, final_state["messages"])
+            outcome = "model"
             return final_state["messages"][-1].content
+        except ServiceBusyError:
+            # Surfaced to the routes as 503 / a "busy" reply
+            outcome = "busy"
+            raise
         except Exception as e:
             return f"I encountered an error: {str(e)}"
+        finally:
+            AGENT_TURN_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+            turn_span.set_attribute("outcome", outcome)
+
+    def component_stats(self) -> dict:
+        """Counters and queue depths of the request-path components, exported on /metrics"""
+        components = {"admission": {**self.admission.stats, "active": self.admission.active, "waiting": self.admission.waiting}}
+        if self.single_flight is not None:
+            components["single_flight"] = {**self.single_flight.stats, "inflight": len(self.single_flight)}
+        if self.response_cache is not None:
+            components["response_cache"] = self.response_cache.stats
+        if self.faq_matcher is not None:
+            components["faq"] = self.faq_matcher.stats
+        if self.router is not None:
+            components["router"] = self.router.stats["routes"]
+        if self.usage is not None:
+            components["usage"] = self.usage.stats
+        cache = getattr(self.mcp_client, "cache", None)
+        if cache is not None:
+            components["tool_cache"] = cache.stats
+        memory = getattr(self, "memory", None)
+        if isinstance(getattr(memory, "stats", None), dict):
+            components["checkpoint_cache"] = memory.stats
+        if getattr(self, "hot_copy", None) is not None:
+            components["hot_copy"] = self.hot_copy.stats
+        return components
+
+    def _refresh_knowledge_base(self):
+        """Reload the prompt, FAQ index and response cache when knowledge_base.md changed"""
+        now = time.monotonic()
+        if now - self._kb_checked < KNOWLEDGE_BASE_CHECK_SECONDS:
+            return
+        self._kb_checked = now
+        mtime = _knowledge_base_mtime()
+        if mtime == self._kb_mtime:
+            return
+        self._kb_mtime = mtime
+        self.system_message = self._load_training_data()
+        self.faq_matcher = self._load_faq_matcher()
+        if self.response_cache is not None:
+            self.response_cache.check_source(force=True)
+
+    async def _record_exchange(self, config, message: str, answer: str):
+        """Append a question and an answer produced outside the graph to the thread checkpoint"""
+        await self.app.aupdate_state(config, {"messages": [HumanMessage(content=message), AIMessage(content=answer)]}, as_node="agent")
+
+    async def _faq_response(self, message: str, config) -> str | None:
+        """Answer knowledge-base FAQ questions without calling the model when the thread has no prior context"""
+        if self.faq_matcher is None:
+            return None
+        answer = self.faq_matcher.match(message, count_hit=False)
+        if answer is None:
+            return None
+        # Only matches pay for loading the thread state
+        state = await self.app.aget_state(config)
+        if state.values.get("messages"):
+            # "What about Saturdays?" after a booking question needs the conversation, not the FAQ
+            return None
+        self.faq_matcher.record_hit()
+        await self._record_exchange(config, message, answer)
+        return answer
+
+    async def _cached_response(self, message: str, config) -> str | None:
+        """Serve a cached answer when the thread has no prior context, recording the exchange in it"""
+        if self.response_cache is None:
+            return None
+        answer = self.response_cache.lookup(message, count_hit=False)
+        if answer is None:
+            return None
+        # Only candidate hits pay for loading the thread state
+        state = await self.app.aget_state(config)
+        if state.values.get("messages"):
+            # Follow-up questions depend on the conversation so far
+            return None
+        self.response_cache.record_hit()
+        await self._record_exchange(config, message, answer)
+        return answer
+
+    def _can_coalesce(self, message: str) -> bool:
+        """True when the opening turn `message` cannot call tools, so one run can answer several threads"""
+        if not self.tools:
+            return True
+        # Only the fast route is answered without tools
+        return self.router is not None and self.router.classify([HumanMessage(content=message)])[0] == ROUTE_FAST
+
+    async def _run_graph(self, inputs, message: str, config):
+        """Run the graph; identical tool-free first messages of concurrent new threads share one run"""
+        invoke = lambda: self.app.ainvoke(inputs, config=config)
+        if self.single_flight is None or not self._can_coalesce(message):
+            # A shared run would make a tool call (an SMS, an image) for one thread only
+            return await invoke()
+        key = (self.provider, normalise_message(message))
+        if key in self.single_flight:
+            # Only a thread without history of its own may take another thread's answer
+            state = await self.app.aget_state(config)
+            if state.values.get("messages"):
+                return await invoke()
+        final_state, shared = await self.single_flight.run(key, invoke)
+        if shared:
+            if not _is_first_turn(final_state["messages"]):
+                # The leader's answer drew on its own thread's history
+                return await invoke()
+            await self._record_exchange(config, message, final_state["messages"][-1].content)
+        return final_state
+
+    def _remember_response(self, message: str, messages):
+        """Cache plain answers to the first question of a thread"""
+        if self.response_cache is None or not _is_first_turn(messages):
+            return
+        turn = list(messages)
+        # Tool results (generated images, sent messages) are never reusable
+        if any(isinstance(m, ToolMessage) or getattr(m, "tool_calls", None) for m in turn):
+            return
+        if isinstance(turn[-1], AIMessage) and isinstance(turn[-1].content, str):
+            self.response_cache.store(message, turn[-1].content)
 
     async def reset_history(self, thread_id: str):
         # We could delete the rows manually, or just let users generate a new thread.
         # But if we must clear a specific thread ID's state:
         await self._init_memory()
-        if self.conn:
-            try:
-                # Remove checkpoints associated with this thread to 'reset' it
-                await self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
-                await self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
-                await self.conn.commit()
-            except Exception as e:
-                logger.error(f"Failed to reset history for {thread_id}: {e}")
+        try:
+            # Drops the thread from the write-behind cache and deletes its
+            # checkpoints and writes on the shard that owns it
+            await self.memory.adelete_thread(thread_id)
+        except Exception as e:
+            logger.error(f"Failed to reset history for {thread_id}: {e}")
+
+    async def compact_history(self) -> dict:
+        """Prune old checkpoints, expire idle threads and reclaim free pages"""
+        await self._init_memory()
+        if self.memory is not self.storage:
+            # Persist cached turns first, so recently active threads are not seen as idle
+            await self.memory.flush()
+        totals = {}
+        for shard in getattr(self.storage, 'shards', [self.storage]):
+            # Expire through the wrapper so write-behind state is dropped with the rows
+            stats = await CheckpointRetention(shard, delete_thread=self.memory.adelete_thread).run_once()
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
 
     async def cleanup(self):
         await self.mcp_client.close()
-        if hasattr(self, 'conn') and self.conn:
-            await self.conn.close()
+        # Flush write-behind state before the sqlite connections go away
+        memory = getattr(self, 'memory', None)
+        storage = getattr(self, 'storage', None)
+        if memory is not None and memory is not storage:
+            await memory.aclose()
+        if storage is not None:
+            await storage.aclose()
+        if self.usage is not None:
+            await self.usage.aclose()
+        # Final backup once every connection is closed
+        if getattr(self, 'hot_copy', None) is not None:
+            await self.hot_copy.aclose()
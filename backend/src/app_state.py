@@ -9,9 +9,10 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from chatbot import ChatBot
+from utils.structured_logging import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queued, JSON by default; see utils/structured_logging.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 from config import APP_NAME
@@ -9,13 +9,13 @@ from agent import ChatbotAgent
 from utils.model_registry import ImageFactory, AudioFactory
 from utils.audio_providers import register_builtin_audio_providers
 from utils.image_providers import register_builtin_image_providers
+from utils.metrics import TRANSCRIPTION_SECONDS
+from utils.tracing import span
 
 # Register all providers
 register_builtin_audio_providers()
 register_builtin_image_providers()
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ChatBot:
@@ -53,7 +53,8 @@ class ChatBot:
             provider_name = os.getenv("AUDIO_MODEL_PROVIDER", "azure-whisper")
             self.audio_provider = AudioFactory.get_provider(provider_name)
             
-        return self.audio_provider.transcribe_audio(audio_content)
+        with TRANSCRIPTION_SECONDS.time(status="ok"), span("provider.transcribe"):
+            return self.audio_provider.transcribe_audio(audio_content)
 
     def generate_image(self, prompt: str) -> str:
         """Generate image using the configured Image Provider"""
@@ -61,7 +62,8 @@ class ChatBot:
             provider_name = os.getenv("IMAGE_MODEL_PROVIDER", "azure-flux")
             self.image_provider = ImageFactory.get_provider(provider_name)
             
-        return self.image_provider.generate_image(prompt)
+        with span("provider.generate_image"):
+            return self.image_provider.generate_image(prompt)
 
 
     def _validate_env(self):
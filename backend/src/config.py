@@ -3,3 +3,157 @@ import os
 # Global Configuration
 APP_NAME = "Nviv AI"
 IMAGE_RETENTION_HOURS = int(os.getenv("IMAGE_RETENTION_HOURS", 1))
+
+# Tool result cache (see utils/tool_cache.py)
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", 256))
+TOOL_CACHE_PERSIST = os.getenv("TOOL_CACHE_PERSIST", "false").lower() == "true"
+TOOL_IDEMPOTENCY_WINDOW_SECONDS = int(os.getenv("TOOL_IDEMPOTENCY_WINDOW_SECONDS", 600))
+
+# SQLite checkpoint storage (see utils/checkpoint_storage.py)
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", 0))
+
+# Checkpoint retention (see utils/checkpoint_retention.py)
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 0))
+CHECKPOINT_THREAD_TTL_HOURS = float(os.getenv("CHECKPOINT_THREAD_TTL_HOURS", 0))
+CHECKPOINT_RETENTION_INTERVAL_SECONDS = int(os.getenv("CHECKPOINT_RETENTION_INTERVAL_SECONDS", 3600))
+CHECKPOINT_RETENTION_BATCH_SIZE = int(os.getenv("CHECKPOINT_RETENTION_BATCH_SIZE", 100))
+CHECKPOINT_VACUUM_PAGES = int(os.getenv("CHECKPOINT_VACUUM_PAGES", 256))
+
+# Write-behind checkpoint cache (see utils/checkpoint_cache.py)
+CHECKPOINT_WRITE_BEHIND = os.getenv("CHECKPOINT_WRITE_BEHIND", "false").lower() == "true"
+CHECKPOINT_CACHE_MAX_MB = int(os.getenv("CHECKPOINT_CACHE_MAX_MB", 64))
+CHECKPOINT_FLUSH_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL_SECONDS", 2))
+
+# Number of checkpoint database shards (see utils/sharded_checkpointer.py).
+# Changing it requires `backend/scripts/checkpoint_maintenance.py reshard`.
+CHECKPOINT_SHARDS = int(os.getenv("CHECKPOINT_SHARDS", 1))
+
+# Checkpoint serialization (see utils/checkpoint_serde.py).
+# "compact" reads "default" rows, but not the other way round: before switching back to
+# "default", run `backend/scripts/checkpoint_maintenance.py migrate-serde --to default`.
+# Existing rows are converted to "compact" with `migrate-serde --to compact`.
+CHECKPOINT_SERDE = os.getenv("CHECKPOINT_SERDE", "default").lower()
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zlib").lower()
+CHECKPOINT_COMPRESSION_MIN_BYTES = int(os.getenv("CHECKPOINT_COMPRESSION_MIN_BYTES", 256))
+
+# Conversation history backend: "snapshot" (LangGraph checkpoints, sharded) or
+# "message_log" (append-only message deltas, see utils/message_log.py)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "snapshot").lower()
+MESSAGE_LOG_SNAPSHOT_EVERY = int(os.getenv("MESSAGE_LOG_SNAPSHOT_EVERY", 50))
+
+# Local hot copy of the SQLite databases (see utils/sqlite_hot_copy.py).
+# Intended for App Service, where /home/data is a slow network mount.
+SQLITE_HOT_COPY = os.getenv("SQLITE_HOT_COPY", "false").lower() == "true"
+SQLITE_HOT_COPY_DIR = os.getenv("SQLITE_HOT_COPY_DIR", "/tmp/nviv-data")
+SQLITE_BACKUP_INTERVAL_SECONDS = float(os.getenv("SQLITE_BACKUP_INTERVAL_SECONDS", 60))
+
+# Semantic response cache for repeated FAQ questions (see utils/response_cache.py)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", 0.85))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 24 * 3600))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+
+# Knowledge-base FAQ fast path (see utils/faq_matcher.py)
+FAQ_FAST_PATH_ENABLED = os.getenv("FAQ_FAST_PATH_ENABLED", "true").lower() == "true"
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", 0.8))
+
+# LLM admission control (see utils/admission.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 64))
+LLM_QUEUE_TIMEOUT_INTERACTIVE_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_INTERACTIVE_SECONDS", 10))
+LLM_QUEUE_TIMEOUT_BACKGROUND_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_BACKGROUND_SECONDS", 60))
+
+# Adaptive (AIMD) model concurrency and retries (see utils/adaptive_concurrency.py)
+MODEL_ADAPTIVE_CONCURRENCY = os.getenv("MODEL_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+MODEL_CONCURRENCY_INITIAL = float(os.getenv("MODEL_CONCURRENCY_INITIAL", 4))
+MODEL_CONCURRENCY_MAX = float(os.getenv("MODEL_CONCURRENCY_MAX", 32))
+MODEL_MAX_RETRIES = int(os.getenv("MODEL_MAX_RETRIES", 4))
+MODEL_BACKOFF_BASE_SECONDS = float(os.getenv("MODEL_BACKOFF_BASE_SECONDS", 0.5))
+MODEL_BACKOFF_MAX_SECONDS = float(os.getenv("MODEL_BACKOFF_MAX_SECONDS", 30))
+# Retries inside the OpenAI SDK client. Unset: off when the adaptive layer is on (it retries
+# throttles and transient 5xx/connection errors itself), otherwise the SDK default
+MODEL_CLIENT_MAX_RETRIES = os.getenv("MODEL_CLIENT_MAX_RETRIES", "")
+
+# Model deployment pool, used when CHAT_MODEL_PROVIDER=pool (see utils/model_pool.py)
+MODEL_POOL = os.getenv("MODEL_POOL", "")
+MODEL_POOL_STRATEGY = os.getenv("MODEL_POOL_STRATEGY", "weighted")  # weighted | least_latency
+MODEL_POOL_FAILURE_THRESHOLD = int(os.getenv("MODEL_POOL_FAILURE_THRESHOLD", 3))
+MODEL_POOL_COOLDOWN_SECONDS = float(os.getenv("MODEL_POOL_COOLDOWN_SECONDS", 30))
+MODEL_HEDGING_ENABLED = os.getenv("MODEL_HEDGING_ENABLED", "false").lower() == "true"
+# Latency samples a backend needs before its p95 is trusted as a hedge delay
+MODEL_HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_HEDGE_MIN_SAMPLES", 20))
+
+# Cost/latency model routing (see utils/model_router.py)
+# Simple turns go to FAST_MODEL_DEPLOYMENT on FAST_MODEL_PROVIDER (default: the chat provider); leave both unset to disable
+FAST_MODEL_PROVIDER = os.getenv("FAST_MODEL_PROVIDER", "")
+FAST_MODEL_DEPLOYMENT = os.getenv("FAST_MODEL_DEPLOYMENT", "")
+MODEL_ROUTER_MAX_WORDS = int(os.getenv("MODEL_ROUTER_MAX_WORDS", 12))
+
+# Token usage ledger and budgets (see utils/usage_ledger.py)
+USAGE_LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").lower() == "true"
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", 30))
+# Tokens per thread per UTC day; 0 disables budgets
+TOKEN_BUDGET_PER_THREAD_DAILY = int(os.getenv("TOKEN_BUDGET_PER_THREAD_DAILY", 0))
+# Share of the budget after which turns go to the fast model (when FAST_MODEL_* is set)
+TOKEN_BUDGET_DOWNGRADE_RATIO = float(os.getenv("TOKEN_BUDGET_DOWNGRADE_RATIO", 0.8))
+
+# Span tracing (see utils/tracing.py)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# Share of root spans (requests, background tasks) whose whole trace is kept
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TRACE_EXPORT_DIR = os.getenv("TRACE_EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "traces"))
+TRACE_FILE_MAX_BYTES = int(os.getenv("TRACE_FILE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_FILE_BACKUPS = int(os.getenv("TRACE_FILE_BACKUPS", 3))
+
+# Single-flight coalescing of identical concurrent requests (see utils/single_flight.py)
+REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+
+# Event-loop lag monitor and blocking-call detector (see utils/loop_monitor.py)
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+LOOP_MONITOR_INTERVAL_SECONDS = float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", 0.1))
+# A loop blocked this long gets the blocking code's stack logged
+LOOP_STALL_THRESHOLD_SECONDS = float(os.getenv("LOOP_STALL_THRESHOLD_SECONDS", 0.25))
+# Lag samples kept for the exported percentiles (600 x 0.1s = the last minute)
+LOOP_LAG_WINDOW = int(os.getenv("LOOP_LAG_WINDOW", 600))
+
+# Admin-only profiling and usage endpoints (see utils/profiler.py, routes/system_routes.py); disabled unless ADMIN_API_TOKEN is set
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+# Minimum seconds between CPU profiles, and between memory snapshots
+PROFILING_COOLDOWN_SECONDS = float(os.getenv("PROFILING_COOLDOWN_SECONDS", 60))
+# Longest CPU profile, and longest tracemalloc tracing window
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", 120))
+PROFILING_MAX_SNAPSHOTS = int(os.getenv("PROFILING_MAX_SNAPSHOTS", 5))
+
+# Logging pipeline (see utils/structured_logging.py)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+# Share of INFO/DEBUG records kept per logger prefix, e.g. "app_state=0.2,utils.image_providers=0.5"
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+# INFO/DEBUG records per second allowed from any one logger (0 = unlimited, the default)
+LOG_RATE_LIMIT_PER_SECOND = float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", 0))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+# Per-phase timing on /chat responses (see utils/request_timing.py)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+# Outbound service endpoints; overridden to point at local fakes by benchmarks/load_test.py
+META_GRAPH_API_URL = os.getenv("META_GRAPH_API_URL", "https://graph.facebook.com/v18.0").rstrip("/")
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL", "")
+# Where conversation and usage databases live (default: backend/data, or /home/data on App Service)
+CHAT_DATA_DIR = os.getenv("CHAT_DATA_DIR", "")
+
+# Simulated providers: CHAT/IMAGE/AUDIO_MODEL_PROVIDER=latency-sim (see utils/simulation.py); "fake" ignores latency and errors
+FAKE_SEED = int(os.getenv("FAKE_SEED", 0))
+# Median latency per call; the spread is lognormal with this sigma (0 = fixed)
+FAKE_CHAT_LATENCY_MS = float(os.getenv("FAKE_CHAT_LATENCY_MS", 300))
+FAKE_IMAGE_LATENCY_MS = float(os.getenv("FAKE_IMAGE_LATENCY_MS", 2000))
+FAKE_AUDIO_LATENCY_MS = float(os.getenv("FAKE_AUDIO_LATENCY_MS", 500))
+FAKE_LATENCY_SIGMA = float(os.getenv("FAKE_LATENCY_SIGMA", 0.3))
+# Chat output: tokens per answer, streamed at this rate after the first token
+FAKE_OUTPUT_TOKENS = int(os.getenv("FAKE_OUTPUT_TOKENS", 60))
+FAKE_TOKENS_PER_SECOND = float(os.getenv("FAKE_TOKENS_PER_SECOND", 80))
+# Share of user turns answered with a tool call (to a bound tool named in the message, else a random one)
+FAKE_TOOL_CALL_RATE = float(os.getenv("FAKE_TOOL_CALL_RATE", 0.0))
+# Share of calls failing with a 429 (with Retry-After) and with a 500
+FAKE_RATE_LIMIT_RATE = float(os.getenv("FAKE_RATE_LIMIT_RATE", 0.0))
+FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", 0.0))
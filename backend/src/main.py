@@ -1,8 +1,10 @@
 import os
 import sys
 import asyncio
+import time
+import uuid
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
 from fastapi.staticfiles import StaticFiles
@@ -12,12 +14,17 @@ from contextlib import asynccontextmanager
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import app_state
-from config import APP_NAME
+from config import APP_NAME, CHECKPOINT_RETENTION_INTERVAL_SECONDS, LOOP_MONITOR_ENABLED
+from utils.loop_monitor import monitor as loop_monitor
+from utils.metrics import HTTP_REQUEST_SECONDS
+from utils.structured_logging import request_id
+from utils.tracing import span
 
 # Import the aggregated API router
 from routes import api_router
 
 cleanup_task_ref = None
+retention_task_ref = None
 
 async def background_cleanup_task():
     while True:
@@ -31,18 +38,35 @@ async def background_cleanup_task():
         # Run cleanup every hour (3600 seconds = 1 hour)
         await asyncio.sleep(3600)
 
+async def background_checkpoint_retention_task():
+    while True:
+        try:
+            if app_state.chatbot:
+                await app_state.chatbot.agent.compact_history()
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            app_state.logger.error(f"Checkpoint retention task error: {e}")
+        await asyncio.sleep(CHECKPOINT_RETENTION_INTERVAL_SECONDS)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global cleanup_task_ref
+    global cleanup_task_ref, retention_task_ref
     # Startup: Initialize Chatbot Agent
     if app_state.chatbot:
         await app_state.chatbot.initialize()
         
     cleanup_task_ref = asyncio.create_task(background_cleanup_task())
+    retention_task_ref = asyncio.create_task(background_checkpoint_retention_task())
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
     yield
     # Shutdown: Cleanup
     if cleanup_task_ref:
         cleanup_task_ref.cancel()
+    if retention_task_ref:
+        retention_task_ref.cancel()
+    await loop_monitor.stop()
     if app_state.chatbot and hasattr(app_state.chatbot, 'agent'):
         await app_state.chatbot.agent.cleanup()
 
@@ -57,6 +81,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    # Webhook background tasks run inside this span, so they join the request's trace
+    with span("http.request", traceparent=request.headers.get("traceparent"), method=request.method) as request_span:
+        # Log correlation: the caller's X-Request-ID, else the trace id, else a fresh one
+        rid = request.headers.get("x-request-id") or getattr(request_span, "trace_id", None) or uuid.uuid4().hex
+        request_id.set(rid)
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-ID"] = rid
+            return response
+        finally:
+            # Route templates, not raw paths, keep label cardinality bounded
+            route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method, route=route, status=status)
+            request_span.set_attribute("route", route)
+            request_span.set_attribute("status", status)
+
 # Include the aggregated API router
 app.include_router(api_router)
 
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Request
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 
 import app_state
+from config import SERVER_TIMING_ENABLED
+from utils.admission import PRIORITY_INTERACTIVE, ServiceBusyError, request_priority
+from utils.request_timing import RequestTiming, request_timing
+from utils.usage_ledger import CHANNEL_WEB, request_channel
 
 router = APIRouter()
 
@@ -12,17 +18,30 @@ class ChatRequest(BaseModel):
     message: str
     session_id: str = "web_default"
     reset: bool = False
+    # Include the per-phase timing breakdown in the response body
+    debug: bool = False
 
 class ChatResponse(BaseModel):
     message: str
+    timing: Optional[dict] = None
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+@router.post("/chat", response_model=ChatResponse, response_model_exclude_none=True)
+async def chat_endpoint(request: ChatRequest, http_response: Response):
     if app_state.chatbot is None: raise HTTPException(status_code=503, detail="Service unavailable")
+    timing = RequestTiming()
+    request_timing.set(timing)
     if request.reset: await app_state.chatbot.reset_history(request.session_id)
-    response = await app_state.chatbot.chat(request.message, thread_id=request.session_id)
-    return ChatResponse(message=response)
+    # A person is waiting on this response: queue its model calls ahead of webhooks
+    request_priority.set(PRIORITY_INTERACTIVE)
+    request_channel.set(CHANNEL_WEB)
+    try:
+        response = await app_state.chatbot.chat(request.message, thread_id=request.session_id)
+    except ServiceBusyError as e:
+        raise HTTPException(status_code=503, detail="Service busy, please retry", headers={"Retry-After": str(e.retry_after)})
+    if SERVER_TIMING_ENABLED:
+        http_response.headers["Server-Timing"] = timing.server_timing()
+    return ChatResponse(message=response, timing=timing.as_dict() if request.debug else None)
 
 
 @router.get("/static/generated_images/{filename}")
@@ -2,9 +2,15 @@ import os
 import requests
 import re
 import requests
+import time
 from fastapi import APIRouter, Request, BackgroundTasks, Response
 import app_state
+from config import META_GRAPH_API_URL
 from utils.image_utils import save_base64_image
+from utils.admission import BUSY_MESSAGE, ServiceBusyError
+from utils.usage_ledger import CHANNEL_META, request_channel
+from utils.metrics import OUTBOUND_SEND_SECONDS, QUEUE_WAIT_SECONDS, WEBHOOK_RECEIVED
+from utils.tracing import span
 
 router = APIRouter()
 
@@ -31,11 +37,19 @@ async def meta_whatsapp_webhook(request: Request, background_tasks: BackgroundTa
     except: return {"status": "error"}
     host_url = f"{request.url.scheme}://{request.url.netloc}"
     if "azurewebsites.net" in host_url: host_url = host_url.replace("http://", "https://")
-    background_tasks.add_task(process_meta_whatsapp_background, body, host_url)
+    WEBHOOK_RECEIVED.inc(channel=CHANNEL_META)
+    background_tasks.add_task(process_meta_whatsapp_background, body, host_url, received_at=time.monotonic())
     return {"status": "ok"}
 
-async def process_meta_whatsapp_background(body: dict, host_url: str):
+async def process_meta_whatsapp_background(body: dict, host_url: str, received_at: float = None):
+    with span("meta.background", channel=CHANNEL_META):
+        await _process_meta_whatsapp(body, received_at)
+
+async def _process_meta_whatsapp(body: dict, received_at: float = None):
     app_state.logger.info("Meta background task starting...")
+    if received_at is not None:
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - received_at, channel=CHANNEL_META)
+    request_channel.set(CHANNEL_META)
     try:
         if body.get("object") != "whatsapp_business_account": return
         for entry in body.get("entry", []):
@@ -53,10 +67,15 @@ async def process_meta_whatsapp_background(body: dict, host_url: str):
                             if audio_resp.status_code == 200: 
                                 user_text = app_state.chatbot.transcribe_audio(audio_resp.content)
                     if user_text:
-                        ai_response = await app_state.chatbot.chat(
-                            f"{user_text}\n\n[Instruction: Keep your response under 1500 characters.]",
-                            thread_id=from_number
-                        )
+                        try:
+                            ai_response = await app_state.chatbot.chat(
+                                f"{user_text}\n\n[Instruction: Keep your response under 1500 characters.]",
+                                thread_id=from_number
+                            )
+                        except ServiceBusyError:
+                            app_state.logger.warning(f"Model capacity saturated; sent busy reply to {from_number}")
+                            send_meta_whatsapp_message(from_number, BUSY_MESSAGE)
+                            continue
                             
                         # Check if the AI generated an image (markdown format: ![alt](url))
                         image_match = re.search(r'!\[.*?\]\((.*?)\)', ai_response)
@@ -75,15 +94,23 @@ async def process_meta_whatsapp_background(body: dict, host_url: str):
 def get_meta_media_url(media_id):
     token = os.getenv("WHATSAPP_ACCESS_TOKEN")
     if not token: return None
-    resp = requests.get(f"https://graph.facebook.com/v18.0/{media_id}", headers={"Authorization": f"Bearer {token}"})
+    resp = requests.get(f"{META_GRAPH_API_URL}/{media_id}", headers={"Authorization": f"Bearer {token}"})
     return resp.json().get("url") if resp.status_code == 200 else None
 
 def send_meta_whatsapp_message(to_number, text):
     token = os.getenv("WHATSAPP_ACCESS_TOKEN")
     pid = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
-    if token and pid: requests.post(f"https://graph.facebook.com/v18.0/{pid}/messages", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}, json={"messaging_product": "whatsapp", "to": to_number, "type": "text", "text": {"body": text}})
+    if token and pid: _post_meta_message(f"{META_GRAPH_API_URL}/{pid}/messages", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}, json={"messaging_product": "whatsapp", "to": to_number, "type": "text", "text": {"body": text}})
 
 def send_meta_whatsapp_image(to_number, url):
     token = os.getenv("WHATSAPP_ACCESS_TOKEN")
     pid = os.getenv("WHATSAPP_PHONE_NUMBER_ID")
-    if token and pid: requests.post(f"https://graph.facebook.com/v18.0/{pid}/messages", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}, json={"messaging_product": "whatsapp", "to": to_number, "type": "image", "image": {"link": url}})
+    if token and pid: _post_meta_message(f"{META_GRAPH_API_URL}/{pid}/messages", headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"}, json={"messaging_product": "whatsapp", "to": to_number, "type": "image", "image": {"link": url}})
+
+def _post_meta_message(url, **kwargs):
+    with OUTBOUND_SEND_SECONDS.time(channel=CHANNEL_META, status="ok") as timer, span("meta.send"):
+        response = requests.post(url, **kwargs)
+        status = getattr(response, "status_code", None)
+        if isinstance(status, int) and status >= 400:
+            timer.labels["status"] = "error"
+    return response
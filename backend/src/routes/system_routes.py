@@ -1,9 +1,125 @@
-from fastapi import APIRouter, Response
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 from app_state import APP_NAME
+import app_state
+from config import ADMIN_API_TOKEN
+from utils.metrics import REGISTRY, stats_samples
+from utils.model_registry import ModelRegistry
+from utils.profiler import Cooldown, ProfilerRateLimited, cpu_profiler, memory_profiler
 
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
     """Basic health check endpoint"""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _component_metrics():
+    """Expose the in-process component counters (caches, queues, limiters) as gauges"""
+    families = {}
+
+    def add(prefix, stats, labelnames=(), labels=()):
+        for name, values in stats_samples(prefix, stats, labelnames, labels).items():
+            families.setdefault(name, (labelnames, {}))[1].update(values)
+
+    agent = getattr(app_state.chatbot, "agent", None)
+    if agent is not None and hasattr(agent, "component_stats"):
+        for component, stats in agent.component_stats().items():
+            add(f"chatbot_{component}", stats)
+    for provider, stats in ModelRegistry.concurrency_stats().items():
+        add("chatbot_model_limiter", stats, ("provider",), (provider,))
+    for backend, stats in ModelRegistry.pool_stats().items():
+        add("chatbot_model_backend", stats, ("backend",), (backend,))
+    for name, (labelnames, values) in sorted(families.items()):
+        yield name, "gauge", f"{APP_NAME} component stat", values, labelnames
+
+REGISTRY.add_collector(_component_metrics)
+
+# --- Admin profiling and usage reports (ADMIN_API_TOKEN required) ---
+
+profiling_cooldown = Cooldown()
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_API_TOKEN:
+        # Admin endpoints are off unless an admin token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+def _rate_limit(action: str):
+    try:
+        profiling_cooldown.acquire(action)
+    except ProfilerRateLimited as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+@router.post("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def start_cpu_profile(seconds: float = 30, interval_ms: float = 10):
+    """Start sampling all thread stacks for `seconds` (capped at PROFILING_MAX_SECONDS)"""
+    if cpu_profiler.running:
+        raise HTTPException(status_code=409, detail="A CPU profile is already running")
+    _rate_limit("cpu")
+    cpu_profiler.start(seconds, interval_ms / 1000)
+    return {"status": "running", "seconds": min(seconds, cpu_profiler.max_seconds)}
+
+@router.post("/admin/profile/cpu/stop", dependencies=[Depends(require_admin)])
+async def stop_cpu_profile():
+    await asyncio.to_thread(cpu_profiler.stop)
+    return {"status": "stopped", "samples": cpu_profiler.samples}
+
+@router.get("/admin/profile/cpu", dependencies=[Depends(require_admin)])
+async def get_cpu_profile():
+    """The last profile as collapsed stacks (flamegraph.pl / speedscope input)"""
+    if cpu_profiler.running:
+        raise HTTPException(status_code=409, detail="Profile still running")
+    if cpu_profiler.finished_at is None:
+        raise HTTPException(status_code=404, detail="No CPU profile recorded")
+    return Response(content=cpu_profiler.collapsed(), media_type="text/plain; charset=utf-8",
+                    headers={"Content-Disposition": 'attachment; filename="cpu-profile.folded"'})
+
+@router.post("/admin/profile/memory/snapshot", dependencies=[Depends(require_admin)])
+async def take_memory_snapshot(limit: int = 20, match: Optional[str] = None):
+    """tracemalloc snapshot; the first one starts tracing for up to PROFILING_MAX_SECONDS. `match` filters by file path."""
+    _rate_limit("memory")
+    return await asyncio.to_thread(memory_profiler.snapshot, min(limit, 100), match)
+
+@router.get("/admin/profile/memory/diff", dependencies=[Depends(require_admin)])
+async def diff_memory_snapshots(from_id: Optional[int] = None, to_id: Optional[int] = None, limit: int = 20, match: Optional[str] = None):
+    """Allocation growth between two snapshots (default: oldest to newest)"""
+    _rate_limit("memory_diff")
+    try:
+        return await asyncio.to_thread(memory_profiler.diff, from_id, to_id, min(limit, 100), match)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+@router.delete("/admin/profile/memory", dependencies=[Depends(require_admin)])
+async def stop_memory_profiling():
+    """Drop the snapshots and stop tracemalloc"""
+    memory_profiler.stop()
+    return {"status": "stopped"}
+
+def _usage_ledger():
+    ledger = getattr(getattr(app_state.chatbot, "agent", None), "usage", None)
+    if ledger is None:
+        raise HTTPException(status_code=404, detail="Token usage ledger is disabled")
+    return ledger
+
+@router.get("/admin/usage/threads", dependencies=[Depends(require_admin)])
+async def get_usage_top_threads(day: Optional[str] = None, limit: int = 10):
+    """Threads with the most tokens on `day` (ISO date, default today)"""
+    return await _usage_ledger().top_threads(day, min(limit, 100))
+
+@router.get("/admin/usage/totals", dependencies=[Depends(require_admin)])
+async def get_usage_totals(group_by: str = "day", since: Optional[str] = None):
+    """Token totals grouped by day, channel or route since `since` (ISO date)"""
+    try:
+        return await _usage_ledger().totals(group_by, since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -2,11 +2,17 @@ import os
 import requests
 import re
 import requests
+import time
 from fastapi import APIRouter, Request, Form, Response, BackgroundTasks
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client as TwilioClient
 import app_state
+from config import TWILIO_API_BASE_URL
 from utils.image_utils import save_base64_image
+from utils.admission import BUSY_MESSAGE, ServiceBusyError
+from utils.usage_ledger import CHANNEL_TWILIO, request_channel
+from utils.metrics import OUTBOUND_SEND_SECONDS, QUEUE_WAIT_SECONDS, WEBHOOK_RECEIVED
+from utils.tracing import span
 
 router = APIRouter()
 
@@ -18,13 +24,21 @@ async def twilio_whatsapp_webhook(background_tasks: BackgroundTasks, request: Re
     and dispatches the message to a background task for processing.
     """
     app_state.logger.info(f"Received Twilio message from {From}")
+    WEBHOOK_RECEIVED.inc(channel=CHANNEL_TWILIO)
     host_url = f"{request.url.scheme}://{request.url.netloc}"
     if "azurewebsites.net" in host_url: host_url = host_url.replace("http://", "https://")
-    background_tasks.add_task(process_twilio_whatsapp_background, Body, From, MediaUrl0, MediaContentType0, host_url)
+    background_tasks.add_task(process_twilio_whatsapp_background, Body, From, MediaUrl0, MediaContentType0, host_url, received_at=time.monotonic())
     return Response(content=str(MessagingResponse()), media_type="application/xml")
 
-async def process_twilio_whatsapp_background(body: str, from_number: str, media_url: str, media_type: str, host_url: str):
+async def process_twilio_whatsapp_background(body: str, from_number: str, media_url: str, media_type: str, host_url: str, received_at: float = None):
+    with span("twilio.background", channel=CHANNEL_TWILIO):
+        await _process_twilio_whatsapp(body, from_number, media_url, media_type, received_at)
+
+async def _process_twilio_whatsapp(body: str, from_number: str, media_url: str, media_type: str, received_at: float = None):
     app_state.logger.info(f"Starting Twilio background task for {from_number}")
+    if received_at is not None:
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - received_at, channel=CHANNEL_TWILIO)
+    request_channel.set(CHANNEL_TWILIO)
     try:
         user_text = body or ""
         if media_url and "audio" in media_type:
@@ -45,6 +59,9 @@ async def process_twilio_whatsapp_background(body: str, from_number: str, media_
             send_twilio_reply(from_number, text_without_image, image_url)
         else:
             send_twilio_reply(from_number, ai_response)
+    except ServiceBusyError:
+        app_state.logger.warning(f"Model capacity saturated; sent busy reply to {from_number}")
+        send_twilio_reply(from_number, BUSY_MESSAGE)
     except Exception as e:
         app_state.logger.error(f"Error in Twilio background task: {e}")
         send_twilio_reply(from_number, "Sorry, I encountered an error processing your query.")
@@ -56,18 +73,22 @@ def send_twilio_reply(to_number: str, message_text: str, image_url: str = None):
     if not all([account_sid, auth_token, from_number]):
         app_state.logger.error("CRITICAL: Twilio credentials missing!")
         return
+    timer = OUTBOUND_SEND_SECONDS.time(channel=CHANNEL_TWILIO, status="ok")
     try:
-        client = TwilioClient(account_sid, auth_token)
-        params = {"from_": from_number, "to": to_number}
-        if message_text:
-            params["body"] = message_text
-        if image_url:
-            app_state.logger.info(f"Adding media_url to Twilio params: {image_url}")
-            params["media_url"] = [image_url]
-            
+        with timer, span("twilio.send"):
+            client = TwilioClient(account_sid, auth_token)
+            if TWILIO_API_BASE_URL:
+                client.api.base_url = TWILIO_API_BASE_URL
+            params = {"from_": from_number, "to": to_number}
+            if message_text:
+                params["body"] = message_text
+            if image_url:
+                app_state.logger.info(f"Adding media_url to Twilio params: {image_url}")
+                params["media_url"] = [image_url]
+                
 
-            
-        msg_instance = client.messages.create(**params)
+                
+            msg_instance = client.messages.create(**params)
         app_state.logger.info(f"Twilio background reply sent. SID: {msg_instance.sid}, Status: {msg_instance.status}")
     except Exception as e:
         app_state.logger.error(f"Failed to send Twilio outbound: {str(e)}")
\ No newline at end of file
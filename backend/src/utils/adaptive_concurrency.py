@@ -0,0 +1,198 @@
+import asyncio
+import collections
+import email.utils
+import logging
+import random
+import time
+from typing import Any, Optional
+
+import openai
+
+from config import (
+    MODEL_BACKOFF_BASE_SECONDS,
+    MODEL_BACKOFF_MAX_SECONDS,
+    MODEL_CONCURRENCY_INITIAL,
+    MODEL_ADAPTIVE_CONCURRENCY,
+    MODEL_CLIENT_MAX_RETRIES,
+    MODEL_CONCURRENCY_MAX,
+    MODEL_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Throttles from one burst arrive together; only the first in this window shrinks the limit
+_DECREASE_COOLDOWN_SECONDS = 1.0
+_THROTTLE_STATUS_CODES = {429, 503}
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Delay requested by the server via `retry-after-ms` / `retry-after` headers, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, (asyncio.TimeoutError, openai.APITimeoutError))
+
+
+def is_throttle(exc: BaseException) -> bool:
+    """429/503 responses and timeouts: signs the backend wants less concurrency."""
+    if is_timeout(exc) or isinstance(exc, openai.RateLimitError):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return status in _THROTTLE_STATUS_CODES
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Other 5xx responses and dropped connections: worth retrying, but not a reason to back off concurrency."""
+    if is_throttle(exc):
+        return False
+    if isinstance(exc, openai.APIConnectionError):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+def client_retry_kwargs() -> dict:
+    """`max_retries` for the OpenAI SDK clients built by the chat providers."""
+    if MODEL_CLIENT_MAX_RETRIES != "":
+        return {"max_retries": int(MODEL_CLIENT_MAX_RETRIES)}
+    # The adaptive layer needs to see every 429, so it owns retries when it is on
+    return {"max_retries": 0} if MODEL_ADAPTIVE_CONCURRENCY else {}
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit: +1 per window of successes, halved on throttling."""
+
+    def __init__(self, initial: float = MODEL_CONCURRENCY_INITIAL, min_limit: float = 1,
+                 max_limit: float = MODEL_CONCURRENCY_MAX, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.inflight = 0
+        self._waiters: "collections.deque[asyncio.Future]" = collections.deque()
+        self._last_decrease = 0.0
+        self.counters = {"successes": 0, "throttled": 0, "timeouts": 0, "retries": 0}
+
+    @property
+    def stats(self) -> dict:
+        return {"limit": round(self.limit, 2), "inflight": self.inflight, "waiting": len(self._waiters), **self.counters}
+
+    def _wake(self):
+        while self._waiters and self.inflight < int(self.limit):
+            future = self._waiters.popleft()
+            if not future.done():
+                self.inflight += 1
+                future.set_result(None)
+
+    async def acquire(self):
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        self._wake()
+
+    def on_success(self):
+        self.counters["successes"] += 1
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_throttle(self, timeout: bool = False):
+        self.counters["timeouts" if timeout else "throttled"] += 1
+        now = time.monotonic()
+        if now - self._last_decrease < _DECREASE_COOLDOWN_SECONDS:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        logger.warning(f"Model throttled; concurrency limit lowered to {self.limit:.1f}")
+
+
+class AdaptiveModel:
+    """Wraps a chat model so `ainvoke` runs under an AIMD limit with Retry-After aware retries.
+
+    Throttles (429/503, timeouts) shrink the limit and are retried; other 5xx and
+    connection errors are retried without touching the limit.
+
+    Everything other than `ainvoke` is delegated to the wrapped model.
+    """
+
+    def __init__(self, model: Any, limiter: AdaptiveLimiter, max_retries: int = MODEL_MAX_RETRIES,
+                 backoff_base: float = MODEL_BACKOFF_BASE_SECONDS, backoff_max: float = MODEL_BACKOFF_MAX_SECONDS):
+        self.model = model
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None if the server asked for longer than `backoff_max`."""
+        requested = retry_after_seconds(exc)
+        if requested is not None:
+            if requested > self.backoff_max:
+                return None
+            # Never earlier than asked; spread retries so they don't all land together
+            return requested * random.uniform(1.0, 1.2)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            await self.limiter.acquire()
+            try:
+                result = await self.model.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                throttled = is_throttle(e)
+                if not throttled and not is_transient(e):
+                    raise
+                if throttled:
+                    self.limiter.on_throttle(timeout=is_timeout(e))
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._delay(e, attempt)
+                if delay is None:
+                    logger.warning(f"Model asked to retry after more than {self.backoff_max:.0f}s; giving up")
+                    raise
+                reason = "throttled" if throttled else "failed"
+            else:
+                self.limiter.on_success()
+                return result
+            finally:
+                self.limiter.release()
+            attempt += 1
+            self.limiter.counters["retries"] += 1
+            logger.info(f"Retrying {reason} model call in {delay:.2f}s (attempt {attempt}/{self.max_retries})")
+            await asyncio.sleep(delay)
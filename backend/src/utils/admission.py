@@ -0,0 +1,117 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT_BACKGROUND_SECONDS,
+    LLM_QUEUE_TIMEOUT_INTERACTIVE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0  # web /chat, a person is waiting on the response
+PRIORITY_BACKGROUND = 1  # WhatsApp/SMS webhooks processed in background tasks
+
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+# Reply sent on messaging channels when a call is shed
+BUSY_MESSAGE = "I'm handling a lot of messages right now. Please try again in a minute."
+
+# Set by the routes; read by the admission controller deep inside the graph run
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_BACKGROUND)
+
+
+class ServiceBusyError(Exception):
+    """Raised when a model call cannot be admitted in time. Maps to 503 / a "busy" reply."""
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounds concurrent model calls and queues the rest by priority.
+
+    Up to `max_concurrent` calls run at once. Others wait in a priority queue
+    (interactive before background, FIFO within a class) for at most their class's
+    queue deadline. When `max_queue` calls are already waiting, new ones are
+    rejected immediately instead of piling on, so callers can answer "busy" fast.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE,
+                 queue_timeouts: Optional[dict] = None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeouts = queue_timeouts or {
+            PRIORITY_INTERACTIVE: LLM_QUEUE_TIMEOUT_INTERACTIVE_SECONDS,
+            PRIORITY_BACKGROUND: LLM_QUEUE_TIMEOUT_BACKGROUND_SECONDS,
+        }
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def _grant_next(self):
+        """Hand free slots to the highest-priority live waiters."""
+        while self._waiters and self.active < self.max_concurrent:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    async def acquire(self, priority: Optional[int] = None):
+        priority = request_priority.get() if priority is None else priority
+        if self.active < self.max_concurrent and not self.waiting:
+            self.active += 1
+            self.stats["admitted"] += 1
+            return
+        if self.waiting >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise ServiceBusyError("Model capacity saturated")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.stats["queued"] += 1
+        timeout = self.queue_timeouts.get(priority, LLM_QUEUE_TIMEOUT_BACKGROUND_SECONDS)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # Granted at the deadline: give the slot back
+                self.release()
+            future.cancel()
+            self.stats["timed_out"] += 1
+            logger.warning(f"{PRIORITY_NAMES.get(priority, priority)} model call waited {time.monotonic() - started:.1f}s without a slot")
+            raise ServiceBusyError("Timed out waiting for model capacity")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            future.cancel()
+            raise
+        self.stats["admitted"] += 1
+
+    def release(self):
+        self.active -= 1
+        self._grant_next()
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None):
+        """`async with controller.slot(): await model.ainvoke(...)`"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
@@ -1,7 +1,11 @@
 from utils.model_registry import AudioRegistry
 from utils.audio_providers.azure_whisper import create_azure_whisper_provider
+from utils.audio_providers.simulated_audio import create_fake_audio_provider, create_latency_sim_audio_provider
+from utils.simulation import FAKE_PROVIDER, LATENCY_SIM_PROVIDER
 
 def register_builtin_audio_providers():
     AudioRegistry.register("azure-whisper", create_azure_whisper_provider)
+    AudioRegistry.register(FAKE_PROVIDER, create_fake_audio_provider)
+    AudioRegistry.register(LATENCY_SIM_PROVIDER, create_latency_sim_audio_provider)
 
 register_builtin_audio_providers()
@@ -0,0 +1,35 @@
+import hashlib
+
+from config import FAKE_AUDIO_LATENCY_MS
+from utils.simulation import LatencyProfile, shared_profile
+
+_TRANSCRIPTS = (
+    "What are your opening hours?",
+    "Can I book an appointment for tomorrow?",
+    "How much does a consultation cost?",
+    "Is there parking near you?",
+    "Please draw an image of your shop front.",
+)
+
+
+class SimulatedAudioProvider:
+    """Transcribes any audio to one of a few canned questions, chosen by the audio's content hash."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    def transcribe_audio(self, audio_content) -> str:
+        try:
+            self.profile.block_call()
+        except Exception as e:
+            raise RuntimeError(f"Transcription failed: {str(e)}")
+        digest = hashlib.sha256(bytes(audio_content or b"")).digest()
+        return _TRANSCRIPTS[digest[0] % len(_TRANSCRIPTS)]
+
+
+def create_fake_audio_provider():
+    return SimulatedAudioProvider(LatencyProfile.instant())
+
+
+def create_latency_sim_audio_provider():
+    return SimulatedAudioProvider(shared_profile("audio", FAKE_AUDIO_LATENCY_MS))
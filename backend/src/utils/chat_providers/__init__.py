@@ -1,9 +1,13 @@
 from utils.model_registry import ModelRegistry
 from utils.chat_providers.azure_provider import create_azure_model
 from utils.chat_providers.openai_provider import create_openai_model
+from utils.chat_providers.simulated_provider import create_fake_model, create_latency_sim_model
+from utils.simulation import FAKE_PROVIDER, LATENCY_SIM_PROVIDER
 
 def register_builtin_providers():
     ModelRegistry.register("azure", create_azure_model)
     ModelRegistry.register("openai", create_openai_model)
+    ModelRegistry.register(FAKE_PROVIDER, create_fake_model)
+    ModelRegistry.register(LATENCY_SIM_PROVIDER, create_latency_sim_model)
 
 register_builtin_providers()
@@ -1,8 +1,20 @@
 import os
+from typing import Optional
+
 from langchain_openai import AzureChatOpenAI
 
-def create_azure_model():
+from utils.adaptive_concurrency import client_retry_kwargs
+
+def create_azure_model(deployment: Optional[str] = None, endpoint: Optional[str] = None, api_key: Optional[str] = None):
+    # Overrides are used by the model pool for additional regional deployments
+    overrides = {}
+    if endpoint:
+        overrides["azure_endpoint"] = endpoint
+    if api_key:
+        overrides["api_key"] = api_key
     return AzureChatOpenAI(
-        azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")
+        azure_deployment=deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        **client_retry_kwargs(),
+        **overrides
     )
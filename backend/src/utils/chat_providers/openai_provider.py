@@ -1,5 +1,15 @@
 import os
+from typing import Optional
+
 from langchain_openai import ChatOpenAI
 
-def create_openai_model():
-    return ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o"))
+from utils.adaptive_concurrency import client_retry_kwargs
+
+def create_openai_model(deployment: Optional[str] = None, endpoint: Optional[str] = None, api_key: Optional[str] = None):
+    # `deployment` is the model name here; overrides are used by the model pool
+    overrides = {}
+    if endpoint:
+        overrides["base_url"] = endpoint
+    if api_key:
+        overrides["api_key"] = api_key
+    return ChatOpenAI(model=deployment or os.getenv("OPENAI_MODEL", "gpt-4o"), **client_retry_kwargs(), **overrides)
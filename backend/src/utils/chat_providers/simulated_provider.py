@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from config import (
+    FAKE_CHAT_LATENCY_MS,
+    FAKE_OUTPUT_TOKENS,
+    FAKE_SEED,
+    FAKE_TOKENS_PER_SECOND,
+    FAKE_TOOL_CALL_RATE,
+)
+from utils.simulation import LatencyProfile, seeded_random
+
+_WORDS = (
+    "we are open from nine to five on weekdays and appointments can be booked online or by phone "
+    "our team is happy to help with prices services parking and anything else you need"
+).split()
+
+
+class SimulatedChatModel(BaseChatModel):
+    """Chat model that answers locally with a configurable latency profile.
+
+    Answers are seeded by the conversation, so the same input always gets the
+    same output regardless of call order. After the first-token latency, output
+    is produced at `tokens_per_second` (streamed token by token with `astream`).
+    A `tool_call_rate` share of user turns is answered with a call to one of the
+    bound tools instead.
+    """
+
+    model_name: str = "simulated"
+    profile: Any = None
+    seed: int = FAKE_SEED
+    output_tokens: int = FAKE_OUTPUT_TOKENS
+    tokens_per_second: float = FAKE_TOKENS_PER_SECOND
+    tool_call_rate: float = FAKE_TOOL_CALL_RATE
+
+    @property
+    def _llm_type(self) -> str:
+        return "simulated-chat"
+
+    def bind_tools(self, tools, *, tool_choice: Optional[str] = None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _answer(self, messages: List[BaseMessage], tools: Optional[list]) -> AIMessage:
+        last = messages[-1] if messages else None
+        user_text = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        rng = seeded_random(self.seed, self.model_name, user_text, len(messages))
+        input_tokens = sum(len(str(m.content).split()) for m in messages)
+
+        if tools and isinstance(last, HumanMessage) and rng.random() < self.tool_call_rate:
+            tool = self._pick_tool(tools, user_text, rng)
+            properties = tool.get("parameters", {}).get("properties", {})
+            args = {name: user_text for name in tool.get("parameters", {}).get("required", []) if properties.get(name, {}).get("type") == "string"}
+            return AIMessage(
+                content="",
+                tool_calls=[{"name": tool["name"], "args": args, "id": f"call_{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}"}],
+                usage_metadata={"input_tokens": input_tokens, "output_tokens": 20, "total_tokens": input_tokens + 20},
+            )
+
+        words = [rng.choice(_WORDS) for _ in range(self.output_tokens)]
+        content = " ".join(words).capitalize() + "."
+        if isinstance(last, ToolMessage):
+            # Pass tool output (e.g. an image link) through, as a real model would
+            content = f"{last.content}\n{content}"
+        return AIMessage(content=content, usage_metadata={
+            "input_tokens": input_tokens, "output_tokens": self.output_tokens, "total_tokens": input_tokens + self.output_tokens,
+        })
+
+    @staticmethod
+    def _pick_tool(tools: list, user_text: str, rng) -> dict:
+        functions = [tool["function"] for tool in tools]
+        text = user_text.lower()
+        for function in functions:
+            # e.g. "generate_image" for "... an image of ..."
+            if any(len(part) > 3 and part in text for part in function["name"].lower().split("_")):
+                return function
+        return rng.choice(functions)
+
+    def _streaming_seconds(self, message: AIMessage) -> float:
+        if message.tool_calls or self.tokens_per_second <= 0:
+            return 0.0
+        return self.output_tokens / self.tokens_per_second
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._answer(messages, kwargs.get("tools"))
+        self.profile.block_call(self._streaming_seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._answer(messages, kwargs.get("tools"))
+        await self.profile.await_call(self._streaming_seconds(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage):
+        if message.tool_calls:
+            yield AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": 0} for call in message.tool_calls
+            ], usage_metadata=message.usage_metadata)
+            return
+        tokens = message.content.split(" ")
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            yield AIMessageChunk(content=token if i == 0 else f" {token}", usage_metadata=message.usage_metadata if last else None)
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._answer(messages, kwargs.get("tools"))
+        self.profile.block_call()
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for chunk in self._chunks(message):
+            yield ChatGenerationChunk(message=chunk)
+            if delay and not message.tool_calls:
+                time.sleep(delay)
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._answer(messages, kwargs.get("tools"))
+        await self.profile.await_call()
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for chunk in self._chunks(message):
+            yield ChatGenerationChunk(message=chunk)
+            if delay and not message.tool_calls:
+                await asyncio.sleep(delay)
+
+
+def create_fake_model(deployment: Optional[str] = None, endpoint: Optional[str] = None, api_key: Optional[str] = None):
+    """Instant, deterministic answers; for measuring the app's own overhead."""
+    return SimulatedChatModel(model_name=deployment or "fake", profile=LatencyProfile.instant(), tokens_per_second=0)
+
+
+def create_latency_sim_model(deployment: Optional[str] = None, endpoint: Optional[str] = None, api_key: Optional[str] = None):
+    # Pool backends (distinct deployments) each get their own latency/failure draws
+    return SimulatedChatModel(model_name=deployment or "latency-sim", profile=LatencyProfile(FAKE_CHAT_LATENCY_MS))
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+from config import CHECKPOINT_CACHE_MAX_MB, CHECKPOINT_FLUSH_INTERVAL_SECONDS
+from utils.request_timing import PHASE_CHECKPOINT_LOAD, PHASE_CHECKPOINT_SAVE, timed
+
+logger = logging.getLogger(__name__)
+
+
+class _ThreadState:
+    """Latest checkpoint of one (thread_id, checkpoint_ns) plus what still has to reach SQLite."""
+
+    def __init__(self):
+        self.config = None
+        self.checkpoint = None  # serialized (type, bytes)
+        self.metadata = None
+        self.new_versions: Dict[str, Any] = {}
+        self.writes: Dict[Tuple[str, int], tuple] = {}  # (task_id, idx) -> (task_id, channel, (type, bytes), task_path)
+        self.parent_config = None
+        # Newest checkpoint already in SQLite and the parent it was saved with
+        self.persisted_config = None
+        self.persisted_parent = None
+        self.dirty = False
+        self.version = 0
+        self.size = 0
+
+
+class WriteBehindCheckpointer(BaseCheckpointSaver):
+    """LRU checkpointer that serves hot threads from memory and writes behind to SQLite.
+
+    Reads of the latest checkpoint of a cached thread never touch the database.
+    Writes are kept in memory and flushed by a background task every
+    `flush_interval` seconds, when a thread is evicted, or on `aclose()`.
+    Consecutive checkpoints of a thread between flushes are coalesced: only the
+    newest one (and its pending writes) is persisted, chained to the last
+    persisted checkpoint, so SQLite stays a consistent parent chain.
+    """
+
+    def __init__(self, backing: BaseCheckpointSaver, max_bytes: int = CHECKPOINT_CACHE_MAX_MB * 1024 * 1024,
+                 flush_interval: float = CHECKPOINT_FLUSH_INTERVAL_SECONDS):
+        super().__init__(serde=backing.serde)
+        self.backing = backing
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._threads: "OrderedDict[Tuple[str, str], _ThreadState]" = OrderedDict()
+        self._bytes = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "flushed": 0, "coalesced": 0, "evicted": 0}
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """Start the periodic flush task."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Checkpoint write-behind flush failed: {e}")
+
+    async def aclose(self):
+        """Stop the flush task and persist everything still in memory."""
+        if self._flush_task:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+
+    # --- Cache bookkeeping ---
+
+    @staticmethod
+    def _key(config) -> Tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    def _resize(self, state: _ThreadState):
+        size = len(state.checkpoint[1]) if state.checkpoint else 0
+        size += sum(len(w[2][1]) for w in state.writes.values())
+        self._bytes += size - state.size
+        state.size = size
+
+    async def _evict_over_budget(self, keep: Tuple[str, str]):
+        # Each thread is visited at most once, so concurrent writes cannot keep this looping
+        for _ in range(len(self._threads)):
+            if self._bytes <= self.max_bytes or len(self._threads) <= 1:
+                return
+            key, state = next(iter(self._threads.items()))
+            if key == keep:
+                self._threads.move_to_end(key)
+                continue
+            await self._flush_state(state)
+            if self._threads.get(key) is not state:
+                # Dropped while flushing (evict / adelete_thread); already accounted for
+                continue
+            if state.dirty:
+                # Written to while flushing: keep the newer state, it is hot again
+                self._threads.move_to_end(key)
+                continue
+            self._threads.pop(key)
+            self._bytes -= state.size
+            self.stats["evicted"] += 1
+
+    def evict(self, thread_id: str):
+        """Drop a thread from memory without flushing (used when its history is deleted)."""
+        for key in [k for k in self._threads if k[0] == str(thread_id)]:
+            state = self._threads.pop(key)
+            state.dirty = False
+            self._bytes -= state.size
+
+    # --- Flushing ---
+
+    async def _flush_state(self, state: _ThreadState):
+        async with self._flush_lock:
+            if not state.dirty:
+                return
+            # Snapshot first: aput/aput_writes may change the state while we await SQLite
+            version = state.version
+            configurable = state.config["configurable"]
+            checkpoint, metadata, new_versions = state.checkpoint, state.metadata, dict(state.new_versions)
+            pending = list(state.writes.values())
+
+            persisted_id = state.persisted_config["configurable"]["checkpoint_id"] if state.persisted_config else None
+            if persisted_id == configurable["checkpoint_id"]:
+                # Only new writes for an already persisted checkpoint
+                parent = state.persisted_parent
+            else:
+                parent = {"thread_id": configurable["thread_id"], "checkpoint_ns": configurable["checkpoint_ns"]}
+                if persisted_id:
+                    parent["checkpoint_id"] = persisted_id
+                parent = {"configurable": parent}
+
+            saved = await self.backing.aput(parent, self.serde.loads_typed(checkpoint), metadata, new_versions)
+            by_task: Dict[Tuple[str, str], list] = {}
+            for task_id, channel, value, task_path in pending:
+                by_task.setdefault((task_id, task_path), []).append((channel, self.serde.loads_typed(value)))
+            for (task_id, task_path), writes in by_task.items():
+                await self.backing.aput_writes(saved, writes, task_id, task_path)
+
+            state.persisted_config = saved
+            state.persisted_parent = parent
+            if state.version == version:
+                state.dirty = False
+            self.stats["flushed"] += 1
+
+    async def flush(self):
+        """Persist every dirty thread to the backing saver."""
+        for state in list(self._threads.values()):
+            await self._flush_state(state)
+
+    async def _flush_thread(self, config):
+        if config is None:
+            await self.flush()
+            return
+        state = self._threads.get(self._key(config))
+        if state:
+            await self._flush_state(state)
+
+    # --- BaseCheckpointSaver interface ---
+
+    @timed(PHASE_CHECKPOINT_LOAD)
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        state = self._threads.get(key)
+        checkpoint_id = get_checkpoint_id(config)
+        if state and state.config and (not checkpoint_id or checkpoint_id == state.config["configurable"]["checkpoint_id"]):
+            self._threads.move_to_end(key)
+            self.stats["hits"] += 1
+            return CheckpointTuple(
+                state.config,
+                self.serde.loads_typed(state.checkpoint),
+                state.metadata,
+                state.parent_config,
+                [(task_id, channel, self.serde.loads_typed(value)) for task_id, channel, value, _ in state.writes.values()],
+            )
+        self.stats["misses"] += 1
+        if state:
+            await self._flush_state(state)
+        result = await self.backing.aget_tuple(config)
+        if result is not None and not checkpoint_id and key not in self._threads:
+            self._remember(key, result)
+        return result
+
+    def _remember(self, key, result: CheckpointTuple):
+        state = _ThreadState()
+        state.config = result.config
+        state.checkpoint = self.serde.dumps_typed(result.checkpoint)
+        state.metadata = result.metadata
+        state.parent_config = result.parent_config
+        state.persisted_config = result.config
+        state.persisted_parent = result.parent_config or {"configurable": {"thread_id": key[0], "checkpoint_ns": key[1]}}
+        for idx, (task_id, channel, value) in enumerate(result.pending_writes or []):
+            state.writes[(task_id, WRITES_IDX_MAP.get(channel, idx))] = (task_id, channel, self.serde.dumps_typed(value), "")
+        self._threads[key] = state
+        self._resize(state)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        await self._flush_thread(config)
+        async for item in self.backing.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        key = self._key(config)
+        state = self._threads.get(key)
+        if state is None:
+            state = _ThreadState()
+            self._threads[key] = state
+        elif state.dirty:
+            self.stats["coalesced"] += 1
+        self._threads.move_to_end(key)
+
+        thread_id, checkpoint_ns = key
+        new_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+        parent_id = config["configurable"].get("checkpoint_id")
+        state.parent_config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}} if parent_id else None
+        state.config = new_config
+        state.checkpoint = self.serde.dumps_typed(checkpoint)
+        state.metadata = get_checkpoint_metadata(config, metadata)
+        state.new_versions = {**state.new_versions, **new_versions} if state.dirty else dict(new_versions)
+        # Writes belong to a specific checkpoint; those of a coalesced one are superseded
+        state.writes = {}
+        state.dirty = True
+        state.version += 1
+        self._resize(state)
+        await self._evict_over_budget(keep=key)
+        return new_config
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        key = self._key(config)
+        state = self._threads.get(key)
+        checkpoint_id = config["configurable"].get("checkpoint_id")
+        if state is None or state.config is None or state.config["configurable"]["checkpoint_id"] != checkpoint_id:
+            # Writes for a checkpoint that is not the cached head go straight to SQLite
+            if state:
+                await self._flush_state(state)
+            await self.backing.aput_writes(config, writes, task_id, task_path)
+            return
+        for idx, (channel, value) in enumerate(writes):
+            inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+            if inner_key[1] >= 0 and inner_key in state.writes:
+                continue
+            state.writes[inner_key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+        state.dirty = True
+        state.version += 1
+        self._resize(state)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        # Under the flush lock, so a flush already in flight cannot re-insert rows after the delete
+        async with self._flush_lock:
+            self.evict(thread_id)
+            await self.backing.adelete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.backing.get_next_version(current, channel)
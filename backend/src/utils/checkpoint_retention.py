@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Awaitable, Callable, List, Optional
+from uuid import UUID
+
+from config import (
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_RETENTION_BATCH_SIZE,
+    CHECKPOINT_THREAD_TTL_HOURS,
+    CHECKPOINT_VACUUM_PAGES,
+)
+from utils.message_log import MessageLogCheckpointer
+
+logger = logging.getLogger(__name__)
+
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_id_at(timestamp: float) -> str:
+    """Smallest uuid6 checkpoint id that LangGraph could generate at `timestamp`.
+
+    Checkpoint ids are uuid6, whose string form sorts by creation time, so idle
+    threads can be found by comparing ids without deserialising any checkpoint.
+    """
+    ticks = int(timestamp * 10_000_000) + _UUID_EPOCH_OFFSET
+    uuid_int = ((ticks >> 12) & 0xFFFFFFFFFFFF) << 80
+    uuid_int |= ((6 << 12) | (ticks & 0x0FFF)) << 64
+    uuid_int |= 0x8000 << 48
+    return str(UUID(int=uuid_int))
+
+
+class CheckpointRetention:
+    """Prunes and compacts a LangGraph SQLite checkpoint database.
+
+    Works in small batches of threads, each in its own short transaction under the
+    saver's lock, and yields to the event loop between batches so live checkpoint
+    reads and writes are never held up for long.
+
+    Expired threads are removed with `delete_thread` when given (e.g. the
+    write-behind cache's `adelete_thread`, so cached state goes with them);
+    otherwise their rows are deleted directly. Message-log databases only keep
+    one head per thread, so they are expired but never pruned.
+    """
+
+    def __init__(self, saver, keep_last: int = CHECKPOINT_KEEP_LAST, idle_ttl_hours: float = CHECKPOINT_THREAD_TTL_HOURS,
+                 batch_size: int = CHECKPOINT_RETENTION_BATCH_SIZE, vacuum_pages: int = CHECKPOINT_VACUUM_PAGES,
+                 delete_thread: Optional[Callable[[str], Awaitable[None]]] = None):
+        self.saver = saver
+        self.delete_thread = delete_thread
+        self.message_log = isinstance(saver, MessageLogCheckpointer)
+        self.keep_last = keep_last
+        self.idle_ttl_hours = idle_ttl_hours
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+
+    async def _fetch_thread_ids(self, query: str, params: tuple) -> List[str]:
+        async with self.saver.lock:
+            async with self.saver.conn.execute(query, params) as cur:
+                return [row[0] for row in await cur.fetchall()]
+
+    async def _delete_in_batch(self, statements: List[tuple]) -> int:
+        deleted = 0
+        async with self.saver.lock:
+            try:
+                for query, params in statements:
+                    cur = await self.saver.conn.execute(query, params)
+                    deleted += max(cur.rowcount, 0)
+                await self.saver.conn.commit()
+            except Exception:
+                await self.saver.conn.rollback()
+                raise
+        # Let live traffic in between batches
+        await asyncio.sleep(0)
+        return deleted
+
+    async def prune_old_checkpoints(self) -> int:
+        """Keep only the latest `keep_last` checkpoints per thread and drop their orphaned writes."""
+        if self.keep_last <= 0 or self.message_log:
+            return 0
+        total = 0
+        while True:
+            thread_ids = await self._fetch_thread_ids(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id, checkpoint_ns HAVING COUNT(*) > ? LIMIT ?",
+                (self.keep_last, self.batch_size),
+            )
+            if not thread_ids:
+                return total
+            placeholders = ",".join("?" * len(thread_ids))
+            total += await self._delete_in_batch([
+                (
+                    f"""DELETE FROM checkpoints WHERE rowid IN (
+                        SELECT rowid FROM (
+                            SELECT rowid, ROW_NUMBER() OVER (
+                                PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                            ) AS rn
+                            FROM checkpoints WHERE thread_id IN ({placeholders})
+                        ) WHERE rn > ?
+                    )""",
+                    (*thread_ids, self.keep_last),
+                ),
+                (
+                    f"""DELETE FROM writes WHERE thread_id IN ({placeholders}) AND NOT EXISTS (
+                        SELECT 1 FROM checkpoints c
+                        WHERE c.thread_id = writes.thread_id
+                          AND c.checkpoint_ns = writes.checkpoint_ns
+                          AND c.checkpoint_id = writes.checkpoint_id
+                    )""",
+                    tuple(thread_ids),
+                ),
+            ])
+
+    async def expire_idle_threads(self) -> int:
+        """Delete every checkpoint and write of threads idle for longer than the TTL."""
+        if self.idle_ttl_hours <= 0:
+            return 0
+        cutoff = checkpoint_id_at(time.time() - self.idle_ttl_hours * 3600)
+        if self.message_log:
+            heads, tables = "thread_heads", ("thread_heads", "head_writes", "message_log", "message_snapshots")
+        else:
+            heads, tables = "checkpoints", ("checkpoints", "writes")
+        expired = 0
+        while True:
+            thread_ids = await self._fetch_thread_ids(
+                f"SELECT thread_id FROM {heads} GROUP BY thread_id HAVING MAX(checkpoint_id) < ? LIMIT ?",
+                (cutoff, self.batch_size),
+            )
+            if not thread_ids:
+                return expired
+            if self.delete_thread is not None:
+                for thread_id in thread_ids:
+                    await self.delete_thread(thread_id)
+            else:
+                placeholders = ",".join("?" * len(thread_ids))
+                await self._delete_in_batch([
+                    (f"DELETE FROM {table} WHERE thread_id IN ({placeholders})", tuple(thread_ids)) for table in tables
+                ])
+            expired += len(thread_ids)
+
+    async def incremental_vacuum(self) -> int:
+        """Return free pages to the filesystem a batch at a time. Returns pages freed."""
+        async with self.saver.lock:
+            async with self.saver.conn.execute("PRAGMA auto_vacuum") as cur:
+                mode = (await cur.fetchone())[0]
+        if mode != 2:
+            logger.info("Checkpoint database is not in incremental auto_vacuum mode; run `backend/scripts/checkpoint_maintenance.py convert-vacuum` offline to enable it")
+            return 0
+        freed = 0
+        while True:
+            async with self.saver.lock:
+                async with self.saver.conn.execute("PRAGMA freelist_count") as cur:
+                    before = (await cur.fetchone())[0]
+                if before == 0:
+                    return freed
+                # The pragma frees one page per step, so it must be fully consumed
+                async with self.saver.conn.execute(f"PRAGMA incremental_vacuum({self.vacuum_pages})") as cur:
+                    await cur.fetchall()
+                await self.saver.conn.commit()
+                async with self.saver.conn.execute("PRAGMA freelist_count") as cur:
+                    after = (await cur.fetchone())[0]
+            if after >= before:
+                return freed
+            freed += before - after
+            await asyncio.sleep(0)
+
+    async def run_once(self) -> dict:
+        """Run a full retention pass and return what was removed."""
+        stats = {
+            "expired_threads": await self.expire_idle_threads(),
+            "pruned_rows": await self.prune_old_checkpoints(),
+            "vacuumed_pages": await self.incremental_vacuum(),
+        }
+        logger.info(f"Checkpoint retention finished: {stats}")
+        return stats
+
+
+def convert_to_incremental_vacuum(db_path: str):
+    """One-off, blocking conversion of an existing database to auto_vacuum=INCREMENTAL.
+
+    Rewrites the whole file, so run it while the app is stopped.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
@@ -0,0 +1,146 @@
+import logging
+import sqlite3
+import zlib
+from contextlib import closing
+from typing import Any, Dict, Tuple
+
+import ormsgpack
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from config import CHECKPOINT_COMPRESSION, CHECKPOINT_COMPRESSION_MIN_BYTES
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Frozen raw-content dictionary: the msgpack-encoded keys and class paths that repeat in
+# every serialized LangChain message. Never edit it in place; existing blobs need the
+# exact bytes to decompress. Add a _DICTIONARY_V2 and a new codec name instead.
+_DICTIONARY_V1 = ormsgpack.packb([
+    "channel_values", "channel_versions", "versions_seen", "updated_channels", "messages",
+    "langchain_core.messages.human", "HumanMessage", "langchain_core.messages.ai", "AIMessage",
+    "langchain_core.messages.tool", "ToolMessage", "langchain_core.messages.system", "SystemMessage",
+    "content", "additional_kwargs", "response_metadata", "type", "human", "ai", "tool", "system",
+    "name", "id", "tool_calls", "invalid_tool_calls", "usage_metadata", "tool_call_id", "artifact",
+    "status", "success", "args", "model_validate_json", "token_usage", "completion_tokens",
+    "prompt_tokens", "total_tokens", "input_tokens", "output_tokens", "model_name", "finish_reason",
+    "stop", "system_fingerprint", "logprobs", "generate_image", "send_twilio_sms",
+    "send_whatsapp_message", "prompt", "to_number", "message_body", "![Generated Image](",
+    "/static/generated_images/", "[Instruction: Keep your response under 1500 characters.]",
+])
+
+_TYPE_PREFIX = "compact/"
+
+
+class _ZlibCodec:
+    name = "zlib-d1"
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = zlib.compressobj(level=6, zdict=_DICTIONARY_V1)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = zlib.decompressobj(zdict=_DICTIONARY_V1)
+        return decompressor.decompress(data) + decompressor.flush()
+
+
+class _ZstdCodec:
+    name = "zstd-d1"
+
+    def __init__(self):
+        self._dict = zstandard.ZstdCompressionDict(_DICTIONARY_V1, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(level=3, dict_data=self._dict).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor(dict_data=self._dict).decompress(data)
+
+
+def _available_codecs() -> Dict[str, Any]:
+    codecs = {_ZlibCodec.name: _ZlibCodec()}
+    if zstandard is not None:
+        codecs[_ZstdCodec.name] = _ZstdCodec()
+    return codecs
+
+
+class CompactSerializer:
+    """Checkpoint serializer: msgpack (via JsonPlusSerializer) + dictionary compression.
+
+    - Payloads above `min_bytes` are compressed with zstd or zlib using a frozen dictionary
+      of the field names every LangChain message repeats.
+    - The codec is recorded in the type tag (`compact/<codec>/<inner type>`), and rows
+      written by the default serializer (plain inner type tags) still load unchanged.
+    """
+
+    def __init__(self, compression: str = CHECKPOINT_COMPRESSION, min_bytes: int = CHECKPOINT_COMPRESSION_MIN_BYTES, inner: Any = None):
+        self.inner = inner or JsonPlusSerializer()
+        self.codecs = _available_codecs()
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; falling back to zlib checkpoint compression")
+            compression = "zlib"
+        self.codec = {"zstd": self.codecs.get(_ZstdCodec.name), "zlib": self.codecs[_ZlibCodec.name]}.get(compression)
+        self.min_bytes = min_bytes
+
+    # --- SerializerProtocol ---
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(obj)
+        if self.codec is None or len(data) < self.min_bytes:
+            return f"{_TYPE_PREFIX}raw/{type_}", data
+        return f"{_TYPE_PREFIX}{self.codec.name}/{type_}", self.codec.compress(data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if not type_.startswith(_TYPE_PREFIX):
+            # Written by the default serializer before this one was enabled
+            return self.inner.loads_typed(data)
+        codec_name, inner_type = type_[len(_TYPE_PREFIX):].split("/", 1)
+        if codec_name != "raw":
+            codec = self.codecs.get(codec_name)
+            if codec is None:
+                raise ValueError(f"Checkpoint was written with unavailable codec '{codec_name}'")
+            payload = codec.decompress(payload)
+        return self.inner.loads_typed((inner_type, payload))
+
+
+def migrate_serialization(db_path: str, serde: CompactSerializer, to: str = "compact", batch_size: int = 500) -> int:
+    """Offline: rewrite checkpoint and write blobs between the default and compact formats.
+
+    `to="compact"` converts default rows with `serde`; `to="default"` converts compact rows
+    back so the app can run with CHECKPOINT_SERDE=default. Rows already in the target format
+    are skipped, so it can be re-run safely. Returns rows rewritten.
+    """
+    if to == "compact":
+        selected, convert = "NOT LIKE", lambda type_, blob: serde.dumps_typed(serde.inner.loads_typed((type_, blob)))
+    elif to == "default":
+        selected, convert = "LIKE", lambda type_, blob: serde.inner.dumps_typed(serde.loads_typed((type_, blob)))
+    else:
+        raise ValueError(f"Unknown serialization format '{to}'")
+    migrated = 0
+    with closing(sqlite3.connect(db_path)) as conn:
+        for table, blob_column, keys in [
+            ("checkpoints", "checkpoint", ["thread_id", "checkpoint_ns", "checkpoint_id"]),
+            ("writes", "value", ["thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx"]),
+        ]:
+            where = " AND ".join(f"{k} = ?" for k in keys)
+            while True:
+                # Migrated rows stop matching, so each batch re-queries from the start
+                rows = conn.execute(
+                    f"SELECT {', '.join(keys)}, type, {blob_column} FROM {table} "
+                    f"WHERE type IS NOT NULL AND type {selected} '{_TYPE_PREFIX}%' LIMIT ?", (batch_size,)
+                ).fetchall()
+                if not rows:
+                    break
+                updates = []
+                for *key, type_, blob in rows:
+                    new_type, new_blob = convert(type_, blob)
+                    updates.append((new_type, new_blob, *key))
+                conn.executemany(f"UPDATE {table} SET type = ?, {blob_column} = ? WHERE {where}", updates)
+                conn.commit()
+                migrated += len(updates)
+    logger.info(f"Migrated {migrated} checkpoint rows in {db_path} to the {to} format")
+    return migrated
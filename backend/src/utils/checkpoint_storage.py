@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from config import SQLITE_READER_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Applied to every connection. synchronous=NORMAL in WAL mode only fsyncs at WAL
+# checkpoints instead of every commit, which roughly halves the cost of a checkpoint
+# write (see benchmarks/bench_checkpoints.py). Page cache and mmap sizing made no
+# measurable difference at checkpoint database sizes and are left at SQLite's defaults.
+SQLITE_PRAGMAS = {
+    # Only takes effect on a new database; lets retention reclaim space incrementally
+    "auto_vacuum": "INCREMENTAL",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    # Readers and retention use their own connections; wait for the writer instead of failing
+    "busy_timeout": 5000,
+}
+
+
+async def open_sqlite_connection(db_path: str, readonly: bool = False) -> aiosqlite.Connection:
+    """Open an aiosqlite connection with the tuned pragmas applied."""
+    conn = await aiosqlite.connect(db_path)
+    for pragma, value in SQLITE_PRAGMAS.items():
+        await conn.execute(f"PRAGMA {pragma}={value}")
+    if readonly:
+        await conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class PooledSqliteSaver(AsyncSqliteSaver):
+    """AsyncSqliteSaver with one writer connection and a pool of reader connections.
+
+    Writes keep going through `self.conn` under the saver lock, exactly as upstream.
+    Reads (`aget_tuple`, `alist`) borrow a reader connection so they no longer queue
+    behind checkpoint writes of other threads.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, readers: Optional[List[aiosqlite.Connection]] = None, *, serde: Any = None):
+        super().__init__(conn, serde=serde)
+        self.readers = list(readers or [])
+        self._reader_savers = []
+        self._reader_pool: asyncio.Queue = asyncio.Queue()
+        for reader in self.readers:
+            saver = AsyncSqliteSaver(reader, serde=self.serde)
+            # The writer creates the schema; readers are query_only
+            saver.is_setup = True
+            self._reader_savers.append(saver)
+            self._reader_pool.put_nowait(saver)
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await super().setup()
+        for reader in self._reader_savers:
+            reader._has_task_path = self._has_task_path
+
+    async def aget_tuple(self, config):
+        if not self.readers:
+            return await super().aget_tuple(config)
+        await self.setup()
+        reader = await self._reader_pool.get()
+        try:
+            return await reader.aget_tuple(config)
+        finally:
+            self._reader_pool.put_nowait(reader)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None) -> AsyncIterator:
+        if not self.readers:
+            async for item in super().alist(config, filter=filter, before=before, limit=limit):
+                yield item
+            return
+        await self.setup()
+        reader = await self._reader_pool.get()
+        try:
+            # Fetch everything first: a reader held across yields is blocked for as long as the caller iterates
+            items = [item async for item in reader.alist(config, filter=filter, before=before, limit=limit)]
+        finally:
+            self._reader_pool.put_nowait(reader)
+        for item in items:
+            yield item
+
+    async def aclose(self):
+        """Close the reader pool and the writer connection."""
+        for conn in [*self.readers, self.conn]:
+            try:
+                await conn.close()
+            except Exception as e:
+                logger.debug(f"Ignored error closing sqlite connection: {e}")
+        self.readers = []
+
+
+async def create_checkpointer(db_path: str, reader_pool_size: int = SQLITE_READER_POOL_SIZE, serde: Any = None) -> PooledSqliteSaver:
+    """Create a set-up PooledSqliteSaver for `db_path`."""
+    writer = await open_sqlite_connection(db_path)
+    readers = [await open_sqlite_connection(db_path, readonly=True) for _ in range(reader_pool_size)]
+    saver = PooledSqliteSaver(writer, readers, serde=serde)
+    await saver.setup()
+    return saver
@@ -0,0 +1,90 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from config import FAQ_MATCH_THRESHOLD
+from utils.response_cache import split_instructions, tokenize
+
+logger = logging.getLogger(__name__)
+
+# "### Q: question" followed by "A: answer" up to the next blank line or heading
+_FAQ_RE = re.compile(r"^###\s*Q:\s*(?P<question>.+?)\s*\n+A:\s*(?P<answer>.+?)\s*(?=\n\s*\n|\n#|\Z)", re.M | re.S)
+
+
+def parse_faq(content: str) -> List[Tuple[str, str]]:
+    """(question, answer) pairs from the `### Q:` / `A:` entries of a knowledge base."""
+    return [(m.group("question").strip(), m.group("answer").strip()) for m in _FAQ_RE.finditer(content)]
+
+
+class FaqMatcher:
+    """Answers knowledge-base FAQ questions directly, without a model call.
+
+    At construction every FAQ question becomes a normalised TF-IDF vector stored
+    in an inverted index (token -> [(faq, weight)]), so matching a message only
+    touches the postings of its own tokens. The best FAQ wins if its cosine
+    score reaches `threshold`.
+    """
+
+    def __init__(self, entries: List[Tuple[str, str]], threshold: float = FAQ_MATCH_THRESHOLD):
+        self.entries = entries
+        self.threshold = threshold
+        self.stats = {"hits": 0, "misses": 0}
+        documents = [Counter(tokenize(question)) for question, _ in entries]
+        df = Counter(token for doc in documents for token in doc)
+        total = len(documents)
+        self._idf = {token: math.log((1 + total) / (1 + count)) + 1 for token, count in df.items()}
+        # Tokens no FAQ uses weigh the most, so extra specifics push a message below the threshold
+        self._default_idf = math.log(1 + total) + 1
+        self._index: Dict[str, List[Tuple[int, float]]] = {}
+        for position, doc in enumerate(documents):
+            for token, weight in self._normalise(doc).items():
+                self._index.setdefault(token, []).append((position, weight))
+
+    @classmethod
+    def from_knowledge_base(cls, content: str, **kwargs) -> "FaqMatcher":
+        entries = parse_faq(content)
+        logger.info(f"FAQ fast path indexed {len(entries)} entries")
+        return cls(entries, **kwargs)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _normalise(self, counts: Counter) -> Dict[str, float]:
+        vector = {token: count * self._idf.get(token, self._default_idf) for token, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {token: v / norm for token, v in vector.items()} if norm else {}
+
+    def score(self, message: str) -> Tuple[Optional[int], float]:
+        """Best matching FAQ index and its cosine score."""
+        question, _ = split_instructions(message)
+        scores: Dict[int, float] = {}
+        for token, weight in self._normalise(Counter(tokenize(question))).items():
+            for position, doc_weight in self._index.get(token, ()):
+                scores[position] = scores.get(position, 0.0) + weight * doc_weight
+        if not scores:
+            return None, 0.0
+        best = max(scores, key=scores.get)
+        return best, scores[best]
+
+    def match(self, message: str, count_hit: bool = True) -> Optional[str]:
+        """The FAQ answer for `message`, or None below the threshold.
+
+        Callers that may still reject the answer pass `count_hit=False` and call
+        `record_hit()` once it is served.
+        """
+        position, score = self.score(message)
+        if position is None or score < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        if count_hit:
+            self.record_hit()
+        logger.debug(f"FAQ fast path hit ({score:.2f}): {self.entries[position][0]}")
+        return self.entries[position][1]
+
+    def record_hit(self):
+        """Count a match returned by `match(count_hit=False)` that was served."""
+        self.stats["hits"] += 1
@@ -1,7 +1,11 @@
 from utils.model_registry import ImageRegistry
 from utils.image_providers.azure_flux import create_azure_flux_provider
+from utils.image_providers.simulated_image import create_fake_image_provider, create_latency_sim_image_provider
+from utils.simulation import FAKE_PROVIDER, LATENCY_SIM_PROVIDER
 
 def register_builtin_image_providers():
     ImageRegistry.register("azure-flux", create_azure_flux_provider)
+    ImageRegistry.register(FAKE_PROVIDER, create_fake_image_provider)
+    ImageRegistry.register(LATENCY_SIM_PROVIDER, create_latency_sim_image_provider)
 
 register_builtin_image_providers()
@@ -0,0 +1,39 @@
+import base64
+import hashlib
+import io
+import logging
+
+from PIL import Image
+
+from config import FAKE_IMAGE_LATENCY_MS
+from utils.simulation import LatencyProfile, shared_profile
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatedImageProvider:
+    """Returns a small JPEG whose colour is derived from the prompt, after the profile's latency."""
+
+    def __init__(self, profile: LatencyProfile, size: int = 256):
+        self.profile = profile
+        self.size = size
+
+    def generate_image(self, prompt: str) -> str:
+        try:
+            self.profile.block_call()
+        except Exception as e:
+            logger.error(f"Image generation failed: {str(e)}")
+            raise RuntimeError(f"Image generation failed: {str(e)}")
+
+        colour = tuple(hashlib.sha256(prompt.encode()).digest()[:3])
+        buffer = io.BytesIO()
+        Image.new("RGB", (self.size, self.size), colour).save(buffer, "JPEG")
+        return f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def create_fake_image_provider():
+    return SimulatedImageProvider(LatencyProfile.instant())
+
+
+def create_latency_sim_image_provider():
+    return SimulatedImageProvider(shared_profile("image", FAKE_IMAGE_LATENCY_MS))
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Optional
+
+from config import (
+    LOOP_LAG_WINDOW,
+    LOOP_MONITOR_INTERVAL_SECONDS,
+    LOOP_STALL_THRESHOLD_SECONDS,
+)
+from utils.metrics import LOOP_LAG_SECONDS, LOOP_STALLS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and catches the code that blocks the loop.
+
+    A task on the loop sleeps `interval` seconds at a time; how late it wakes up
+    is the lag. A watchdog thread checks the task's heartbeat, and when the loop
+    has not run for `threshold` seconds it captures the loop thread's stack,
+    which is the blocking call itself.
+    """
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_SECONDS, threshold: float = LOOP_STALL_THRESHOLD_SECONDS,
+                 window: int = LOOP_LAG_WINDOW, max_stalls: int = 20):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: deque = deque(maxlen=window)
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self._beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._open_stall: Optional[dict] = None
+
+    def start(self):
+        """Start the lag task on the running loop and the watchdog thread."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, self.interval * 2)
+            self._watchdog = None
+
+    async def _measure(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._beat = time.monotonic()
+            self._lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            stall = self._open_stall
+            if stall is not None:
+                # The loop is running again: record how long it was blocked in total
+                self._open_stall = None
+                stall["blocked_seconds"] = round(lag + self.interval, 3)
+                logger.warning(f"Event loop was blocked for {stall['blocked_seconds']}s")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            blocked = time.monotonic() - self._beat - self.interval
+            if blocked < self.threshold or self._open_stall is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            stall = {"at": time.time(), "blocked_seconds": round(blocked, 3), "stack": stack}
+            self._open_stall = stall
+            self.stalls.append(stall)
+            LOOP_STALLS.inc()
+            logger.warning(f"Event loop blocked for over {self.threshold}s, loop thread stack:\n{stack}")
+
+    def percentiles(self) -> Dict[float, float]:
+        """Lag quantiles, in seconds, over the recent window."""
+        lags = sorted(self._lags)
+        if not lags:
+            return {}
+        return {q: lags[min(len(lags) - 1, int(q * len(lags)))] for q in QUANTILES}
+
+    def recent_stalls(self) -> List[dict]:
+        return list(self.stalls)
+
+
+monitor = LoopLagMonitor()
+
+REGISTRY.gauge("event_loop_lag_quantile_seconds", "Event loop lag percentiles over the recent window", ("quantile",),
+               callback=lambda: {(str(q),): value for q, value in monitor.percentiles().items()})
@@ -1,18 +1,24 @@
 import logging
 import asyncio
 from contextlib import AsyncExitStack
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from langchain_core.tools import StructuredTool
+from langchain_core.tools import InjectedToolCallId, StructuredTool
 from pydantic import BaseModel, Field, create_model
 
+from utils.tool_cache import ToolResultCache
+from utils.metrics import TOOL_CALL_SECONDS
+from utils.request_timing import PHASE_TOOL, measure
+from utils.tracing import current_traceparent, span
+
 class MCPClient:
-    def __init__(self, command: str, args: List[str], env: Optional[dict] = None):
+    def __init__(self, command: str, args: List[str], env: Optional[dict] = None, cache: Optional[ToolResultCache] = None):
         self.command = command
         self.args = args
         self.env = env
+        self.cache = cache or ToolResultCache()
         self.session: Optional[ClientSession] = None
         self.exit_stack = AsyncExitStack()
 
@@ -32,6 +38,17 @@ class MCPClient:
         )
         await self.session.initialize()
     
+    async def _call_tool(self, tool_name: str, arguments: dict) -> str:
+        traceparent = current_traceparent()
+        if traceparent:
+            # The MCP server continues the trace from the request metadata
+            result = await self.session.call_tool(tool_name, arguments=arguments, meta={"traceparent": traceparent})
+        else:
+            result = await self.session.call_tool(tool_name, arguments=arguments)
+        if result.isError:
+            return f"Error: {result.content}"
+        return result.content[0].text
+
     async def get_tools(self) -> List[StructuredTool]:
         if not self.session:
             await self.initialize()
@@ -40,17 +57,23 @@ class MCPClient:
         langchain_tools = []
 
         for tool in mcp_tools.tools:
-            async def call_tool(tool_name=tool.name, **kwargs):
-                result = await self.session.call_tool(tool_name, arguments=kwargs)
-                if result.isError:
-                    return f"Error: {result.content}"
-                return result.content[0].text
+            async def call_tool(tool_name=tool.name, tool_call_id=None, **kwargs):
+                with TOOL_CALL_SECONDS.time(tool=tool_name, status="ok") as timer, span("mcp.tool", tool=tool_name) as tool_span, measure(PHASE_TOOL):
+                    result = await self.cache.run(tool_name, kwargs, lambda: self._call_tool(tool_name, kwargs), call_id=tool_call_id)
+                    if isinstance(result, str) and result.startswith("Error"):
+                        timer.labels["status"] = "tool_error"
+                        tool_span.set_attribute("tool_error", True)
+                    return result
 
             # Create Pydantic model for args dynamically
             fields = {
                 k: (str, Field(description=v.get("description", ""))) 
                 for k, v in tool.inputSchema.get("properties", {}).items()
             }
+            policy = self.cache.policies.get(tool.name)
+            if policy is not None and policy.side_effect:
+                # Idempotency is keyed on the model's tool call, so only retries of that call collapse
+                fields["tool_call_id"] = (Annotated[str, InjectedToolCallId], ...)
             ArgsModel = create_model(f"{tool.name}Args", **fields)
 
             langchain_tools.append(StructuredTool.from_function(
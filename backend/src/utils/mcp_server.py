@@ -1,4 +1,5 @@
 from mcp.server.fastmcp import FastMCP
+import functools
 import sys
 import os
 
@@ -14,7 +15,8 @@ if parent_dir not in sys.path:
 
 from tools.communication import send_twilio_sms, send_whatsapp_message
 from tools.media import generate_image
-from config import APP_NAME
+from config import APP_NAME, LOG_LEVEL
+from utils.tracing import configure_tracing, span
 
 # Trigger provider registration
 import utils.image_providers
@@ -22,7 +24,32 @@ import utils.audio_providers
 import utils.chat_providers
 
 # Initialize FastMCP Server
-mcp = FastMCP(f"{APP_NAME} Communication Server")
+# FastMCP logs every request at INFO; follow the backend's LOG_LEVEL instead
+mcp = FastMCP(f"{APP_NAME} Communication Server", log_level=LOG_LEVEL.upper())
+
+# Spans from this process go to their own file and join the backend's traces
+configure_tracing("mcp-server")
+
+def _request_traceparent():
+    """traceparent the client sent in the tool call's _meta, if any."""
+    try:
+        meta = mcp.get_context().request_context.meta
+    except (LookupError, ValueError):
+        return None
+    if meta is None:
+        return None
+    return (meta.model_extra or {}).get("traceparent")
+
+def _traced(tool):
+    @functools.wraps(tool)
+    def wrapper(*args, **kwargs):
+        with span(f"tool.{tool.__name__}", traceparent=_request_traceparent()):
+            return tool(*args, **kwargs)
+    return wrapper
+
+send_twilio_sms = _traced(send_twilio_sms)
+send_whatsapp_message = _traced(send_whatsapp_message)
+generate_image = _traced(generate_image)
 
 # Register Tools
 mcp.add_tool(send_twilio_sms)
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+import aiosqlite
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from config import MESSAGE_LOG_SNAPSHOT_EVERY
+from utils.checkpoint_storage import open_sqlite_connection
+from utils.request_timing import PHASE_CHECKPOINT_LOAD, PHASE_CHECKPOINT_SAVE, timed
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LOG_SCHEMA = [
+    # Append-only: one row per message, never rewritten
+    """CREATE TABLE IF NOT EXISTS message_log (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', seq INTEGER NOT NULL,
+        type TEXT, message BLOB, PRIMARY KEY (thread_id, checkpoint_ns, seq))""",
+    # Latest snapshot of the full message list, so rebuilds only replay the log tail
+    """CREATE TABLE IF NOT EXISTS message_snapshots (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', seq INTEGER NOT NULL,
+        type TEXT, messages BLOB, PRIMARY KEY (thread_id, checkpoint_ns))""",
+    # Newest checkpoint per thread with `messages` stripped out
+    """CREATE TABLE IF NOT EXISTS thread_heads (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL,
+        parent_checkpoint_id TEXT, message_count INTEGER, snapshot_seq INTEGER NOT NULL DEFAULT 0,
+        type TEXT, checkpoint BLOB, metadata BLOB, PRIMARY KEY (thread_id, checkpoint_ns))""",
+    """CREATE TABLE IF NOT EXISTS head_writes (
+        thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL DEFAULT '', checkpoint_id TEXT NOT NULL,
+        task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT, value BLOB,
+        task_path TEXT NOT NULL DEFAULT '', PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))""",
+]
+
+_HEAD_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, message_count, snapshot_seq, type, checkpoint, metadata"
+
+
+class MessageLogCheckpointer(BaseCheckpointSaver):
+    """History backend that stores message deltas instead of full state per step.
+
+    Each `aput` appends only the messages added since the previous checkpoint to
+    `message_log` and overwrites the thread's single head row, so a turn costs a
+    constant number of writes and storage grows linearly with the conversation.
+    Every `snapshot_every` messages the full list is stored once in
+    `message_snapshots`, which bounds how much of the log a read has to replay.
+
+    Only the newest checkpoint of a thread is kept: reads by an older
+    `checkpoint_id` (time travel) return None.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, *, serde: Any = None, snapshot_every: int = MESSAGE_LOG_SNAPSHOT_EVERY):
+        super().__init__(serde=serde)
+        self.conn = conn
+        self.snapshot_every = max(1, snapshot_every)
+        self.lock = asyncio.Lock()
+        self.is_setup = False
+
+    async def setup(self):
+        if self.is_setup:
+            return
+        for statement in MESSAGE_LOG_SCHEMA:
+            await self.conn.execute(statement)
+        await self.conn.commit()
+        self.is_setup = True
+
+    async def aclose(self):
+        await self.conn.close()
+
+    # --- Reads ---
+
+    async def _load_messages(self, thread_id: str, checkpoint_ns: str, message_count: int, snapshot_seq: int) -> List[Any]:
+        messages: List[Any] = []
+        if snapshot_seq:
+            async with self.conn.execute(
+                "SELECT type, messages FROM message_snapshots WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+            ) as cur:
+                row = await cur.fetchone()
+            if row:
+                messages = list(self.serde.loads_typed(row))[:snapshot_seq]
+        async with self.conn.execute(
+            "SELECT type, message FROM message_log WHERE thread_id = ? AND checkpoint_ns = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (thread_id, checkpoint_ns, len(messages), message_count),
+        ) as cur:
+            messages.extend(self.serde.loads_typed(row) for row in await cur.fetchall())
+        return messages
+
+    async def _to_tuple(self, head) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, message_count, snapshot_seq, type_, blob, metadata = head
+        checkpoint = self.serde.loads_typed((type_, blob))
+        if message_count is not None:
+            checkpoint["channel_values"]["messages"] = await self._load_messages(thread_id, checkpoint_ns, message_count, snapshot_seq)
+        async with self.conn.execute(
+            "SELECT task_id, channel, type, value FROM head_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ) as cur:
+            writes = [(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in await cur.fetchall()]
+
+        def _config(cid):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            _config(checkpoint_id),
+            checkpoint,
+            json.loads(metadata) if metadata is not None else {},
+            _config(parent_id) if parent_id else None,
+            writes,
+        )
+
+    @timed(PHASE_CHECKPOINT_LOAD)
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        await self.setup()
+        configurable = config["configurable"]
+        async with self.lock:
+            async with self.conn.execute(
+                f"SELECT {_HEAD_COLUMNS} FROM thread_heads WHERE thread_id = ? AND checkpoint_ns = ?",
+                (str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")),
+            ) as cur:
+                head = await cur.fetchone()
+            checkpoint_id = get_checkpoint_id(config)
+            if head is None or (checkpoint_id and checkpoint_id != head[2]):
+                return None
+            return await self._to_tuple(head)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        await self.setup()
+        query, params = f"SELECT {_HEAD_COLUMNS} FROM thread_heads", []
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            query += " WHERE thread_id = ? AND checkpoint_ns = ?"
+            params = [str(config["configurable"]["thread_id"]), config["configurable"].get("checkpoint_ns", "")]
+        query += " ORDER BY checkpoint_id DESC"
+        async with self.lock:
+            async with self.conn.execute(query, params) as cur:
+                heads = await cur.fetchall()
+        count = 0
+        for head in heads:
+            if before and head[2] >= get_checkpoint_id(before):
+                continue
+            if filter and not all(json.loads(head[8] or "{}").get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None and count >= limit:
+                return
+            count += 1
+            async with self.lock:
+                item = await self._to_tuple(head)
+            yield item
+
+    # --- Writes ---
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await self.setup()
+        configurable = config["configurable"]
+        thread_id, checkpoint_ns = str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+        messages = checkpoint.get("channel_values", {}).get("messages")
+        skeleton = {**checkpoint, "channel_values": {k: v for k, v in checkpoint.get("channel_values", {}).items() if k != "messages"}}
+        type_, blob = self.serde.dumps_typed(skeleton)
+
+        async with self.lock:
+            async with self.conn.execute(
+                "SELECT message_count, snapshot_seq FROM thread_heads WHERE thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns)
+            ) as cur:
+                row = await cur.fetchone()
+            logged, snapshot_seq = (row[0] or 0, row[1]) if row else (0, 0)
+
+            message_count = None
+            if messages is not None:
+                messages = list(messages)
+                message_count = len(messages)
+                if message_count < logged:
+                    # State was rewritten rather than appended to: start the log over
+                    await self._delete_messages(thread_id, checkpoint_ns)
+                    logged, snapshot_seq = 0, 0
+                if message_count > logged:
+                    await self.conn.executemany(
+                        "INSERT OR REPLACE INTO message_log (thread_id, checkpoint_ns, seq, type, message) VALUES (?, ?, ?, ?, ?)",
+                        [(thread_id, checkpoint_ns, seq, *self.serde.dumps_typed(messages[seq])) for seq in range(logged, message_count)],
+                    )
+                if message_count - snapshot_seq >= self.snapshot_every:
+                    await self.conn.execute(
+                        "INSERT OR REPLACE INTO message_snapshots (thread_id, checkpoint_ns, seq, type, messages) VALUES (?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, message_count, *self.serde.dumps_typed(messages)),
+                    )
+                    snapshot_seq = message_count
+            elif row:
+                message_count = row[0]
+
+            await self.conn.execute(
+                f"INSERT OR REPLACE INTO thread_heads ({_HEAD_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], configurable.get("checkpoint_id"), message_count, snapshot_seq,
+                 type_, blob, json.dumps(get_checkpoint_metadata(config, metadata))),
+            )
+            # Pending writes only matter for the head checkpoint
+            await self.conn.execute(
+                "DELETE FROM head_writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id != ?",
+                (thread_id, checkpoint_ns, checkpoint["id"]),
+            )
+            await self.conn.commit()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        await self.setup()
+        configurable = config["configurable"]
+        # Same conflict rule as the upstream sqlite saver: special channels overwrite, others keep the first write
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        rows = [
+            (str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"],
+             task_id, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value), task_path)
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        async with self.lock:
+            await self.conn.executemany(
+                f"{verb} INTO head_writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            await self.conn.commit()
+
+    async def _delete_messages(self, thread_id: str, checkpoint_ns: Optional[str] = None):
+        scope, params = ("thread_id = ?", (thread_id,)) if checkpoint_ns is None else ("thread_id = ? AND checkpoint_ns = ?", (thread_id, checkpoint_ns))
+        for table in ("message_log", "message_snapshots"):
+            await self.conn.execute(f"DELETE FROM {table} WHERE {scope}", params)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.setup()
+        async with self.lock:
+            await self._delete_messages(str(thread_id))
+            for table in ("thread_heads", "head_writes"):
+                await self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+    def get_next_version(self, current, channel):
+        # Same version format as the snapshot backend
+        return AsyncSqliteSaver.get_next_version(self, current, channel)
+
+
+async def create_message_log_checkpointer(db_path: str, serde: Any = None, snapshot_every: int = MESSAGE_LOG_SNAPSHOT_EVERY) -> MessageLogCheckpointer:
+    """Open (and set up) a message-log history database."""
+    saver = MessageLogCheckpointer(await open_sqlite_connection(db_path), serde=serde, snapshot_every=snapshot_every)
+    await saver.setup()
+    return saver
@@ -0,0 +1,249 @@
+import bisect
+import math
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; covers cache hits (ms) through slow model turns with tool calls (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def sanitize_name(name: str) -> str:
+    return _NAME_RE.sub("_", name)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base for metrics recorded without locks.
+
+    Each thread writes to its own shard (a plain dict), so the event loop and
+    worker threads never contend; shards are summed when /metrics is scraped.
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            # list.append is atomic under the GIL
+            self._shards.append(shard)
+        return shard
+
+    def _key(self, labels: dict) -> tuple:
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError:
+            pass
+        raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals: Dict[tuple, float] = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(self.values().items())]
+
+
+class Gauge(_Metric):
+    """Last value wins; `callback` (returning {label tuple: value}) is read at scrape time instead."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[tuple, float]]] = None):
+        super().__init__(name, help_text, labelnames)
+        self.callback = callback
+        self._values: Dict[tuple, float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def render(self) -> List[str]:
+        values = self.callback() if self.callback else dict(self._values)
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            # Per-bucket (non-cumulative) counts, then +Inf, sum, count
+            entry = shard[key] = [0] * (len(self.buckets) + 3)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """`with histogram.time(route="fast"): ...` observes the block's duration.
+
+        A "status" label is set to "error" when the block raises; the block may also
+        change labels through the returned timer's `labels`.
+        """
+        return _Timer(self, labels)
+
+    def snapshot(self) -> Dict[tuple, list]:
+        merged: Dict[tuple, list] = {}
+        for shard in list(self._shards):
+            for key, entry in list(shard.items()):
+                total = merged.setdefault(key, [0] * len(entry))
+                for i, value in enumerate(entry):
+                    total[i] += value
+        return merged
+
+    def render(self) -> List[str]:
+        lines = []
+        names = self.labelnames + ("le",)
+        for key, entry in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, key + (_format_value(bound),))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{labels} {entry[-1]}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and "status" in self.labels:
+            self.labels["status"] = "error"
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[tuple, float], Sequence[str]]]]] = []
+
+    def _add(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            # Declaring a metric twice (e.g. on module reload) keeps the original series
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames, callback))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """`collector()` yields (name, type, help, {label values: value}, labelnames) at scrape time."""
+        self._collectors.append(collector)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, type_name, help_text, values, labelnames in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.extend(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}" for key, value in sorted(values.items()))
+        return "\n".join(lines) + "\n"
+
+
+def stats_samples(prefix: str, stats: dict, labelnames: Sequence[str] = (), labels: tuple = ()) -> Dict[str, Dict[tuple, float]]:
+    """Flatten a component's numeric `stats` dict into {metric name: {labels: value}}; other values are skipped."""
+    samples: Dict[str, Dict[tuple, float]] = {}
+    for key, value in stats.items():
+        name = sanitize_name(f"{prefix}_{key}")
+        if isinstance(value, dict):
+            for sub_name, sub_values in stats_samples(name, value, labelnames, labels).items():
+                samples.setdefault(sub_name, {}).update(sub_values)
+        elif isinstance(value, (int, float)):
+            samples.setdefault(name, {})[labels] = float(value)
+    return samples
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Pipeline metrics: webhook ingest -> queue -> agent turn -> model / tool calls -> outbound send ---
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+WEBHOOK_RECEIVED = REGISTRY.counter("webhook_messages_received_total", "Inbound webhook messages", ("channel",))
+QUEUE_WAIT_SECONDS = REGISTRY.histogram("background_queue_wait_seconds", "Time from webhook receipt to background processing", ("channel",))
+AGENT_TURN_SECONDS = REGISTRY.histogram("agent_turn_duration_seconds", "Agent turn latency by how it was answered", ("outcome",))
+LLM_CALL_SECONDS = REGISTRY.histogram("llm_call_duration_seconds", "Model call latency (after admission)", ("route",))
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "Model tokens used", ("route", "kind"))
+TOOL_CALL_SECONDS = REGISTRY.histogram("mcp_tool_duration_seconds", "MCP tool call latency, cache hits included", ("tool", "status"))
+OUTBOUND_SEND_SECONDS = REGISTRY.histogram("outbound_send_duration_seconds", "Outbound message send latency", ("channel", "status"))
+IMAGE_SAVE_SECONDS = REGISTRY.histogram("image_save_duration_seconds", "Base64 image decode, transcode and save latency")
+TRANSCRIPTION_SECONDS = REGISTRY.histogram("transcription_duration_seconds", "Audio transcription latency", ("status",))
+LOOP_LAG_SECONDS = REGISTRY.histogram("event_loop_lag_seconds", "Event loop scheduling delay",
+                                      buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+LOG_RECORDS_DROPPED = REGISTRY.counter("log_records_dropped_total", "Log records dropped by sampling, rate limits or a full queue", ("logger", "reason"))
+LOOP_STALLS = REGISTRY.counter("event_loop_stalls_total", "Times the event loop was blocked past the stall threshold")
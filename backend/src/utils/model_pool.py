@@ -0,0 +1,266 @@
+import asyncio
+import collections
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import openai
+
+from config import (
+    MODEL_HEDGE_MIN_SAMPLES,
+    MODEL_HEDGING_ENABLED,
+    MODEL_POOL_COOLDOWN_SECONDS,
+    MODEL_POOL_FAILURE_THRESHOLD,
+    MODEL_POOL_STRATEGY,
+)
+from utils.adaptive_concurrency import is_throttle
+from utils.admission import ServiceBusyError
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_WEIGHTED = "weighted"
+STRATEGY_LEAST_LATENCY = "least_latency"
+
+# Weight of the newest sample in the latency moving average
+_EWMA_ALPHA = 0.2
+_LATENCY_WINDOW = 200
+
+
+def parse_pool_spec(spec: str) -> List[dict]:
+    """Parse MODEL_POOL: a JSON list of backends.
+
+    Each backend is {"provider": "azure", "deployment": "...", "endpoint": "...",
+    "api_key_env": "...", "weight": 1, "name": "..."}; only "provider" is required.
+    """
+    entries = json.loads(spec) if spec.strip() else []
+    if not isinstance(entries, list) or not entries:
+        raise ValueError("MODEL_POOL must be a non-empty JSON list of backends")
+    backends, names = [], set()
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("provider"):
+            raise ValueError(f"MODEL_POOL entry needs a provider: {entry!r}")
+        name = entry.get("name") or ":".join(filter(None, [entry["provider"], entry.get("deployment")]))
+        if name in names:
+            raise ValueError(f"Duplicate MODEL_POOL backend name: {name}")
+        names.add(name)
+        weight = float(entry.get("weight", 1))
+        if weight <= 0:
+            raise ValueError(f"MODEL_POOL backend {name} needs a positive weight")
+        backends.append({
+            "name": name,
+            "provider": entry["provider"].lower(),
+            "deployment": entry.get("deployment"),
+            "endpoint": entry.get("endpoint"),
+            "api_key": os.getenv(entry["api_key_env"]) if entry.get("api_key_env") else None,
+            "weight": weight,
+        })
+    return backends
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """Errors that say something about the backend (and are worth another backend), not the request."""
+    if is_throttle(exc) or isinstance(exc, openai.APIConnectionError):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class BackendHealth:
+    """Latency and circuit-breaker state for one backend, shared by every model built for it.
+
+    The circuit opens after `failure_threshold` consecutive failures. Once the cooldown
+    has passed it lets a single probe through (half-open): success closes it again,
+    failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = MODEL_POOL_FAILURE_THRESHOLD,
+                 cooldown: float = MODEL_POOL_COOLDOWN_SECONDS, min_samples: int = MODEL_HEDGE_MIN_SAMPLES):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.latencies: "collections.deque[float]" = collections.deque(maxlen=_LATENCY_WINDOW)
+        self.ewma: Optional[float] = None
+        self.inflight = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.counters = {"calls": 0, "failures": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        if self.consecutive_failures < self.failure_threshold:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def p95(self, min_samples: Optional[int] = None) -> Optional[float]:
+        """p95 latency, or None until `min_samples` (default: the hedging minimum) are recorded."""
+        min_samples = self.min_samples if min_samples is None else min_samples
+        if len(self.latencies) < max(1, min_samples):
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record_success(self, latency: float):
+        self.counters["calls"] += 1
+        self.latencies.append(latency)
+        self.ewma = latency if self.ewma is None else _EWMA_ALPHA * latency + (1 - _EWMA_ALPHA) * self.ewma
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.counters["calls"] += 1
+        self.counters["failures"] += 1
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            self.counters["opened"] += 1
+            logger.warning(f"Model backend {self.name} circuit open for {self.cooldown:.0f}s")
+
+    @property
+    def stats(self) -> dict:
+        p95 = self.p95(1)
+        return {
+            "state": self.state,
+            "inflight": self.inflight,
+            "latency_ewma": round(self.ewma, 3) if self.ewma is not None else None,
+            "latency_p95": round(p95, 3) if p95 is not None else None,
+            **self.counters,
+        }
+
+
+class PoolBackend:
+    def __init__(self, model: Any, health: BackendHealth, weight: float = 1.0):
+        self.model = model
+        self.health = health
+        self.weight = weight
+
+    @property
+    def name(self) -> str:
+        return self.health.name
+
+
+class ModelPool:
+    """Routes `ainvoke` across several deployments/providers.
+
+    Backends are chosen by weight or by lowest observed latency, skipping those with
+    an open circuit. A backend failure (throttle, timeout, 5xx, connection error)
+    fails over to the next backend. With hedging on, a second backend is fired when
+    the first has not answered within its p95 latency, and the first answer wins.
+
+    The agent calls models with non-streaming `ainvoke`, so there is no first token
+    to time: latencies (and so the hedge delay) are of complete responses. Long
+    answers raise the p95, which makes hedging fire later than a time-to-first-token
+    delay would, never earlier.
+    """
+
+    def __init__(self, backends: List[PoolBackend], strategy: str = MODEL_POOL_STRATEGY,
+                 hedging: bool = MODEL_HEDGING_ENABLED):
+        if not backends:
+            raise ValueError("ModelPool needs at least one backend")
+        if strategy not in (STRATEGY_WEIGHTED, STRATEGY_LEAST_LATENCY):
+            raise ValueError(f"Unknown MODEL_POOL_STRATEGY: {strategy}")
+        self.backends = backends
+        self.strategy = strategy
+        self.hedging = hedging
+        self.stats = {"failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+    def _pick(self, exclude: List[PoolBackend]) -> Optional[PoolBackend]:
+        candidates = [b for b in self.backends if b not in exclude and b.health.available()]
+        if not candidates:
+            return None
+        if self.strategy == STRATEGY_LEAST_LATENCY:
+            # Unmeasured backends score 0 so each gets tried; load breaks ties between equals
+            choice = min(candidates, key=lambda b: ((b.health.ewma or 0.0) * (b.health.inflight + 1) / b.weight, -b.weight))
+        else:
+            choice = random.choices(candidates, weights=[b.weight for b in candidates])[0]
+        if choice.health.state == "half_open":
+            choice.health.probing = True
+        return choice
+
+    async def _call(self, backend: PoolBackend, input: Any, config: Any, kwargs: dict) -> Any:
+        health = backend.health
+        health.inflight += 1
+        started = time.monotonic()
+        try:
+            with span("model.backend", backend=backend.name):
+                result = await backend.model.ainvoke(input, config, **kwargs)
+        except asyncio.CancelledError:
+            health.probing = False
+            raise
+        except Exception as e:
+            if is_backend_failure(e):
+                health.record_failure()
+            else:
+                health.probing = False
+            raise
+        else:
+            health.record_success(time.monotonic() - started)
+            return result
+        finally:
+            health.inflight -= 1
+
+    async def _hedged(self, backend: PoolBackend, tried: List[PoolBackend], input: Any, config: Any, kwargs: dict) -> Any:
+        # p95 of full-response latency, see the class docstring
+        delay = backend.health.p95() if self.hedging else None
+        if delay is None:
+            return await self._call(backend, input, config, kwargs)
+
+        first = asyncio.ensure_future(self._call(backend, input, config, kwargs))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            backup = self._pick(tried)
+            if backup is None:
+                return await first
+            tried.append(backup)
+            self.stats["hedges"] += 1
+            logger.info(f"Hedging model call: {backend.name} slower than p95 {delay:.2f}s, also trying {backup.name}")
+            second = asyncio.ensure_future(self._call(backup, input, config, kwargs))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The losing call is abandoned; its backend may still bill for it
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, input: Any, config: Any = None, **kwargs) -> Any:
+        tried: List[PoolBackend] = []
+        error: Optional[BaseException] = None
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                break
+            tried.append(backend)
+            try:
+                return await self._hedged(backend, tried, input, config, kwargs)
+            except Exception as e:
+                if not is_backend_failure(e):
+                    raise
+                error = e
+                self.stats["failovers"] += 1
+                logger.warning(f"Model backend {backend.name} failed ({type(e).__name__}); failing over")
+        if error is not None:
+            raise error
+        retry_after = max(1, int(min(b.health.open_until for b in self.backends) - time.monotonic()))
+        raise ServiceBusyError("All model backends unavailable", retry_after=retry_after)
@@ -1,10 +1,23 @@
 import logging
 from typing import Dict, Callable, Any, Optional
 
+from langchain_core.runnables import Runnable
+
+from config import MODEL_ADAPTIVE_CONCURRENCY, MODEL_POOL
+from utils.adaptive_concurrency import AdaptiveLimiter, AdaptiveModel
+from utils.model_pool import BackendHealth, ModelPool, PoolBackend, parse_pool_spec
+
 logger = logging.getLogger(__name__)
 
+# CHAT_MODEL_PROVIDER value that routes across the MODEL_POOL backends
+POOL_PROVIDER = "pool"
+
 class ModelRegistry:
     _registry: Dict[str, Callable[..., Any]] = {}
+    # One AIMD limiter per provider, shared by every model created for it
+    _limiters: Dict[str, AdaptiveLimiter] = {}
+    # Latency and circuit state per pool backend, shared the same way
+    _health: Dict[str, BackendHealth] = {}
 
     @classmethod
     def register(cls, name: str, creator_fn: Callable[..., Any]):
@@ -13,29 +26,69 @@ class ModelRegistry:
         logger.debug(f"Registered model provider: {name}")
 
     @classmethod
-    def get_model(cls, provider_name: Optional[str], tools: Optional[Any] = None) -> Any:
-        """Get a model instance by provider name."""
+    def get_model(cls, provider_name: Optional[str], tools: Optional[Any] = None, deployment: Optional[str] = None) -> Any:
+        """Get a model instance by provider name, optionally for a specific deployment/model name."""
         if not provider_name:
             available = list(cls._registry.keys())
             raise ValueError(f"No model provider specified. Available: {available}. Please set CHAT_MODEL_PROVIDER environment variable.")
             
         provider_name = provider_name.lower()
+        if provider_name == POOL_PROVIDER:
+            return cls.get_pool(MODEL_POOL, tools)
         creator = cls._registry.get(provider_name)
         
         if not creator:
             available = list(cls._registry.keys())
             raise ValueError(f"Provider '{provider_name}' not found. Available: {available}")
             
-        model = creator()
+        model = creator(deployment=deployment) if deployment else creator()
         if tools:
-            return model.bind_tools(tools)
+            model = model.bind_tools(tools)
+        if MODEL_ADAPTIVE_CONCURRENCY and isinstance(model, Runnable):
+            # A separate deployment has its own quota, so it gets its own limiter
+            return AdaptiveModel(model, cls.limiter(f"{provider_name}:{deployment}" if deployment else provider_name))
         return model
 
+    @classmethod
+    def get_pool(cls, spec: str, tools: Optional[Any] = None) -> ModelPool:
+        """Build a ModelPool from a MODEL_POOL spec; see utils/model_pool.py for the format."""
+        backends = []
+        for entry in parse_pool_spec(spec):
+            creator = cls._registry.get(entry["provider"])
+            if not creator:
+                available = list(cls._registry.keys())
+                raise ValueError(f"Pool backend '{entry['name']}' uses unknown provider '{entry['provider']}'. Available: {available}")
+            overrides = {key: entry[key] for key in ("deployment", "endpoint", "api_key") if entry[key]}
+            model = creator(**overrides)
+            if tools:
+                model = model.bind_tools(tools)
+            if MODEL_ADAPTIVE_CONCURRENCY and isinstance(model, Runnable):
+                # No retries on one backend: the pool fails over instead
+                model = AdaptiveModel(model, cls.limiter(entry["name"]), max_retries=0)
+            health = cls._health.setdefault(entry["name"], BackendHealth(entry["name"]))
+            backends.append(PoolBackend(model, health, entry["weight"]))
+        return ModelPool(backends)
+
+    @classmethod
+    def pool_stats(cls) -> Dict[str, dict]:
+        """Circuit state, latency and failure counts per pool backend."""
+        return {name: health.stats for name, health in cls._health.items()}
+
+    @classmethod
+    def limiter(cls, provider_name: str) -> AdaptiveLimiter:
+        """The adaptive concurrency limiter for a provider."""
+        return cls._limiters.setdefault(provider_name.lower(), AdaptiveLimiter())
+
+    @classmethod
+    def concurrency_stats(cls) -> Dict[str, dict]:
+        """Current limit, in-flight calls and throttle counts per provider."""
+        return {name: limiter.stats for name, limiter in cls._limiters.items()}
+
 # Factory helper for cleaner imports
 class ModelFactory:
     @staticmethod
-    def get_model(provider_name: Optional[str], tools: Optional[Any] = None) -> Any:
-        return ModelRegistry.get_model(provider_name, tools)
+    def get_model(provider_name: Optional[str], tools: Optional[Any] = None, deployment: Optional[str] = None) -> Any:
+        return ModelRegistry.get_model(provider_name, tools, deployment=deployment)
 
 class ImageRegistry:
     _registry: Dict[str, Callable[..., Any]] = {}
@@ -0,0 +1,102 @@
+import collections
+import logging
+import re
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from config import MODEL_ROUTER_MAX_WORDS
+from utils.response_cache import split_instructions
+
+logger = logging.getLogger(__name__)
+
+ROUTE_FAST = "fast"
+ROUTE_PRIMARY = "primary"
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+# Words that suggest multi-step reasoning or an action, on top of the tool vocabulary
+_ESCALATION_WORDS = frozenset("""
+    why how explain compare calculate compute analyse analyze plan write code debug fix summarise summarize
+    translate draft list steps difference recommend create make draw picture photo send text call remind
+""".split())
+_LATENCY_WINDOW = 200
+
+
+def tool_vocabulary(tools: Iterable[Any]) -> frozenset:
+    """Words from tool names, e.g. generate_image -> {"generate", "image"}."""
+    words = set()
+    for tool in tools:
+        words.update(w for w in re.split(r"[^a-z0-9]+", getattr(tool, "name", "").lower()) if len(w) > 2)
+    return frozenset(words)
+
+
+class _RouteMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latencies: "collections.deque[float]" = collections.deque(maxlen=_LATENCY_WINDOW)
+
+    def stats(self) -> dict:
+        ordered = sorted(self.latencies)
+        percentile = lambda q: round(ordered[int(q * (len(ordered) - 1))], 3) if ordered else None
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+        }
+
+
+class ModelRouter:
+    """Sends simple conversational turns to a cheap model and everything else to the tool-bound primary.
+
+    Classification is heuristic and errs towards the primary model: a turn goes to
+    the fast route only when it is a short user message that mentions no tool or
+    reasoning words and does not answer a question the assistant just asked
+    (e.g. "yes, send it"). Tool results always return to the primary model.
+    """
+
+    def __init__(self, tools: Iterable[Any] = (), max_words: int = MODEL_ROUTER_MAX_WORDS):
+        self.max_words = max_words
+        self.escalation_words = _ESCALATION_WORDS | tool_vocabulary(tools)
+        self.metrics: Dict[str, _RouteMetrics] = {ROUTE_FAST: _RouteMetrics(), ROUTE_PRIMARY: _RouteMetrics()}
+        self.reasons: "collections.Counter[str]" = collections.Counter()
+
+    def classify(self, messages) -> Tuple[str, str]:
+        """(route, reason) for the turn ending in `messages`."""
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return ROUTE_PRIMARY, "not_user_turn"
+        question, _ = split_instructions(str(messages[-1].content))
+        words = _WORD_RE.findall(question.lower())
+        if len(words) > self.max_words:
+            return ROUTE_PRIMARY, "long"
+        if self.escalation_words.intersection(words):
+            return ROUTE_PRIMARY, "keywords"
+        previous = next((m for m in reversed(messages[:-1]) if isinstance(m, AIMessage)), None)
+        if previous is not None and (previous.tool_calls or str(previous.content).rstrip().endswith("?")):
+            return ROUTE_PRIMARY, "follow_up"
+        return ROUTE_FAST, "simple"
+
+    def route(self, messages) -> str:
+        route, reason = self.classify(messages)
+        self.reasons[f"{route}:{reason}"] += 1
+        logger.debug(f"Routing turn to {route} model ({reason})")
+        return route
+
+    def record(self, route: str, latency: float, response: Any):
+        metrics = self.metrics[route]
+        metrics.calls += 1
+        metrics.latencies.append(latency)
+        usage: Optional[dict] = getattr(response, "usage_metadata", None)
+        if usage:
+            metrics.input_tokens += usage.get("input_tokens", 0)
+            metrics.output_tokens += usage.get("output_tokens", 0)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "routes": {route: metrics.stats() for route, metrics in self.metrics.items()},
+            "reasons": dict(self.reasons),
+        }
@@ -0,0 +1,225 @@
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+from config import (
+    PROFILING_COOLDOWN_SECONDS,
+    PROFILING_MAX_SECONDS,
+    PROFILING_MAX_SNAPSHOTS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerRateLimited(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Profiler rate limited, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Cooldown:
+    """At most one action per `interval` seconds for each key."""
+
+    def __init__(self, interval: float = PROFILING_COOLDOWN_SECONDS):
+        self.interval = interval
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str):
+        """Raise ProfilerRateLimited if `key` was used less than `interval` seconds ago."""
+        now = time.monotonic()
+        with self._lock:
+            wait = self._last.get(key, -self.interval) + self.interval - now
+            if wait > 0:
+                raise ProfilerRateLimited(int(wait) + 1)
+            self._last[key] = now
+
+
+def _frame_name(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class CpuProfiler:
+    """Statistical wall-clock profiler.
+
+    A daemon thread samples every thread's stack each `interval` seconds for at
+    most `seconds`, and counts identical stacks. The result is in the collapsed
+    ("folded") format read by flamegraph.pl and speedscope: one line per stack,
+    root first, frames joined by ";" and followed by the sample count.
+    """
+
+    def __init__(self, max_seconds: float = PROFILING_MAX_SECONDS):
+        self.max_seconds = max_seconds
+        self._stacks: Counter = Counter()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = 0.01) -> bool:
+        """Start a profile; returns False if one is already running."""
+        if self.running:
+            return False
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        interval = max(interval, 0.001)
+        self._stacks = Counter()
+        self.samples = 0
+        self.started_at, self.finished_at = time.time(), None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, args=(seconds, interval), name="cpu-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """End the profile early and wait for the sampler to finish."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self, seconds: float, interval: float):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        names = {}
+        while time.monotonic() < deadline and not self._stop.wait(interval):
+            names.update((t.ident, t.name) for t in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(" ", "_"))
+                self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.finished_at = time.time()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+# Allocations by tracemalloc itself and the import machinery are noise in a live diff
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _stat_dict(stat) -> dict:
+    frame = stat.traceback[0]
+    entry = {"location": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+    if hasattr(stat, "size_diff"):
+        entry["size_diff_bytes"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+class MemoryProfiler:
+    """tracemalloc snapshots, kept in memory so growth can be diffed between any two.
+
+    Tracing starts with the first snapshot (it slows allocations down) and stops
+    after `max_seconds` or on `stop()`, whichever comes first. The snapshots stay
+    available for diffing. A later snapshot starts a new tracing window and drops
+    the old snapshots: allocations made while tracing was off are not tracked.
+    """
+
+    def __init__(self, max_snapshots: int = PROFILING_MAX_SNAPSHOTS, frames: int = 1, max_seconds: float = PROFILING_MAX_SECONDS):
+        self.max_snapshots = max_snapshots
+        self.frames = frames
+        self.max_seconds = max_seconds
+        self._snapshots: Dict[int, tuple] = {}
+        self._next_id = 1
+        self._started_tracing = False
+        self._deadline: Optional[float] = None
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, limit: int = 20, match: Optional[str] = None) -> dict:
+        """Take a snapshot; returns its id, the largest allocation sites and the tracing time left."""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                self._snapshots.clear()
+                tracemalloc.start(self.frames)
+                self._started_tracing = True
+                self._deadline = time.monotonic() + self.max_seconds
+                self._timer = threading.Timer(self.max_seconds, self._expire)
+                self._timer.daemon = True
+                self._timer.start()
+            snap = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = (time.time(), snap)
+            while len(self._snapshots) > self.max_snapshots:
+                del self._snapshots[min(self._snapshots)]
+            traced, peak = tracemalloc.get_traced_memory()
+        left = max(0.0, self._deadline - time.monotonic()) if self._started_tracing else None
+        return {
+            "id": snapshot_id,
+            "traced_bytes": traced,
+            "peak_bytes": peak,
+            "tracing_seconds_left": None if left is None else round(left, 1),
+            "top": self._top(snap.statistics("lineno"), limit, match),
+        }
+
+    def _expire(self):
+        with self._lock:
+            if self._started_tracing:
+                logger.info(f"Stopping tracemalloc after {self.max_seconds:.0f}s")
+                self._stop_tracing()
+
+    def diff(self, from_id: Optional[int] = None, to_id: Optional[int] = None, limit: int = 20, match: Optional[str] = None) -> dict:
+        """Allocation sites that grew the most between two snapshots (default: oldest to newest kept)."""
+        if len(self._snapshots) < 2 and (from_id is None or to_id is None):
+            raise KeyError("Need two snapshots to diff")
+        from_id = min(self._snapshots) if from_id is None else from_id
+        to_id = max(self._snapshots) if to_id is None else to_id
+        if from_id not in self._snapshots or to_id not in self._snapshots:
+            raise KeyError(f"Unknown snapshot, have {sorted(self._snapshots)}")
+        older, newer = self._snapshots[from_id], self._snapshots[to_id]
+        stats = newer[1].compare_to(older[1], "lineno")
+        return {
+            "from_id": from_id,
+            "to_id": to_id,
+            "seconds_between": round(newer[0] - older[0], 1),
+            "size_diff_bytes": sum(stat.size_diff for stat in stats),
+            "top": self._top(stats, limit, match),
+        }
+
+    @staticmethod
+    def _top(stats, limit: int, match: Optional[str]) -> List[dict]:
+        if match:
+            stats = [stat for stat in stats if match in stat.traceback[0].filename]
+        return [_stat_dict(stat) for stat in stats[:limit]]
+
+    def snapshot_ids(self) -> List[int]:
+        return sorted(self._snapshots)
+
+    def _stop_tracing(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def stop(self):
+        """Drop the snapshots and stop tracing if this profiler started it."""
+        with self._lock:
+            self._snapshots.clear()
+            self._stop_tracing()
+
+
+cpu_profiler = CpuProfiler()
+memory_profiler = MemoryProfiler()
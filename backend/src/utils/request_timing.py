@@ -0,0 +1,92 @@
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+PHASE_CHECKPOINT_LOAD = "checkpoint_load"
+PHASE_ADMISSION = "admission"
+PHASE_LLM = "llm"
+PHASE_TOOL = "tool"
+PHASE_CHECKPOINT_SAVE = "checkpoint_save"
+PHASE_TOTAL = "total"
+
+# Header order; other phases follow in the order they were first recorded
+_PHASE_ORDER = (PHASE_CHECKPOINT_LOAD, PHASE_ADMISSION, PHASE_LLM, PHASE_TOOL, PHASE_CHECKPOINT_SAVE)
+
+
+class RequestTiming:
+    """Time spent per phase of one request, as call counts and summed durations.
+
+    Concurrent calls in the same phase (e.g. parallel tool calls) are summed, so a
+    phase can exceed the request's wall time.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, List[float]] = {}
+
+    def add(self, phase: str, seconds: float):
+        entry = self.phases.setdefault(phase, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def as_dict(self) -> dict:
+        """{phase: {"count", "ms"}} plus the total so far."""
+        result = {phase: {"count": int(count), "ms": round(seconds * 1000, 1)} for phase, (count, seconds) in self._ordered()}
+        result[PHASE_TOTAL] = {"count": 1, "ms": round((time.perf_counter() - self.started) * 1000, 1)}
+        return result
+
+    def server_timing(self) -> str:
+        """The Server-Timing header value, e.g. `llm;dur=812.4;desc="2 calls", total;dur=901.2`."""
+        parts = []
+        for phase, values in self.as_dict().items():
+            part = f"{phase};dur={values['ms']}"
+            if phase != PHASE_TOTAL:
+                part += f';desc="{values["count"]} call{"s" if values["count"] != 1 else ""}"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def _ordered(self):
+        known = [(phase, self.phases[phase]) for phase in _PHASE_ORDER if phase in self.phases]
+        return known + [(phase, entry) for phase, entry in self.phases.items() if phase not in _PHASE_ORDER]
+
+
+# Set by the /chat route; tasks spawned during the request share the same object
+request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+_open_phases: ContextVar[frozenset] = ContextVar("open_phases", default=frozenset())
+
+
+def record_phase(phase: str, seconds: float):
+    """Add to the current request's timing, if one is being collected."""
+    timing = request_timing.get()
+    if timing is not None:
+        timing.add(phase, seconds)
+
+
+@contextmanager
+def measure(phase: str):
+    """Time a block into `phase`. Nested blocks of the same phase count once (outermost wins)."""
+    timing = request_timing.get()
+    open_phases = _open_phases.get()
+    if timing is None or phase in open_phases:
+        yield
+        return
+    token = _open_phases.set(open_phases | {phase})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(phase, time.perf_counter() - started)
+        _open_phases.reset(token)
+
+
+def timed(phase: str):
+    """Decorator form of `measure` for async methods, e.g. checkpointer reads and writes."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with measure(phase):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
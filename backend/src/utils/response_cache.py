@@ -0,0 +1,196 @@
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import (
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_THRESHOLD,
+    RESPONSE_CACHE_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Channel instructions appended by the WhatsApp/SMS routes, e.g. "[Instruction: Keep your response under 1500 characters.]"
+_INSTRUCTION_RE = re.compile(r"\s*(\[Instruction:[^\]]*\]\s*)+$")
+_STOPWORDS = frozenset("a an the is are am was be do does did i you me my your we our it its s of to in on for and or please can could would".split())
+
+# Re-check the knowledge base file at most this often
+_SOURCE_CHECK_SECONDS = 5
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def split_instructions(message: str) -> Tuple[str, str]:
+    """Split a message into the user's question and the channel instructions appended to it."""
+    match = _INSTRUCTION_RE.search(message)
+    if not match:
+        return message.strip(), ""
+    return message[:match.start()].strip(), match.group(0).strip()
+
+
+class _Entry:
+    def __init__(self, vector: Dict[str, float], answer: str, entities: frozenset):
+        self.vector = vector
+        self.answer = answer
+        self.entities = entities
+        self.created = time.monotonic()
+
+
+class SemanticResponseCache:
+    """Answers repeated FAQ-style questions without running the agent graph.
+
+    Questions are turned into sparse TF-IDF vectors (IDF fitted on the knowledge
+    base) and compared by cosine similarity; a cached answer is returned when the
+    best match is above `threshold`. Entries expire after `ttl_seconds` and the
+    whole cache is dropped when the knowledge base file changes. Answers are kept
+    per channel instruction, so a WhatsApp-length answer is never served on the web.
+
+    Only questions worded entirely in the knowledge base's vocabulary are stored,
+    and a hit also needs the same entity tokens (numbers and words the knowledge
+    base never uses), so "weather in London" never gets the answer for Paris.
+    """
+
+    def __init__(self, source_path: Optional[str] = None, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 render: Optional[Callable[[str], str]] = None):
+        self.source_path = source_path
+        # Applied to the file before fitting, e.g. to fill in {{APP_NAME}}
+        self.render = render or (lambda text: text)
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._idf: Dict[str, float] = {}
+        self._default_idf = 1.0
+        self._fingerprint = None
+        self._source_mtime = None
+        self._last_check = 0.0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "not_stored": 0, "expired": 0, "invalidations": 0}
+        self.check_source(force=True)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    # --- Knowledge base tracking ---
+
+    def fit(self, corpus: str):
+        """Fit IDF weights on the paragraphs of `corpus`."""
+        documents = [set(tokenize(block)) for block in re.split(r"\n\s*\n", corpus) if block.strip()]
+        df = Counter(token for doc in documents for token in doc)
+        total = len(documents)
+        self._idf = {token: math.log((1 + total) / (1 + count)) + 1 for token, count in df.items()}
+        # Words the knowledge base never uses are the most specific ones
+        self._default_idf = math.log(1 + total) + 1
+
+    def check_source(self, force: bool = False) -> bool:
+        """Drop every entry if the knowledge base changed. Returns True when it did."""
+        if not self.source_path:
+            return False
+        now = time.monotonic()
+        if not force and now - self._last_check < _SOURCE_CHECK_SECONDS:
+            return False
+        self._last_check = now
+        try:
+            mtime = os.path.getmtime(self.source_path)
+            if not force and mtime == self._source_mtime:
+                return False
+            with open(self.source_path, "r") as f:
+                content = f.read()
+        except Exception as e:
+            logger.warning(f"Failed to read knowledge base for the response cache: {e}")
+            return False
+        self._source_mtime = mtime
+        fingerprint = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        if fingerprint == self._fingerprint:
+            return False
+        changed = self._fingerprint is not None
+        self._fingerprint = fingerprint
+        self.fit(self.render(content))
+        if changed:
+            self.clear()
+            self.stats["invalidations"] += 1
+            logger.info("Knowledge base changed; response cache cleared")
+        return changed
+
+    def clear(self):
+        self._entries.clear()
+
+    # --- Lookup / store ---
+
+    def _vector(self, text: str) -> Dict[str, float]:
+        counts = Counter(tokenize(text))
+        vector = {token: count * self._idf.get(token, self._default_idf) for token, count in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {token: v / norm for token, v in vector.items()} if norm else {}
+
+    def _entities(self, tokens: List[str]) -> frozenset:
+        return frozenset(t for t in tokens if t not in self._idf or any(c.isdigit() for c in t))
+
+    @staticmethod
+    def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+        if len(a) > len(b):
+            a, b = b, a
+        return sum(v * b.get(token, 0.0) for token, v in a.items())
+
+    def lookup(self, message: str, count_hit: bool = True) -> Optional[str]:
+        """Cached answer for a question similar to `message`, or None.
+
+        Callers that may still reject the answer pass `count_hit=False` and call
+        `record_hit()` once it is served.
+        """
+        self.check_source()
+        question, scope = split_instructions(message)
+        vector = self._vector(question)
+        entities = self._entities(tokenize(question))
+        best, best_key, best_score = None, None, 0.0
+        if vector:
+            now = time.monotonic()
+            for key, entry in list(self._entries.items()):
+                if now - entry.created > self.ttl_seconds:
+                    del self._entries[key]
+                    self.stats["expired"] += 1
+                    continue
+                if key[0] != scope or entry.entities != entities:
+                    continue
+                score = self._cosine(vector, entry.vector)
+                if score > best_score:
+                    best, best_key, best_score = entry, key, score
+        if best is None or best_score < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(best_key)
+        if count_hit:
+            self.record_hit()
+        logger.debug(f"Response cache match ({best_score:.2f}) for {question!r}")
+        return best.answer
+
+    def record_hit(self):
+        self.stats["hits"] += 1
+
+    def store(self, message: str, answer: str):
+        """Remember the answer to a question asked without prior context."""
+        question, scope = split_instructions(message)
+        tokens = tokenize(question)
+        vector = self._vector(question)
+        if not vector or not answer:
+            return
+        if any(t not in self._idf for t in tokens):
+            # Not a knowledge-base question: the answer depends on words the cache cannot tell apart
+            self.stats["not_stored"] += 1
+            return
+        key = (scope, " ".join(tokens))
+        self._entries[key] = _Entry(vector, answer, self._entities(tokens))
+        self._entries.move_to_end(key)
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,142 @@
+import hashlib
+import heapq
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+
+from config import CHECKPOINT_SHARDS
+from utils.checkpoint_storage import PooledSqliteSaver, create_checkpointer
+from utils.request_timing import PHASE_CHECKPOINT_LOAD, PHASE_CHECKPOINT_SAVE, timed
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(thread_id: str, num_shards: int) -> int:
+    """Stable shard index for a thread. Unlike hash(), identical across processes and restarts."""
+    if num_shards <= 1:
+        return 0
+    digest = hashlib.blake2b(str(thread_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+
+def shard_paths(db_path: str, num_shards: int) -> List[str]:
+    """Database files for `num_shards` shards. A single shard keeps the original file name."""
+    if num_shards <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard-{i:02d}{ext}" for i in range(num_shards)]
+
+
+class ShardedCheckpointer(BaseCheckpointSaver):
+    """Routes checkpoint operations to one of N SQLite databases by a stable hash of thread_id.
+
+    Each shard has its own writer connection (and reader pool, if configured), so threads on
+    different shards no longer wait on the same SQLite writer lock.
+    """
+
+    def __init__(self, shards: List[PooledSqliteSaver]):
+        if not shards:
+            raise ValueError("ShardedCheckpointer needs at least one shard")
+        super().__init__(serde=shards[0].serde)
+        self.shards = shards
+
+    def shard(self, thread_id: str) -> PooledSqliteSaver:
+        return self.shards[shard_for(thread_id, len(self.shards))]
+
+    def _for_config(self, config) -> PooledSqliteSaver:
+        return self.shard(config["configurable"]["thread_id"])
+
+    @timed(PHASE_CHECKPOINT_LOAD)
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return await self._for_config(config).aget_tuple(config)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            async for item in self._for_config(config).alist(config, filter=filter, before=before, limit=limit):
+                yield item
+            return
+        # Cross-shard listing: merge each shard's newest-first results
+        results = []
+        for shard in self.shards:
+            results.append([item async for item in shard.alist(config, filter=filter, before=before, limit=limit)])
+        merged = heapq.merge(*results, key=lambda t: t.config["configurable"]["checkpoint_id"], reverse=True)
+        for count, item in enumerate(merged):
+            if limit is not None and count >= limit:
+                return
+            yield item
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await self._for_config(config).aput(config, checkpoint, metadata, new_versions)
+
+    @timed(PHASE_CHECKPOINT_SAVE)
+    async def aput_writes(self, config, writes, task_id: str, task_path: str = "") -> None:
+        await self._for_config(config).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.shard(thread_id).adelete_thread(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.shards[0].get_next_version(current, channel)
+
+    async def aclose(self):
+        for shard in self.shards:
+            await shard.aclose()
+
+
+async def create_sharded_checkpointer(db_path: str, num_shards: int = CHECKPOINT_SHARDS, serde: Any = None) -> ShardedCheckpointer:
+    """Open (and set up) every shard of the checkpoint database."""
+    shards = [await create_checkpointer(path, serde=serde) for path in shard_paths(db_path, num_shards)]
+    return ShardedCheckpointer(shards)
+
+
+def reshard(db_path: str, old_shards: int, new_shards: int):
+    """Offline: redistribute every thread from `old_shards` files into `new_shards` files.
+
+    Rows are copied as-is (blobs are not deserialised). New files are built next to the
+    old ones and only swapped in once complete; the old files are kept with a
+    `.pre-reshard` suffix. Run it while the app is stopped.
+    """
+    sources = shard_paths(db_path, old_shards)
+    targets = shard_paths(db_path, new_shards)
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing shard files: {missing}")
+
+    # Fold any WAL content into the main files so the copy sees everything
+    for source in sources:
+        with closing(sqlite3.connect(source)) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    with closing(sqlite3.connect(sources[0])) as conn:
+        schema = [row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND type IN ('table', 'index') AND tbl_name IN ('checkpoints', 'writes') ORDER BY type DESC"
+        )]
+
+    staged = [f"{target}.resharding" for target in targets]
+    for index, staging in enumerate(staged):
+        if os.path.exists(staging):
+            os.remove(staging)
+        with closing(sqlite3.connect(staging)) as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            for statement in schema:
+                conn.execute(statement)
+            conn.create_function("shard_for", 1, lambda thread_id: shard_for(thread_id, new_shards), deterministic=True)
+            for source in sources:
+                conn.execute("ATTACH DATABASE ? AS src", (source,))
+                conn.execute("INSERT OR REPLACE INTO checkpoints SELECT * FROM src.checkpoints WHERE shard_for(thread_id) = ?", (index,))
+                conn.execute("INSERT OR REPLACE INTO writes SELECT * FROM src.writes WHERE shard_for(thread_id) = ?", (index,))
+                conn.commit()
+                conn.execute("DETACH DATABASE src")
+
+    for source in sources:
+        os.replace(source, f"{source}.pre-reshard")
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(source + suffix):
+                os.remove(source + suffix)
+    for staging, target in zip(staged, targets):
+        os.replace(staging, target)
+    logger.info(f"Resharded {db_path} from {old_shards} to {new_shards} shards")
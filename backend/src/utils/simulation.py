@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from typing import Dict, Optional
+
+import httpx
+import openai
+
+from config import FAKE_ERROR_RATE, FAKE_LATENCY_SIGMA, FAKE_RATE_LIMIT_RATE, FAKE_SEED
+
+# Provider names registered by the chat, image and audio provider packages
+FAKE_PROVIDER = "fake"
+LATENCY_SIM_PROVIDER = "latency-sim"
+
+
+def seeded_random(seed: int, *parts) -> random.Random:
+    """A Random that depends only on the seed and `parts` (e.g. the prompt), not on call order."""
+    digest = hashlib.sha256(repr((seed,) + parts).encode()).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+class LatencyProfile:
+    """Latency and failure behaviour of a simulated provider.
+
+    Latencies are lognormal around `median_ms` (sigma 0 makes them fixed).
+    `rate_limit_rate` and `error_rate` are the shares of calls that fail with a
+    429 (carrying Retry-After) or a 500, raised as the openai client would, so
+    the retry, limiter and pool layers treat them like the real thing.
+    """
+
+    def __init__(self, median_ms: float = 0.0, sigma: float = FAKE_LATENCY_SIGMA, rate_limit_rate: float = FAKE_RATE_LIMIT_RATE,
+                 error_rate: float = FAKE_ERROR_RATE, retry_after_ms: int = 500, seed: int = FAKE_SEED):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after_ms = retry_after_ms
+        self._random = random.Random(seed)
+        # Sync providers are called from worker threads
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "rate_limited": 0, "errors": 0}
+
+    @classmethod
+    def instant(cls, seed: int = FAKE_SEED) -> "LatencyProfile":
+        """No latency and no injected failures (the "fake" providers)."""
+        return cls(0.0, sigma=0.0, rate_limit_rate=0.0, error_rate=0.0, seed=seed)
+
+    def _draw(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            roll = self._random.random()
+            factor = self._random.lognormvariate(0, self.sigma) if self.sigma else 1.0
+        return roll, self.median_ms * factor / 1000
+
+    def _failure(self, roll: float) -> Optional[Exception]:
+        request = httpx.Request("POST", "http://simulated-provider.local/v1")
+        if roll < self.rate_limit_rate:
+            self.stats["rate_limited"] += 1
+            response = httpx.Response(429, request=request, headers={"retry-after-ms": str(self.retry_after_ms)})
+            return openai.RateLimitError("Simulated rate limit", response=response, body=None)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.stats["errors"] += 1
+            return openai.InternalServerError("Simulated server error", response=httpx.Response(500, request=request), body=None)
+        return None
+
+    def _plan(self, extra_seconds: float):
+        roll, delay = self._draw()
+        failure = self._failure(roll)
+        # Rejections come back quickly; successful calls take the full time
+        return failure, delay * 0.1 if failure is not None else delay + extra_seconds
+
+    async def await_call(self, extra_seconds: float = 0.0):
+        """Sleep for one call's latency (plus `extra_seconds`), or raise this call's injected failure."""
+        failure, delay = self._plan(extra_seconds)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if failure is not None:
+            raise failure
+
+    def block_call(self, extra_seconds: float = 0.0):
+        """`await_call` for synchronous providers."""
+        failure, delay = self._plan(extra_seconds)
+        if delay > 0:
+            time.sleep(delay)
+        if failure is not None:
+            raise failure
+
+
+_shared_profiles: Dict[str, LatencyProfile] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_profile(name: str, median_ms: float) -> LatencyProfile:
+    """The process-wide profile for `name`.
+
+    Callers such as the generate_image tool build a new provider per call; sharing the
+    profile keeps its random stream going, so latencies and failures vary across calls
+    instead of every call repeating the seed's first draw.
+    """
+    with _shared_lock:
+        profile = _shared_profiles.get(name)
+        if profile is None:
+            profile = _shared_profiles[name] = LatencyProfile(median_ms)
+        return profile
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalise_message(message: str) -> str:
+    """Case- and whitespace-insensitive form of a message, used to spot identical requests."""
+    return " ".join(message.lower().split())
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+
+    The first caller for a key (the leader) runs `fn`; callers arriving while it
+    is in flight (followers) wait for the leader's result instead of starting
+    their own call. Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared). `shared` is True when the result came from another caller's call."""
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["followers"] += 1
+            try:
+                # Shielded: a follower giving up must not cancel the leader's call
+                return await asyncio.shield(future), True
+            except _LeaderCancelled:
+                # The leader's request went away; run the call ourselves
+                return await self.run(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        # Followers are optional; don't warn about an exception nobody awaited
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.stats["leaders"] += 1
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._inflight.pop(key, None)
@@ -0,0 +1,119 @@
+import asyncio
+import glob
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from typing import List
+
+from config import SQLITE_BACKUP_INTERVAL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def backup_database(source: str, target: str):
+    """Consistent online copy of `source` into `target` using the SQLite backup API.
+
+    The copy is built next to the target and swapped in with os.replace, so a crash
+    mid-backup never leaves a torn database behind. Any -wal/-shm left next to the
+    target belongs to the old file and is removed first, so it is never replayed
+    into the new one.
+    """
+    staging = f"{target}.backup-tmp"
+    if os.path.exists(staging):
+        os.remove(staging)
+    with closing(sqlite3.connect(source)) as src, closing(sqlite3.connect(staging)) as dst:
+        src.backup(dst)
+        # The backup keeps the source's WAL flag; fold it into one self-contained file
+        dst.execute("PRAGMA journal_mode=DELETE")
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(target + suffix):
+            os.remove(target + suffix)
+    os.replace(staging, target)
+
+
+def _modified(path: str) -> float:
+    """Last write to a database, including commits still in its WAL."""
+    return max(os.path.getmtime(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+
+class SqliteHotCopy:
+    """Runs SQLite databases from fast local disk and backs them up to persistent storage.
+
+    On Azure App Service `/home` is an SMB mount where every fsync costs tens of
+    milliseconds. With this enabled the live databases live in `local_dir`
+    (e.g. `/tmp`), `restore()` seeds them from `persistent_dir` on startup, and
+    `backup()` copies every `*.sqlite` file back every `interval` seconds and on
+    `aclose()`. A crash loses at most one interval of history.
+
+    Only one instance may back up into a given `persistent_dir`.
+    """
+
+    def __init__(self, persistent_dir: str, local_dir: str, interval: float = SQLITE_BACKUP_INTERVAL_SECONDS):
+        self.persistent_dir = persistent_dir
+        self.local_dir = local_dir
+        self.interval = interval
+        self._task = None
+        self.stats = {"restored": 0, "backups": 0, "failures": 0}
+
+    def _databases(self, directory: str) -> List[str]:
+        return sorted(os.path.basename(path) for path in glob.glob(os.path.join(directory, "*.sqlite")))
+
+    def restore(self):
+        """Copy persisted databases to local disk, keeping local files modified after their backup."""
+        os.makedirs(self.local_dir, exist_ok=True)
+        for name in self._databases(self.persistent_dir):
+            local, persisted = os.path.join(self.local_dir, name), os.path.join(self.persistent_dir, name)
+            # e.g. /tmp survived a restart of this instance, but another one has backed up since
+            if os.path.exists(local) and _modified(local) >= os.path.getmtime(persisted):
+                continue
+            try:
+                backup_database(persisted, local)
+                self.stats["restored"] += 1
+                logger.info(f"Restored {name} from {self.persistent_dir}")
+            except sqlite3.Error as e:
+                logger.error(f"Failed to restore {name}: {e}")
+
+    def _backup_all(self) -> int:
+        os.makedirs(self.persistent_dir, exist_ok=True)
+        copied = 0
+        for name in self._databases(self.local_dir):
+            try:
+                backup_database(os.path.join(self.local_dir, name), os.path.join(self.persistent_dir, name))
+                copied += 1
+            except sqlite3.Error as e:
+                self.stats["failures"] += 1
+                logger.error(f"Failed to back up {name}: {e}")
+        return copied
+
+    async def backup(self) -> int:
+        """Back up every local database without blocking the event loop."""
+        copied = await asyncio.to_thread(self._backup_all)
+        self.stats["backups"] += 1
+        return copied
+
+    def start(self):
+        """Start the periodic backup task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._backup_loop())
+
+    async def _backup_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.backup()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"SQLite hot copy backup failed: {e}")
+
+    async def aclose(self):
+        """Stop the periodic task and take a final backup."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.backup()
@@ -0,0 +1,201 @@
+import atexit
+import copy
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from config import (
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMIT_PER_SECOND,
+    LOG_SAMPLING,
+)
+from utils.metrics import LOG_RECORDS_DROPPED
+from utils.tracing import current_trace_ids
+
+# Correlation IDs: set per request by the HTTP middleware and per turn by the agent
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+conversation_id: ContextVar[Optional[str]] = ContextVar("conversation_id", default=None)
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """"app_state=0.1,utils.image_providers=0.5" -> {logger prefix: share of records kept}."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        try:
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            raise ValueError(f"Invalid LOG_SAMPLING entry {item!r}, expected logger=rate")
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Thins out high-volume INFO/DEBUG records; warnings and errors always pass.
+
+    Each logger (or dotted prefix) in `sampling` keeps that share of its records,
+    and every logger is held to `rate_limit` records per second (token bucket,
+    bursts up to twice that). The first record let through after drops carries a
+    `suppressed` count. Records are filtered on whichever thread emits them, so
+    the bookkeeping is done under a lock.
+    """
+
+    def __init__(self, sampling: Optional[Dict[str, float]] = None, rate_limit: float = LOG_RATE_LIMIT_PER_SECOND):
+        super().__init__()
+        self.sampling = sampling or {}
+        self.rate_limit = rate_limit
+        self._rates: Dict[str, float] = {}
+        self._buckets: Dict[str, list] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _sample_rate(self, name: str) -> float:
+        rate = self._rates.get(name)
+        if rate is None:
+            rate = 1.0
+            prefix = name
+            while prefix:
+                if prefix in self.sampling:
+                    rate = self.sampling[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._rates[name] = rate
+        return rate
+
+    def _take_token(self, name: str) -> bool:
+        if self.rate_limit <= 0:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.get(name)
+        if bucket is None:
+            bucket = self._buckets[name] = [self.rate_limit * 2, now]
+        bucket[0] = min(self.rate_limit * 2, bucket[0] + (now - bucket[1]) * self.rate_limit)
+        bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        name = record.name
+        with self._lock:
+            if random.random() >= self._sample_rate(name):
+                reason = "sampled"
+            elif not self._take_token(name):
+                reason = "rate_limited"
+            else:
+                suppressed = self._suppressed.pop(name, 0)
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            self._suppressed[name] = self._suppressed.get(name, 0) + 1
+        LOG_RECORDS_DROPPED.inc(logger=name, reason=reason)
+        return False
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without blocking, after stamping them with correlation IDs.
+
+    The IDs are read here, on the emitting thread, because the listener thread
+    cannot see the caller's context variables. A full queue drops the record.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        record.request_id = request_id.get()
+        record.thread_id = conversation_id.get()
+        ids = current_trace_ids()
+        record.trace_id, record.span_id = ids if ids else (None, None)
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(logger=record.name, reason="queue_full")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; extra record attributes become fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s%(correlation)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        ids = [f"{key}={getattr(record, key)}" for key in ("request_id", "thread_id") if getattr(record, key, None)]
+        record.correlation = f" [{' '.join(ids)}]" if ids else ""
+        return super().format(record)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sampling: str = LOG_SAMPLING,
+                      rate_limit: float = LOG_RATE_LIMIT_PER_SECOND, queue_size: int = LOG_QUEUE_SIZE,
+                      stream=None) -> Tuple[ContextQueueHandler, logging.handlers.QueueListener]:
+    """Route the root logger through a queue to a stream handler on a listener thread.
+
+    Replaces any handlers already on the root logger (e.g. from basicConfig);
+    calling it again reconfigures.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    record_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = ContextQueueHandler(record_queue)
+    handler.addFilter(SamplingFilter(parse_sampling(sampling), rate_limit))
+    _listener = logging.handlers.QueueListener(record_queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    return handler, _listener
+
+
+def shutdown_logging():
+    """Flush queued records; registered to run at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
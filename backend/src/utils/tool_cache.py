@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from config import IMAGE_RETENTION_HOURS, TOOL_CACHE_MAX_ENTRIES, TOOL_IDEMPOTENCY_WINDOW_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ToolCachePolicy:
+    """Declarative caching rules for a single MCP tool.
+
+    - `cacheable`: results may be served from the cache for `ttl_seconds`.
+    - `side_effect`: the tool changes the outside world (sends a message), so it is
+      never cached. Retries of the same model tool call (same tool_call_id) inside
+      `ttl_seconds` are suppressed; a new call with identical arguments is a
+      deliberate repeat and always runs.
+    - `key_fields`: arguments that identify a cacheable call. `None` means all arguments.
+    """
+
+    def __init__(self, cacheable: bool = False, ttl_seconds: float = 0, key_fields: Optional[Iterable[str]] = None, side_effect: bool = False):
+        if cacheable and side_effect:
+            raise ValueError("A side-effecting tool cannot be cacheable")
+        self.cacheable = cacheable
+        self.ttl_seconds = ttl_seconds
+        self.key_fields = tuple(key_fields) if key_fields is not None else None
+        self.side_effect = side_effect
+
+    def make_key(self, tool_name: str, arguments: Dict[str, Any], call_id: Optional[str] = None) -> str:
+        if self.side_effect:
+            payload = {"tool_call_id": call_id}
+        else:
+            fields = self.key_fields if self.key_fields is not None else sorted(arguments)
+            payload = {field: arguments.get(field) for field in fields}
+        raw = json.dumps([tool_name, payload], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Generated image URLs stop resolving once cleanup_old_images removes the file,
+# so a cached image result must never outlive the image retention window.
+DEFAULT_TOOL_POLICIES: Dict[str, ToolCachePolicy] = {
+    "generate_image": ToolCachePolicy(cacheable=True, ttl_seconds=IMAGE_RETENTION_HOURS * 3600 * 0.9, key_fields=["prompt"]),
+    "send_twilio_sms": ToolCachePolicy(side_effect=True, ttl_seconds=TOOL_IDEMPOTENCY_WINDOW_SECONDS),
+    "send_whatsapp_message": ToolCachePolicy(side_effect=True, ttl_seconds=TOOL_IDEMPOTENCY_WINDOW_SECONDS),
+}
+
+
+class ToolResultCache:
+    """Bounded LRU of tool results with optional SQLite persistence.
+
+    Cacheable tools are memoised, side-effecting tools are de-duplicated through
+    idempotency keys, and tools without a policy are always executed.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ToolCachePolicy]] = None, max_entries: int = TOOL_CACHE_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.policies = dict(DEFAULT_TOOL_POLICIES if policies is None else policies)
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "duplicates_suppressed": 0}
+        if self.db_path:
+            self._init_db()
+
+    def _init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS tool_results (key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("DELETE FROM tool_results WHERE expires_at <= ?", (time.time(),))
+
+    def _load_persisted(self, key: str) -> Optional[tuple]:
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute("SELECT result, expires_at FROM tool_results WHERE key = ?", (key,)).fetchone()
+        return row
+
+    def _persist(self, key: str, result: str, expires_at: float):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO tool_results (key, result, expires_at) VALUES (?, ?, ?)", (key, result, expires_at))
+
+    async def _get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None and self.db_path:
+            try:
+                entry = await asyncio.to_thread(self._load_persisted, key)
+            except sqlite3.Error as e:
+                logger.warning(f"Tool cache lookup failed: {e}")
+        if entry is None:
+            return None
+        result, expires_at = entry
+        if expires_at <= time.time():
+            self._entries.pop(key, None)
+            return None
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return result
+
+    async def _set(self, key: str, result: str, ttl_seconds: float):
+        expires_at = time.time() + ttl_seconds
+        self._entries[key] = (result, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.db_path:
+            try:
+                await asyncio.to_thread(self._persist, key, result, expires_at)
+            except sqlite3.Error as e:
+                logger.warning(f"Tool cache write failed: {e}")
+
+    async def run(self, tool_name: str, arguments: Dict[str, Any], call: Callable[[], Awaitable[str]], call_id: Optional[str] = None) -> str:
+        """Execute `call` for `tool_name`, applying the tool's cache policy.
+
+        `call_id` is the model's tool_call_id; side-effecting calls without one are never de-duplicated.
+        """
+        policy = self.policies.get(tool_name)
+        if policy is None or not (policy.cacheable or policy.side_effect):
+            return await call()
+        if policy.side_effect and call_id is None:
+            return await call()
+
+        key = policy.make_key(tool_name, arguments, call_id)
+        cached = await self._get(key)
+        if cached is not None:
+            if policy.side_effect:
+                self.stats["duplicates_suppressed"] += 1
+                logger.info(f"Suppressed duplicate {tool_name} call (idempotency key {key[:12]})")
+            else:
+                self.stats["hits"] += 1
+            return cached
+
+        # Concurrent identical calls share a single execution
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                result = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The leading caller was cancelled, not this one: run the call for this caller
+                return await self.run(tool_name, arguments, call, call_id)
+            if policy.side_effect:
+                self.stats["duplicates_suppressed"] += 1
+            else:
+                self.stats["hits"] += 1
+            return result
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await call()
+            future.set_result(result)
+        except asyncio.CancelledError:
+            # Waiting callers re-run the call instead of inheriting this caller's cancellation
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure does not log a warning
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        # Errors are returned as strings by the tools; never remember them
+        if isinstance(result, str) and not result.startswith("Error"):
+            await self._set(key, result, policy.ttl_seconds)
+        return result
@@ -6,6 +6,7 @@ import io
 from PIL import Image
 
 from utils.model_registry import ImageFactory
+from utils.tracing import span
 
 def generate_image(prompt: str) -> str:
     """
@@ -21,7 +22,8 @@ def generate_image(prompt: str) -> str:
         provider = ImageFactory.get_provider(provider_name)
         
         # 2. Generate the image (returns base64 or URL)
-        image_result = provider.generate_image(prompt)
+        with span("provider.generate_image", provider=provider_name):
+            image_result = provider.generate_image(prompt)
         
         if not image_result:
              return "Error: Image content not found in response."
@@ -60,11 +62,12 @@ def generate_image(prompt: str) -> str:
         filepath = os.path.join(images_dir, filename)
         
         # Decode and save
-        image_bytes = base64.b64decode(image_data)
-        img = Image.open(io.BytesIO(image_bytes))
-        if img.mode in ("RGBA", "P"):
-            img = img.convert("RGB")
-        img.save(filepath, "JPEG", quality=85)
+        with span("image.save"):
+            image_bytes = base64.b64decode(image_data)
+            img = Image.open(io.BytesIO(image_bytes))
+            if img.mode in ("RGBA", "P"):
+                img = img.convert("RGB")
+            img.save(filepath, "JPEG", quality=85)
         
         # Construct public URL
         # Use relative path for web app compatibility (proxied via Vite)
@@ -0,0 +1,244 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from config import (
+    TRACE_EXPORT_DIR,
+    TRACE_FILE_BACKUPS,
+    TRACE_FILE_MAX_BYTES,
+    TRACE_SAMPLE_RATE,
+    TRACING_ENABLED,
+)
+
+logger = logging.getLogger(__name__)
+
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    """One timed operation. Attributes and status are set while it is open."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attributes", "start_ns", "end_ns", "status", "status_message")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.status = STATUS_UNSET
+        self.status_message = ""
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def traceparent(self) -> str:
+        """W3C trace context header value identifying this span."""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def to_otlp(self, service: str) -> dict:
+        """The span as OTLP/JSON field names, plus the emitting service."""
+        return {
+            "resource": {"service.name": service},
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a traceparent header, or None if it is malformed."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class _NoopSpan:
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class JsonlSpanExporter:
+    """Appends finished spans, one JSON object per line, to a size-rotated file.
+
+    Spans go through a queue to a listener thread, so the request path never
+    waits on file I/O.
+    """
+
+    def __init__(self, path: str, max_bytes: int = TRACE_FILE_MAX_BYTES, backups: int = TRACE_FILE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._logger: Optional[logging.Logger] = None
+        self._listener: Optional[logging.handlers.QueueListener] = None
+
+    def _start(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        span_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(span_queue, handler)
+        self._listener.start()
+        self._logger = logging.getLogger(f"{__name__}.export.{os.path.basename(self.path)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(logging.handlers.QueueHandler(span_queue))
+        atexit.register(self.shutdown)
+
+    def export(self, record: dict):
+        if self._logger is None:
+            self._start()
+        self._logger.info(json.dumps(record, default=str))
+
+    def shutdown(self):
+        """Drain queued spans to disk."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            for handler in list(self._logger.handlers):
+                self._logger.removeHandler(handler)
+            self._logger = None
+
+
+class _SpanScope:
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any], traceparent: Optional[str]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.traceparent = traceparent
+
+    def __enter__(self):
+        parent = _current_span.get()
+        remote = parse_traceparent(self.traceparent) if parent is None else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+        elif remote is not None:
+            trace_id, parent_id, sampled = remote
+        else:
+            # Head sampling: the root decides for the whole trace, including the MCP subprocess
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < self.tracer.sample_rate
+        self.span = Span(self.name, trace_id, parent_id, sampled, self.attributes)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self.span
+        span.end_ns = time.time_ns()
+        if exc_type is not None:
+            span.status = STATUS_ERROR
+            span.status_message = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self.token)
+        if span.sampled:
+            self.tracer.export(span)
+        return False
+
+
+class _NoopScope:
+    def __enter__(self):
+        return _NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class Tracer:
+    def __init__(self, service: str, exporter: Any = None, sample_rate: float = TRACE_SAMPLE_RATE, enabled: bool = TRACING_ENABLED):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+
+    def span(self, name: str, traceparent: Optional[str] = None, **attributes):
+        """`with tracer.span("llm.call", route="fast") as span: ...`
+
+        Nested spans join the current trace; a root span can continue a remote
+        trace from a `traceparent` header.
+        """
+        if not self.enabled:
+            return _NOOP_SCOPE
+        return _SpanScope(self, name, attributes, traceparent)
+
+    def export(self, span: Span):
+        if self.exporter is None:
+            self.exporter = JsonlSpanExporter(os.path.join(TRACE_EXPORT_DIR, f"spans-{self.service}.jsonl"))
+        try:
+            self.exporter.export(span.to_otlp(self.service))
+        except Exception as e:
+            logger.warning(f"Dropping span {span.name}: {e}")
+
+
+tracer = Tracer("backend")
+
+
+def span(name: str, traceparent: Optional[str] = None, **attributes):
+    """Open a span on the process tracer."""
+    return tracer.span(name, traceparent=traceparent, **attributes)
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the active span, to hand to another process (carries the sampling decision)."""
+    current = _current_span.get()
+    return current.traceparent if current is not None else None
+
+
+def current_trace_ids():
+    """(trace_id, span_id) of the active span, e.g. for log correlation, or None."""
+    current = _current_span.get()
+    return (current.trace_id, current.span_id) if current is not None else None
+
+
+def configure_tracing(service: str, exporter: Any = None, sample_rate: Optional[float] = None, enabled: Optional[bool] = None):
+    """Replace the process tracer, e.g. for the MCP subprocess or in tests."""
+    global tracer
+    tracer = Tracer(
+        service,
+        exporter=exporter,
+        sample_rate=TRACE_SAMPLE_RATE if sample_rate is None else sample_rate,
+        enabled=TRACING_ENABLED if enabled is None else enabled,
+    )
+    return tracer
@@ -0,0 +1,204 @@
+import asyncio
+import datetime
+import logging
+import sqlite3
+from collections import defaultdict
+from contextlib import closing
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import (
+    TOKEN_BUDGET_DOWNGRADE_RATIO,
+    TOKEN_BUDGET_PER_THREAD_DAILY,
+    USAGE_FLUSH_INTERVAL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_WEB = "web"
+CHANNEL_TWILIO = "twilio"
+CHANNEL_META = "meta"
+
+# Set by the routes, like utils.admission.request_priority
+request_channel: ContextVar[str] = ContextVar("request_channel", default="unknown")
+
+BUDGET_OK = "ok"
+BUDGET_DOWNGRADE = "downgrade"
+BUDGET_REFUSE = "refuse"
+
+# Reply when a thread has used up its daily budget
+BUDGET_EXCEEDED_MESSAGE = "This conversation has reached today's usage limit. Please try again tomorrow."
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_usage (
+    day TEXT NOT NULL,
+    thread_id TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    route TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, thread_id, channel, route)
+)
+"""
+_UPSERT = """
+INSERT INTO token_usage (day, thread_id, channel, route, calls, input_tokens, output_tokens)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (day, thread_id, channel, route) DO UPDATE SET
+    calls = calls + excluded.calls,
+    input_tokens = input_tokens + excluded.input_tokens,
+    output_tokens = output_tokens + excluded.output_tokens
+"""
+
+
+def _today() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+
+def usage_tokens(response: Any) -> Tuple[int, int]:
+    """(input, output) tokens reported on a model response; (0, 0) when the provider sent none."""
+    usage = getattr(response, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return 0, 0
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+class UsageLedger:
+    """Per-thread token accounting.
+
+    `record()` only touches memory: calls are summed per (day, thread, channel, route)
+    and written to SQLite in one upsert batch every `flush_interval` seconds and on
+    close. Daily per-thread totals are kept in memory (seeded from SQLite) so budget
+    checks never wait on the database after a thread's first one.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = USAGE_FLUSH_INTERVAL_SECONDS,
+                 daily_budget: int = TOKEN_BUDGET_PER_THREAD_DAILY, downgrade_ratio: float = TOKEN_BUDGET_DOWNGRADE_RATIO):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.daily_budget = daily_budget
+        self.downgrade_ratio = downgrade_ratio
+        self._pending: Dict[Tuple[str, str, str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+        self._thread_totals: Dict[Tuple[str, str], int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"recorded": 0, "flushes": 0, "rows_written": 0, "downgraded": 0, "refused": 0}
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.execute(_SCHEMA)
+
+    def record(self, thread_id: str, channel: str, route: str, input_tokens: int, output_tokens: int):
+        day = _today()
+        entry = self._pending[(day, thread_id, channel, route)]
+        entry[0] += 1
+        entry[1] += input_tokens
+        entry[2] += output_tokens
+        key = (day, thread_id)
+        if key in self._thread_totals:
+            self._thread_totals[key] += input_tokens + output_tokens
+        self.stats["recorded"] += 1
+
+    def _write(self, rows: List[tuple]):
+        with closing(sqlite3.connect(self.db_path)) as conn, conn:
+            conn.executemany(_UPSERT, rows)
+
+    async def flush(self) -> int:
+        """Write pending aggregates to SQLite. Returns the number of rows upserted."""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, defaultdict(lambda: [0, 0, 0])
+        rows = [key + tuple(values) for key, values in pending.items()]
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception:
+            # Put the batch back so it goes out with the next flush
+            for key, values in pending.items():
+                merged = self._pending[key]
+                for i, value in enumerate(values):
+                    merged[i] += value
+            raise
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(rows)
+        return len(rows)
+
+    def _persisted_thread_total(self, day: str, thread_id: str) -> int:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(input_tokens + output_tokens), 0) FROM token_usage WHERE day = ? AND thread_id = ?",
+                (day, thread_id),
+            ).fetchone()
+        return row[0]
+
+    async def thread_tokens_today(self, thread_id: str) -> int:
+        day = _today()
+        key = (day, thread_id)
+        if key not in self._thread_totals:
+            persisted = await asyncio.to_thread(self._persisted_thread_total, day, thread_id)
+            unflushed = sum(v[1] + v[2] for k, v in self._pending.items() if k[0] == day and k[1] == thread_id)
+            # Days roll over: keep only today's totals
+            self._thread_totals = {k: v for k, v in self._thread_totals.items() if k[0] == day}
+            self._thread_totals[key] = persisted + unflushed
+        return self._thread_totals[key]
+
+    async def check_budget(self, thread_id: str) -> str:
+        """BUDGET_OK, BUDGET_DOWNGRADE (near the daily budget) or BUDGET_REFUSE (over it)."""
+        if self.daily_budget <= 0:
+            return BUDGET_OK
+        used = await self.thread_tokens_today(thread_id)
+        if used >= self.daily_budget:
+            self.stats["refused"] += 1
+            return BUDGET_REFUSE
+        if used >= self.daily_budget * self.downgrade_ratio:
+            self.stats["downgraded"] += 1
+            return BUDGET_DOWNGRADE
+        return BUDGET_OK
+
+    # --- Aggregate queries (flush first so they include recent calls) ---
+
+    def _query(self, sql: str, params: tuple) -> List[dict]:
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    async def top_threads(self, day: Optional[str] = None, limit: int = 10) -> List[dict]:
+        """Threads with the most tokens on `day` (default today)."""
+        await self.flush()
+        return await asyncio.to_thread(self._query, """
+            SELECT thread_id, SUM(calls) AS calls, SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens,
+                   SUM(input_tokens + output_tokens) AS total_tokens
+            FROM token_usage WHERE day = ? GROUP BY thread_id ORDER BY total_tokens DESC LIMIT ?
+        """, (day or _today(), limit))
+
+    async def totals(self, group_by: str = "day", since: Optional[str] = None) -> List[dict]:
+        """Token totals grouped by "day", "channel" or "route" since `since` (an ISO date)."""
+        if group_by not in ("day", "channel", "route"):
+            raise ValueError(f"Cannot group token usage by {group_by!r}")
+        await self.flush()
+        return await asyncio.to_thread(self._query, f"""
+            SELECT {group_by}, SUM(calls) AS calls, SUM(input_tokens) AS input_tokens, SUM(output_tokens) AS output_tokens
+            FROM token_usage WHERE day >= ? GROUP BY {group_by} ORDER BY {group_by}
+        """, (since or "",))
+
+    def start(self):
+        """Start the periodic flush task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token usage flush failed: {e}")
+
+    async def aclose(self):
+        """Stop the periodic task and flush what is left."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,141 @@
+import pytest
+import asyncio
+import httpx
+import openai
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.adaptive_concurrency import AdaptiveLimiter, AdaptiveModel, is_throttle, retry_after_seconds
+from utils.model_registry import ModelRegistry
+
+def _rate_limit(headers=None):
+    response = httpx.Response(429, headers=headers or {}, request=httpx.Request("POST", "https://example.test"))
+    return openai.RateLimitError("Too Many Requests", response=response, body=None)
+
+def test_retry_after_parsing():
+    """retry-after-ms wins over retry-after; missing headers give None."""
+    assert retry_after_seconds(_rate_limit({"retry-after-ms": "250", "retry-after": "3"})) == 0.25
+    assert retry_after_seconds(_rate_limit({"retry-after": "3"})) == 3.0
+    assert retry_after_seconds(_rate_limit()) is None
+    assert retry_after_seconds(ValueError("no response")) is None
+
+def test_throttle_classification():
+    """429s and timeouts are throttles; other errors are not."""
+    assert is_throttle(_rate_limit())
+    assert is_throttle(asyncio.TimeoutError())
+    assert not is_throttle(ValueError("bad request"))
+
+def test_aimd_limit():
+    """Successes grow the limit by about one per window; a throttle halves it once per burst."""
+    limiter = AdaptiveLimiter(initial=4, max_limit=8)
+    for _ in range(4):
+        limiter.on_success()
+    assert 4.9 < limiter.limit < 5.0
+
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert 2.4 < limiter.limit < 2.5
+    assert limiter.stats["throttled"] == 2
+
+    limiter.limit = 1
+    limiter._last_decrease = 0
+    limiter.on_throttle(timeout=True)
+    assert limiter.limit == 1
+    assert limiter.stats["timeouts"] == 1
+
+@pytest.mark.asyncio
+async def test_limit_bounds_inflight_calls():
+    """No more calls run than the current limit allows."""
+    limiter = AdaptiveLimiter(initial=2)
+    peak, running = 0, 0
+
+    async def call(messages, config=None):
+        nonlocal peak, running
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return "ok"
+
+    inner = MagicMock()
+    inner.ainvoke = call
+    model = AdaptiveModel(inner, limiter)
+    assert await asyncio.gather(*[model.ainvoke("hi") for _ in range(6)]) == ["ok"] * 6
+    assert peak == 2
+    assert limiter.inflight == 0
+
+@pytest.mark.asyncio
+async def test_retries_honour_retry_after():
+    """Throttled calls wait at least Retry-After (plus jitter) and then succeed."""
+    inner = MagicMock()
+    inner.ainvoke = AsyncMock(side_effect=[_rate_limit({"retry-after": "2"}), "ok"])
+    limiter = AdaptiveLimiter(initial=4)
+    model = AdaptiveModel(inner, limiter, max_retries=3)
+
+    with patch("utils.adaptive_concurrency.asyncio.sleep", AsyncMock()) as sleep:
+        assert await model.ainvoke("hi") == "ok"
+    delay = sleep.await_args.args[0]
+    assert 2.0 <= delay <= 2.4
+    assert limiter.stats["retries"] == 1
+    assert limiter.limit < 4
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries():
+    """The last throttle error is raised once retries run out; other errors are not retried."""
+    inner = MagicMock()
+    inner.ainvoke = AsyncMock(side_effect=_rate_limit())
+    model = AdaptiveModel(inner, AdaptiveLimiter(), max_retries=2)
+    with patch("utils.adaptive_concurrency.asyncio.sleep", AsyncMock()):
+        with pytest.raises(openai.RateLimitError):
+            await model.ainvoke("hi")
+    assert inner.ainvoke.await_count == 3
+
+    inner.ainvoke = AsyncMock(side_effect=ValueError("bad"))
+    with pytest.raises(ValueError):
+        await model.ainvoke("hi")
+    assert inner.ainvoke.await_count == 1
+
+@pytest.mark.asyncio
+async def test_transient_errors_retried_without_backoff_of_limit():
+    """5xx and connection errors are retried, but only throttles lower the concurrency limit."""
+    request = httpx.Request("POST", "https://example.test")
+    server_error = openai.InternalServerError("Bad Gateway", response=httpx.Response(502, request=request), body=None)
+    inner = MagicMock()
+    inner.ainvoke = AsyncMock(side_effect=[server_error, openai.APIConnectionError(request=request), "ok"])
+    limiter = AdaptiveLimiter(initial=4)
+    model = AdaptiveModel(inner, limiter, max_retries=3)
+
+    with patch("utils.adaptive_concurrency.asyncio.sleep", AsyncMock()):
+        assert await model.ainvoke("hi") == "ok"
+    assert inner.ainvoke.await_count == 3
+    assert limiter.stats["retries"] == 2
+    assert limiter.limit >= 4
+
+@pytest.mark.asyncio
+async def test_long_retry_after_is_not_shortened():
+    """A Retry-After beyond the backoff cap is raised rather than retried early."""
+    inner = MagicMock()
+    inner.ainvoke = AsyncMock(side_effect=_rate_limit({"retry-after": "120"}))
+    model = AdaptiveModel(inner, AdaptiveLimiter(), max_retries=3, backoff_max=30)
+
+    with patch("utils.adaptive_concurrency.asyncio.sleep", AsyncMock()) as sleep:
+        with pytest.raises(openai.RateLimitError):
+            await model.ainvoke("hi")
+    assert inner.ainvoke.await_count == 1
+    sleep.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_registry_wraps_runnables(monkeypatch):
+    """ModelRegistry wraps LangChain models and exposes per-provider stats."""
+    monkeypatch.setattr(ModelRegistry, "_limiters", {})
+    ModelRegistry.register("fake-adaptive", lambda: FakeListChatModel(responses=["hello"]))
+    model = ModelRegistry.get_model("fake-adaptive")
+
+    assert isinstance(model, AdaptiveModel)
+    assert (await model.ainvoke("hi")).content == "hello"
+    assert ModelRegistry.concurrency_stats()["fake-adaptive"]["successes"] == 1
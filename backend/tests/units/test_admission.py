@@ -0,0 +1,106 @@
+import pytest
+import asyncio
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.admission import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    AdmissionController,
+    ServiceBusyError,
+    request_priority,
+)
+
+async def _hold(controller, order, name, release, priority=None):
+    async with controller.slot(priority):
+        order.append(name)
+        await release.wait()
+
+@pytest.mark.asyncio
+async def test_concurrency_limit():
+    """No more than max_concurrent calls run at once."""
+    controller = AdmissionController(max_concurrent=2, max_queue=10)
+    release, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(_hold(controller, order, i, release)) for i in range(4)]
+    await asyncio.sleep(0.01)
+    assert controller.active == 2
+    assert controller.waiting == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert controller.active == 0
+    assert controller.stats["admitted"] == 4
+
+@pytest.mark.asyncio
+async def test_interactive_calls_jump_the_queue():
+    """Queued interactive calls are admitted before earlier background calls."""
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    gate, order = asyncio.Event(), []
+    first = asyncio.create_task(_hold(controller, order, "running", gate))
+    await asyncio.sleep(0)
+    done = asyncio.Event()
+    done.set()
+    background = asyncio.create_task(_hold(controller, order, "background", done, PRIORITY_BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(_hold(controller, order, "interactive", done, PRIORITY_INTERACTIVE))
+    await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(first, background, interactive)
+    assert order == ["running", "interactive", "background"]
+
+@pytest.mark.asyncio
+async def test_priority_comes_from_context():
+    """Without an explicit priority the request's context decides."""
+    controller = AdmissionController(max_concurrent=1, max_queue=10)
+    gate, order = asyncio.Event(), []
+    first = asyncio.create_task(_hold(controller, order, "running", gate))
+    await asyncio.sleep(0)
+    done = asyncio.Event()
+    done.set()
+    background = asyncio.create_task(_hold(controller, order, "background", done))
+    await asyncio.sleep(0)
+
+    async def interactive_request():
+        request_priority.set(PRIORITY_INTERACTIVE)
+        await _hold(controller, order, "interactive", done)
+    interactive = asyncio.create_task(interactive_request())
+    await asyncio.sleep(0)
+
+    gate.set()
+    await asyncio.gather(first, background, interactive)
+    assert order == ["running", "interactive", "background"]
+
+@pytest.mark.asyncio
+async def test_saturated_queue_rejects_immediately():
+    """With the queue full, new calls fail fast."""
+    controller = AdmissionController(max_concurrent=1, max_queue=1)
+    gate, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(_hold(controller, order, i, gate)) for i in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceBusyError):
+        await controller.acquire()
+    assert controller.stats["rejected"] == 1
+    gate.set()
+    await asyncio.gather(*tasks)
+
+@pytest.mark.asyncio
+async def test_queue_deadline():
+    """Calls that wait longer than their class deadline give up and free their queue place."""
+    controller = AdmissionController(max_concurrent=1, max_queue=5, queue_timeouts={PRIORITY_BACKGROUND: 0.01})
+    gate, order = asyncio.Event(), []
+    holder = asyncio.create_task(_hold(controller, order, "running", gate))
+    await asyncio.sleep(0)
+
+    with pytest.raises(ServiceBusyError):
+        await controller.acquire(PRIORITY_BACKGROUND)
+    assert controller.stats["timed_out"] == 1
+    assert controller.waiting == 0
+
+    gate.set()
+    await holder
+    assert controller.active == 0
@@ -23,7 +23,7 @@ def mock_mcp_client():
     return client
 
 @pytest.mark.asyncio
-async def test_agent_initialization(mock_mcp_client):
+async def test_agent_initialization(mock_mcp_client, tmp_path):
     """Test agent initialization and tool loading."""
     # Ensure Azure env vars are present to trigger Azure path, or at least pass validation
     envs = {
@@ -33,6 +33,8 @@ async def test_agent_initialization(mock_mcp_client):
     }
     with patch.dict(os.environ, envs):
         agent = ChatbotAgent()
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
         agent.mcp_client = mock_mcp_client
     
         # Mock LangGraph compile
@@ -82,6 +84,7 @@ async def test_agent_chat_flow(mock_mcp_client):
     agent = ChatbotAgent()
     agent.mcp_client = mock_mcp_client
     agent.app = AsyncMock()
+    agent.app.aget_state.return_value = MagicMock(values={})
     
     # Mock graph invocation response
     mock_response = {
@@ -103,6 +106,7 @@ async def test_agent_chat_error_handling(mock_mcp_client):
     agent = ChatbotAgent()
     agent.mcp_client = mock_mcp_client
     agent.app = AsyncMock()
+    agent.app.aget_state.return_value = MagicMock(values={})
     
     # Simulate an error
     agent.app.ainvoke.side_effect = Exception("Graph error")
@@ -116,11 +120,13 @@ async def test_agent_chat_error_handling(mock_mcp_client):
     msg_with_tool = AIMessage(content="", tool_calls=[{"name": "tool", "args": {}, "id": "call_123"}])
 
 @pytest.mark.asyncio
-async def test_agent_initialization_standard_openai(mock_mcp_client):
+async def test_agent_initialization_standard_openai(mock_mcp_client, tmp_path):
     """Test agent initialization with standard OpenAI (non-Azure)."""
     # Provide a dummy key so ChatOpenAI init doesn't fail before mock takes over or during validation
     with patch.dict(os.environ, {"OPENAI_API_KEY": "dummy"}, clear=True):
         agent = ChatbotAgent()
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
         agent.mcp_client = mock_mcp_client
         
         with patch("agent.ModelFactory.get_model") as mock_get_model, \
@@ -139,18 +145,21 @@ async def test_agent_initialization_standard_openai(mock_mcp_client):
 
 @pytest.mark.asyncio
 async def test_agent_cleanup(mock_mcp_client):
-    """Test cleanup calls close on mcp client and db connection"""
+    """Test cleanup closes the mcp client, flushes the checkpoint cache and closes storage"""
     agent = ChatbotAgent()
     agent.mcp_client = mock_mcp_client
     
-    # Mock the database connection and its async close method
-    agent.conn = MagicMock()
-    agent.conn.close = AsyncMock()
+    # Mock the write-behind cache and the sqlite storage beneath it
+    agent.memory = MagicMock()
+    agent.memory.aclose = AsyncMock()
+    agent.storage = MagicMock()
+    agent.storage.aclose = AsyncMock()
     
     await agent.cleanup()
     
     mock_mcp_client.close.assert_awaited_once()
-    agent.conn.close.assert_awaited_once()
+    agent.memory.aclose.assert_awaited_once()
+    agent.storage.aclose.assert_awaited_once()
 
 @pytest.mark.asyncio
 async def test_agent_load_training_data_file():
@@ -231,28 +240,63 @@ async def test_agent_call_model_preserves_system_message(mock_mcp_client):
 
 @pytest.mark.asyncio
 async def test_agent_reset_history():
-    """Test history reset attempts to clear records."""
+    """Test history reset deletes the thread through the checkpointer."""
     agent = ChatbotAgent()
-    agent.conn = MagicMock()
-    agent.conn.execute = AsyncMock()
-    agent.conn.commit = AsyncMock()
+    agent.memory = MagicMock()
+    agent.memory.adelete_thread = AsyncMock()
     
     await agent.reset_history("test_thread")
     
-    assert agent.conn.execute.called
+    agent.memory.adelete_thread.assert_awaited_once_with("test_thread")
 
 @pytest.mark.asyncio
 async def test_agent_reset_history_exception():
     """Test history reset handles SQLite exceptions gracefully."""
     agent = ChatbotAgent()
-    agent.conn = MagicMock()
-    agent.conn.execute = AsyncMock(side_effect=Exception("SQLite Error"))
+    agent.memory = MagicMock()
+    agent.memory.adelete_thread = AsyncMock(side_effect=Exception("SQLite Error"))
     
     # Should catch the error and log it
     with patch("agent.logger") as mock_logger:
         await agent.reset_history("test_thread")
         mock_logger.error.assert_called_with("Failed to reset history for test_thread: SQLite Error")
 
+@pytest.mark.asyncio
+async def test_agent_reset_history_sharded(tmp_path):
+    """Test reset_history removes a thread from the shard that owns it."""
+    with patch("agent.CHECKPOINT_SHARDS", 3), patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        await agent._init_memory()
+        try:
+            from langgraph.checkpoint.base import empty_checkpoint
+            for thread_id in ["a", "b", "c", "d"]:
+                await agent.memory.aput({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}, empty_checkpoint(), {}, {})
+
+            await agent.reset_history("c")
+
+            assert await agent.memory.aget_tuple({"configurable": {"thread_id": "c", "checkpoint_ns": ""}}) is None
+            assert await agent.memory.aget_tuple({"configurable": {"thread_id": "d", "checkpoint_ns": ""}}) is not None
+        finally:
+            await agent.cleanup()
+
+@pytest.mark.asyncio
+async def test_agent_message_log_backend(tmp_path):
+    """Test the message log backend is used in its own file and covered by compaction."""
+    with patch("agent.CHECKPOINT_BACKEND", "message_log"), patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.data_dir = str(tmp_path)
+        await agent._init_memory()
+        try:
+            from utils.message_log import MessageLogCheckpointer
+            assert isinstance(agent.memory, MessageLogCheckpointer)
+            assert os.path.exists(tmp_path / "chat_messages.sqlite")
+            stats = await agent.compact_history()
+            assert stats["expired_threads"] == 0
+            assert stats["pruned_rows"] == 0
+        finally:
+            await agent.cleanup()
+
 @pytest.mark.asyncio
 async def test_agent_chat_auto_initialize(mock_mcp_client):
     """Test that chat() calls initialize() if app is None."""
@@ -262,6 +306,7 @@ async def test_agent_chat_auto_initialize(mock_mcp_client):
     # Mock app that will be set during initialize
     mock_app = AsyncMock()
     mock_app.ainvoke.return_value = {"messages": [AIMessage(content="Response")]}
+    mock_app.aget_state.return_value = MagicMock(values={})
 
     # Mock initialize to set the app
     async def mock_init_side_effect():
@@ -275,3 +320,15 @@ async def test_agent_chat_auto_initialize(mock_mcp_client):
     await agent.chat("Hello", thread_id="test_thread")
     
     agent.initialize.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_agent_chat_propagates_busy(mock_mcp_client):
+    """Test that shed model calls are not turned into an error reply."""
+    from utils.admission import ServiceBusyError
+    agent = ChatbotAgent()
+    agent.faq_matcher = None
+    agent.response_cache = None
+    agent.app = AsyncMock()
+    agent.app.ainvoke.side_effect = ServiceBusyError("busy")
+    with pytest.raises(ServiceBusyError):
+        await agent.chat("Hello", "t1")
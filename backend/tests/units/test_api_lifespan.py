@@ -68,3 +68,19 @@ async def test_background_cleanup_task_exception():
                 await main.background_cleanup_task()
                 mock_logger.error.assert_called_with("Image cleanup task error: Test error")
                 mock_sleep.assert_awaited_once_with(3600)
+
+@pytest.mark.asyncio
+async def test_background_checkpoint_retention_task():
+    """Verify that the retention task compacts history, logs errors and stops on cancel"""
+    import asyncio
+
+    mock_chatbot = MagicMock()
+    mock_chatbot.agent.compact_history = AsyncMock(side_effect=[Exception("Locked"), asyncio.CancelledError()])
+
+    with patch.object(app_state, "chatbot", mock_chatbot):
+        with patch("main.app_state.logger") as mock_logger:
+            with patch("main.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+                await main.background_checkpoint_retention_task()
+                mock_logger.error.assert_called_with("Checkpoint retention task error: Locked")
+                mock_sleep.assert_awaited_once_with(main.CHECKPOINT_RETENTION_INTERVAL_SECONDS)
+    assert mock_chatbot.agent.compact_history.await_count == 2
@@ -0,0 +1,203 @@
+import pytest
+import pytest_asyncio
+import asyncio
+import operator
+from typing import Annotated, Sequence, TypedDict
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, StateGraph
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.checkpoint_storage import create_checkpointer
+from utils.checkpoint_cache import WriteBehindCheckpointer
+
+def _config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+async def _rows(storage, thread_id):
+    async with storage.conn.execute(
+        "SELECT checkpoint_id, parent_checkpoint_id FROM checkpoints WHERE thread_id = ? ORDER BY checkpoint_id", (thread_id,)
+    ) as cur:
+        return await cur.fetchall()
+
+@pytest_asyncio.fixture
+async def storage(tmp_path):
+    storage = await create_checkpointer(str(tmp_path / "chat_history.sqlite"), reader_pool_size=0)
+    yield storage
+    await storage.aclose()
+
+@pytest.mark.asyncio
+async def test_reads_served_from_memory_until_flush(storage):
+    """Writes land in memory first and reach SQLite on flush."""
+    cache = WriteBehindCheckpointer(storage)
+    saved = await cache.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+
+    latest = await cache.aget_tuple(_config("t1"))
+    assert latest.config == saved
+    assert cache.stats["hits"] == 1
+    assert await _rows(storage, "t1") == []
+
+    await cache.flush()
+    assert len(await _rows(storage, "t1")) == 1
+
+@pytest.mark.asyncio
+async def test_consecutive_checkpoints_are_coalesced(storage):
+    """Only the newest checkpoint between flushes is persisted, chained to the last flushed one."""
+    cache = WriteBehindCheckpointer(storage)
+    parent = None
+    for step in range(3):
+        parent = (await cache.aput(_config("t1", parent and parent["configurable"]["checkpoint_id"]), empty_checkpoint(), {"step": step}, {}))
+    await cache.flush()
+    first_rows = await _rows(storage, "t1")
+    assert len(first_rows) == 1
+    assert first_rows[0] == (parent["configurable"]["checkpoint_id"], None)
+    assert cache.stats["coalesced"] == 2
+
+    latest = await cache.aput(_config("t1", parent["configurable"]["checkpoint_id"]), empty_checkpoint(), {"step": 3}, {})
+    await cache.flush()
+    rows = await _rows(storage, "t1")
+    assert rows[-1] == (latest["configurable"]["checkpoint_id"], parent["configurable"]["checkpoint_id"])
+
+@pytest.mark.asyncio
+async def test_pending_writes_are_cached_and_flushed(storage):
+    """Writes for the cached head are returned from memory and persisted with it."""
+    cache = WriteBehindCheckpointer(storage)
+    saved = await cache.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await cache.aput_writes(saved, [("messages", "hello")], task_id="task-1")
+
+    latest = await cache.aget_tuple(_config("t1"))
+    assert latest.pending_writes == [("task-1", "messages", "hello")]
+
+    await cache.flush()
+    persisted = await storage.aget_tuple(_config("t1"))
+    assert persisted.pending_writes == [("task-1", "messages", "hello")]
+
+@pytest.mark.asyncio
+async def test_eviction_flushes_least_recently_used(storage):
+    """Exceeding the memory budget flushes and drops the coldest thread."""
+    cache = WriteBehindCheckpointer(storage, max_bytes=1)
+    await cache.aput(_config("cold"), empty_checkpoint(), {"step": 0}, {})
+    await cache.aput(_config("hot"), empty_checkpoint(), {"step": 0}, {})
+
+    assert cache.stats["evicted"] == 1
+    assert len(await _rows(storage, "cold")) == 1
+    assert ("hot", "") in cache._threads
+    assert ("cold", "") not in cache._threads
+
+@pytest.mark.asyncio
+async def test_write_during_eviction_flush_is_kept(storage):
+    """A checkpoint written while its thread is being flushed for eviction stays cached and reaches SQLite."""
+    cache = WriteBehindCheckpointer(storage, max_bytes=1)
+    await cache.aput(_config("cold"), empty_checkpoint(), {"step": 0}, {})
+    started, release = asyncio.Event(), asyncio.Event()
+    original_aput = storage.aput
+
+    async def _slow_aput(*args, **kwargs):
+        started.set()
+        await release.wait()
+        return await original_aput(*args, **kwargs)
+
+    storage.aput = _slow_aput
+    evicting = asyncio.create_task(cache.aput(_config("hot"), empty_checkpoint(), {"step": 0}, {}))
+    await started.wait()
+    # Its own eviction pass waits for the flush lock, so run it alongside
+    writing = asyncio.create_task(cache.aput(_config("cold"), empty_checkpoint(), {"step": 1}, {}))
+    await asyncio.sleep(0)
+    release.set()
+    await evicting
+    newer = await writing
+    storage.aput = original_aput
+
+    assert ("cold", "") in cache._threads
+    assert (await cache.aget_tuple(_config("cold"))).config == newer
+    await cache.flush()
+    assert (await _rows(storage, "cold"))[-1][0] == newer["configurable"]["checkpoint_id"]
+    assert cache._bytes == sum(state.size for state in cache._threads.values())
+
+@pytest.mark.asyncio
+async def test_miss_loads_from_sqlite(storage):
+    """Threads not in memory are read from SQLite and then cached."""
+    await storage.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    cache = WriteBehindCheckpointer(storage)
+
+    assert await cache.aget_tuple(_config("t1")) is not None
+    assert await cache.aget_tuple(_config("t1")) is not None
+    assert cache.stats == {**cache.stats, "misses": 1, "hits": 1}
+
+@pytest.mark.asyncio
+async def test_evict_discards_pending_state(storage):
+    """Evicting a thread (history reset) never writes its pending state."""
+    cache = WriteBehindCheckpointer(storage)
+    await cache.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    cache.evict("t1")
+    await cache.flush()
+
+    assert await _rows(storage, "t1") == []
+    assert cache._bytes == 0
+
+@pytest.mark.asyncio
+async def test_delete_waits_for_flush_in_flight(storage):
+    """A flush that is already writing cannot re-insert rows after the thread is deleted."""
+    cache = WriteBehindCheckpointer(storage)
+    await cache.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    started, release = asyncio.Event(), asyncio.Event()
+    original_aput = storage.aput
+
+    async def _slow_aput(*args, **kwargs):
+        started.set()
+        await release.wait()
+        return await original_aput(*args, **kwargs)
+
+    storage.aput = _slow_aput
+    flushing = asyncio.create_task(cache.flush())
+    await started.wait()
+    deleting = asyncio.create_task(cache.adelete_thread("t1"))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(flushing, deleting)
+
+    assert await _rows(storage, "t1") == []
+    assert await cache.aget_tuple(_config("t1")) is None
+
+@pytest.mark.asyncio
+async def test_aclose_flushes(storage):
+    """Closing stops the flush task and persists everything."""
+    cache = WriteBehindCheckpointer(storage, flush_interval=3600)
+    cache.start()
+    await cache.aput(_config("t1"), empty_checkpoint(), {"step": 0}, {})
+    await cache.aclose()
+
+    assert len(await _rows(storage, "t1")) == 1
+    assert cache._flush_task is None
+
+class _State(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], operator.add]
+
+@pytest.mark.asyncio
+async def test_graph_state_round_trip(storage):
+    """A compiled graph keeps conversation state across turns through the cache and in SQLite."""
+    async def reply(state):
+        return {"messages": [AIMessage(content=f"echo {len(state['messages'])}")]}
+
+    workflow = StateGraph(_State)
+    workflow.add_node("agent", reply)
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", END)
+    cache = WriteBehindCheckpointer(storage)
+    app = workflow.compile(checkpointer=cache)
+
+    config = {"configurable": {"thread_id": "t1"}}
+    await app.ainvoke({"messages": [HumanMessage(content="one")]}, config=config)
+    final = await app.ainvoke({"messages": [HumanMessage(content="two")]}, config=config)
+    assert len(final["messages"]) == 4
+    await cache.aclose()
+
+    persisted = await storage.aget_tuple(_config("t1"))
+    assert len(persisted.checkpoint["channel_values"]["messages"]) == 4
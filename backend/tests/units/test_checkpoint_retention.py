@@ -0,0 +1,172 @@
+import pytest
+import pytest_asyncio
+import time
+from unittest.mock import patch
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.checkpoint_cache import WriteBehindCheckpointer
+from utils.checkpoint_storage import create_checkpointer
+from utils.checkpoint_retention import CheckpointRetention, checkpoint_id_at, convert_to_incremental_vacuum
+from utils.message_log import create_message_log_checkpointer
+
+async def _write_thread(saver, thread_id, count):
+    parent = None
+    for step in range(count):
+        configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+        if parent:
+            configurable["checkpoint_id"] = parent
+        result = await saver.aput({"configurable": configurable}, empty_checkpoint(), {"step": step}, {})
+        parent = result["configurable"]["checkpoint_id"]
+        await saver.aput_writes(result, [("messages", f"write {step}")], task_id=f"task-{step}")
+    return parent
+
+async def _count(saver, table, thread_id):
+    async with saver.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)) as cur:
+        return (await cur.fetchone())[0]
+
+async def _write_later(saver, thread_id, later):
+    # Restore uuid6's monotonic clock afterwards so later ids are not pushed into the future
+    with patch("langgraph.checkpoint.base.id.time.time_ns", return_value=int(later * 1e9)), \
+         patch("langgraph.checkpoint.base.id._last_v6_timestamp", None):
+        await _write_thread(saver, thread_id, 1)
+
+@pytest_asyncio.fixture
+async def saver(tmp_path):
+    saver = await create_checkpointer(str(tmp_path / "chat_history.sqlite"), reader_pool_size=0)
+    yield saver
+    await saver.aclose()
+
+def test_checkpoint_id_at_sorts_with_uuid6():
+    """Cutoff ids sort between checkpoint ids created before and after."""
+    before = str(uuid6())
+    cutoff = checkpoint_id_at(time.time() + 1)
+    after_ts = time.time() + 2
+    with patch("langgraph.checkpoint.base.id.time.time_ns", return_value=int(after_ts * 1e9)), \
+         patch("langgraph.checkpoint.base.id._last_v6_timestamp", None):
+        after = str(uuid6())
+    assert before < cutoff < after
+
+@pytest.mark.asyncio
+async def test_prune_keeps_latest_checkpoints(saver):
+    """Only the newest K checkpoints and their writes survive."""
+    latest = await _write_thread(saver, "busy", 8)
+    await _write_thread(saver, "quiet", 2)
+
+    pruned = await CheckpointRetention(saver, keep_last=3, idle_ttl_hours=0).prune_old_checkpoints()
+
+    assert pruned > 0
+    assert await _count(saver, "checkpoints", "busy") == 3
+    assert await _count(saver, "writes", "busy") == 3
+    assert await _count(saver, "checkpoints", "quiet") == 2
+    state = await saver.aget_tuple({"configurable": {"thread_id": "busy", "checkpoint_ns": ""}})
+    assert state.config["configurable"]["checkpoint_id"] == latest
+
+@pytest.mark.asyncio
+async def test_prune_in_batches(saver):
+    """Pruning walks all threads even when they exceed one batch."""
+    for i in range(5):
+        await _write_thread(saver, f"t{i}", 3)
+
+    await CheckpointRetention(saver, keep_last=1, idle_ttl_hours=0, batch_size=2).prune_old_checkpoints()
+
+    for i in range(5):
+        assert await _count(saver, "checkpoints", f"t{i}") == 1
+
+@pytest.mark.asyncio
+async def test_expire_idle_threads(saver):
+    """Threads whose latest checkpoint is older than the TTL are deleted."""
+    await _write_thread(saver, "old", 2)
+    retention = CheckpointRetention(saver, keep_last=0, idle_ttl_hours=1)
+
+    assert await retention.expire_idle_threads() == 0
+
+    later = time.time() + 7200
+    await _write_later(saver, "new", later)
+    with patch("utils.checkpoint_retention.time.time", return_value=later):
+        assert await retention.expire_idle_threads() == 1
+
+    assert await _count(saver, "checkpoints", "old") == 0
+    assert await _count(saver, "writes", "old") == 0
+    assert await _count(saver, "checkpoints", "new") == 1
+
+@pytest.mark.asyncio
+async def test_expire_through_write_behind_cache(saver):
+    """Expiring through the cache drops its pending state, so a later flush cannot write the thread back."""
+    cache = WriteBehindCheckpointer(saver)
+    saved = await cache.aput({"configurable": {"thread_id": "old", "checkpoint_ns": ""}}, empty_checkpoint(), {"step": 0}, {})
+    await cache.flush()
+    await cache.aput_writes(saved, [("messages", "pending")], task_id="task-1")
+    later = time.time() + 7200
+    await _write_later(saver, "new", later)
+
+    retention = CheckpointRetention(saver, keep_last=0, idle_ttl_hours=1, delete_thread=cache.adelete_thread)
+    with patch("utils.checkpoint_retention.time.time", return_value=later):
+        assert await retention.expire_idle_threads() == 1
+    await cache.flush()
+
+    assert await _count(saver, "checkpoints", "old") == 0
+    assert await _count(saver, "writes", "old") == 0
+    assert await cache.aget_tuple({"configurable": {"thread_id": "old", "checkpoint_ns": ""}}) is None
+    assert await _count(saver, "checkpoints", "new") == 1
+
+@pytest.mark.asyncio
+async def test_expire_idle_message_log_threads(tmp_path):
+    """Idle threads are also expired from the message-log backend, which is never pruned."""
+    log = await create_message_log_checkpointer(str(tmp_path / "chat_messages.sqlite"))
+    try:
+        await _write_thread(log, "old", 3)
+        later = time.time() + 7200
+        await _write_later(log, "new", later)
+        retention = CheckpointRetention(log, keep_last=1, idle_ttl_hours=1)
+
+        assert await retention.prune_old_checkpoints() == 0
+        with patch("utils.checkpoint_retention.time.time", return_value=later):
+            assert await retention.expire_idle_threads() == 1
+
+        assert await _count(log, "thread_heads", "old") == 0
+        assert await _count(log, "head_writes", "old") == 0
+        assert await _count(log, "thread_heads", "new") == 1
+    finally:
+        await log.aclose()
+
+@pytest.mark.asyncio
+async def test_incremental_vacuum_frees_pages(saver):
+    """Free pages left by deletes are returned to the filesystem."""
+    for i in range(20):
+        await _write_thread(saver, f"t{i}", 5)
+    retention = CheckpointRetention(saver, keep_last=1, idle_ttl_hours=0, vacuum_pages=2)
+
+    stats = await retention.run_once()
+
+    assert stats["pruned_rows"] > 0
+    async with saver.conn.execute("PRAGMA freelist_count") as cur:
+        assert (await cur.fetchone())[0] == 0
+
+@pytest.mark.asyncio
+async def test_incremental_vacuum_skipped_without_auto_vacuum(tmp_path):
+    """Databases created without incremental auto_vacuum are left alone."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    conn = await aiosqlite.connect(str(tmp_path / "legacy.sqlite"))
+    try:
+        legacy = AsyncSqliteSaver(conn)
+        await legacy.setup()
+        assert await CheckpointRetention(legacy).incremental_vacuum() == 0
+    finally:
+        await conn.close()
+
+def test_convert_to_incremental_vacuum(tmp_path):
+    """The offline conversion switches auto_vacuum to incremental."""
+    import sqlite3
+    db_path = str(tmp_path / "legacy.sqlite")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE t (x)")
+    convert_to_incremental_vacuum(db_path)
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
@@ -0,0 +1,96 @@
+import pytest
+import sqlite3
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.checkpoint_serde import CompactSerializer, migrate_serialization
+from utils.checkpoint_storage import create_checkpointer
+
+def _checkpoint(messages):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    return checkpoint
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+def test_round_trip_is_smaller_than_default():
+    """Compressed checkpoints load back identically and take less space."""
+    messages = [HumanMessage(content=f"question {i}") for i in range(20)] + [AIMessage(content="answer " * 20)]
+    serde = CompactSerializer()
+    type_, data = serde.dumps_typed(_checkpoint(messages))
+
+    assert type_.startswith("compact/zlib-d1/")
+    assert len(data) < len(JsonPlusSerializer().dumps_typed(_checkpoint(messages))[1])
+    assert serde.loads_typed((type_, data))["channel_values"]["messages"] == messages
+
+def test_small_payloads_are_not_compressed():
+    """Values below the threshold skip compression."""
+    serde = CompactSerializer(min_bytes=1024)
+    type_, data = serde.dumps_typed("hi")
+    assert type_.startswith("compact/raw/")
+    assert serde.loads_typed((type_, data)) == "hi"
+
+def test_zstd_codec():
+    """zstd uses the same dictionary and is recorded in the type tag."""
+    pytest.importorskip("zstandard")
+    serde = CompactSerializer(compression="zstd")
+    type_, data = serde.dumps_typed(_checkpoint([AIMessage(content="answer " * 100)]))
+    assert type_.startswith("compact/zstd-d1/")
+    assert serde.loads_typed((type_, data))["channel_values"]["messages"][0].content == "answer " * 100
+
+@pytest.mark.asyncio
+async def test_migrates_legacy_database(tmp_path):
+    """Rows written by the default serializer are readable before and after migration."""
+    db_path = str(tmp_path / "chat_history.sqlite")
+    legacy = await create_checkpointer(db_path, reader_pool_size=0)
+    saved = await legacy.aput(_config("t1"), _checkpoint([HumanMessage(content="hello " * 100)]), {"step": 1}, {})
+    await legacy.aput_writes(saved, [("messages", [AIMessage(content="hi")])], task_id="task-1")
+    await legacy.aclose()
+
+    serde = CompactSerializer()
+    saver = await create_checkpointer(db_path, reader_pool_size=0, serde=serde)
+    try:
+        assert (await saver.aget_tuple(_config("t1"))).checkpoint["channel_values"]["messages"][0].content == "hello " * 100
+
+        assert migrate_serialization(db_path, serde) == 2
+        assert migrate_serialization(db_path, serde) == 0
+        with sqlite3.connect(db_path) as conn:
+            types = [row[0] for row in conn.execute("SELECT type FROM checkpoints UNION ALL SELECT type FROM writes")]
+        assert all(t.startswith("compact/") for t in types)
+
+        migrated = await saver.aget_tuple(_config("t1"))
+        assert migrated.checkpoint["channel_values"]["messages"][0].content == "hello " * 100
+        assert migrated.pending_writes == [("task-1", "messages", [AIMessage(content="hi")])]
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_migrates_back_to_default(tmp_path):
+    """Compact rows are converted back so the default serializer can read them."""
+    db_path = str(tmp_path / "chat_history.sqlite")
+    serde = CompactSerializer()
+    compact = await create_checkpointer(db_path, reader_pool_size=0, serde=serde)
+    saved = await compact.aput(_config("t1"), _checkpoint([HumanMessage(content="hello " * 100)]), {"step": 1}, {})
+    await compact.aput_writes(saved, [("messages", [AIMessage(content="hi")])], task_id="task-1")
+    await compact.aclose()
+
+    assert migrate_serialization(db_path, serde, to="default") == 2
+    assert migrate_serialization(db_path, serde, to="default") == 0
+    with sqlite3.connect(db_path) as conn:
+        types = [row[0] for row in conn.execute("SELECT type FROM checkpoints UNION ALL SELECT type FROM writes")]
+    assert not any(t.startswith("compact/") for t in types)
+
+    saver = await create_checkpointer(db_path, reader_pool_size=0)
+    try:
+        restored = await saver.aget_tuple(_config("t1"))
+        assert restored.checkpoint["channel_values"]["messages"][0].content == "hello " * 100
+        assert restored.pending_writes == [("task-1", "messages", [AIMessage(content="hi")])]
+    finally:
+        await saver.aclose()
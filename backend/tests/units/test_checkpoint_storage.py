@@ -0,0 +1,119 @@
+import pytest
+import asyncio
+from langgraph.checkpoint.base import empty_checkpoint
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.checkpoint_storage import create_checkpointer, open_sqlite_connection, PooledSqliteSaver
+
+def _config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+async def _put(saver, thread_id, parent=None):
+    checkpoint = empty_checkpoint()
+    return await saver.aput(_config(thread_id, parent), checkpoint, {"step": 1}, {})
+
+@pytest.mark.asyncio
+async def test_connection_pragmas(tmp_path):
+    """Connections run in WAL mode with synchronous=NORMAL."""
+    conn = await open_sqlite_connection(str(tmp_path / "db.sqlite"))
+    try:
+        async with conn.execute("PRAGMA journal_mode") as cur:
+            assert (await cur.fetchone())[0] == "wal"
+        async with conn.execute("PRAGMA synchronous") as cur:
+            # 1 == NORMAL
+            assert (await cur.fetchone())[0] == 1
+    finally:
+        await conn.close()
+
+@pytest.mark.asyncio
+async def test_reader_connections_are_query_only(tmp_path):
+    """Reader connections refuse writes."""
+    db_path = str(tmp_path / "db.sqlite")
+    saver = await create_checkpointer(db_path, reader_pool_size=1)
+    try:
+        with pytest.raises(Exception):
+            await saver.readers[0].execute("DELETE FROM checkpoints")
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_pooled_round_trip(tmp_path):
+    """Checkpoints written by the writer are visible through the reader pool."""
+    saver = await create_checkpointer(str(tmp_path / "db.sqlite"), reader_pool_size=2)
+    try:
+        first = await _put(saver, "t1")
+        second = await _put(saver, "t1", first["configurable"]["checkpoint_id"])
+
+        latest = await saver.aget_tuple(_config("t1"))
+        assert latest.config["configurable"]["checkpoint_id"] == second["configurable"]["checkpoint_id"]
+        assert latest.parent_config["configurable"]["checkpoint_id"] == first["configurable"]["checkpoint_id"]
+
+        listed = [item async for item in saver.alist(_config("t1"))]
+        assert len(listed) == 2
+        # Readers are returned to the pool after use
+        assert saver._reader_pool.qsize() == 2
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_concurrent_reads(tmp_path):
+    """More concurrent reads than readers queue for a connection instead of failing."""
+    saver = await create_checkpointer(str(tmp_path / "db.sqlite"), reader_pool_size=2)
+    try:
+        for i in range(5):
+            await _put(saver, f"t{i}")
+        results = await asyncio.gather(*[saver.aget_tuple(_config(f"t{i}")) for i in range(5)])
+        assert all(r is not None for r in results)
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_no_readers_falls_back_to_writer(tmp_path):
+    """With an empty pool, reads go through the writer connection."""
+    saver = await create_checkpointer(str(tmp_path / "db.sqlite"), reader_pool_size=0)
+    try:
+        await _put(saver, "t1")
+        assert await saver.aget_tuple(_config("t1")) is not None
+        assert len([item async for item in saver.alist(_config("t1"))]) == 1
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_alist_releases_reader_before_yielding(tmp_path):
+    """A caller that stops mid-iteration does not keep a reader checked out."""
+    saver = await create_checkpointer(str(tmp_path / "db.sqlite"), reader_pool_size=1)
+    try:
+        first = await _put(saver, "t1")
+        await _put(saver, "t1", first["configurable"]["checkpoint_id"])
+        listing = saver.alist(_config("t1"))
+        assert await listing.__anext__() is not None
+        assert saver._reader_pool.qsize() == 1
+        assert await asyncio.wait_for(saver.aget_tuple(_config("t1")), timeout=1) is not None
+        await listing.aclose()
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_thread_scoped_queries_use_indexes(tmp_path):
+    """Thread-scoped reads, deletes and channel reads never scan the table (the primary keys cover them)."""
+    saver = await create_checkpointer(str(tmp_path / "db.sqlite"), reader_pool_size=0)
+    try:
+        queries = [
+            "SELECT checkpoint FROM checkpoints WHERE thread_id = 't' AND checkpoint_ns = '' ORDER BY checkpoint_id DESC LIMIT 1",
+            "DELETE FROM writes WHERE thread_id = 't'",
+            "DELETE FROM checkpoints WHERE thread_id = 't'",
+            "SELECT value FROM writes WHERE thread_id = 't' AND checkpoint_ns = '' AND channel = 'messages'",
+        ]
+        for query in queries:
+            async with saver.conn.execute(f"EXPLAIN QUERY PLAN {query}") as cur:
+                plan = " ".join(row[-1] for row in await cur.fetchall())
+            assert "USING" in plan and "INDEX" in plan, plan
+    finally:
+        await saver.aclose()
@@ -0,0 +1,103 @@
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.faq_matcher import FaqMatcher, parse_faq
+
+KB = """## Frequently Asked Questions
+
+### Q: What is Nviv AI?
+A: Nviv AI is a personal AI assistant.
+
+### Q: How do I get started?
+A: Just ask me anything.
+You can also ask for images.
+
+### Q: What are your pricing plans?
+A: Free during beta.
+
+## Version
+A: beta-0.1
+"""
+
+def test_parse_faq():
+    """Only `### Q:` / `A:` pairs are parsed, with multi-line answers."""
+    assert parse_faq(KB) == [
+        ("What is Nviv AI?", "Nviv AI is a personal AI assistant."),
+        ("How do I get started?", "Just ask me anything.\nYou can also ask for images."),
+        ("What are your pricing plans?", "Free during beta."),
+    ]
+
+def test_exact_and_near_matches():
+    """Exact and reworded questions match; questions with other specifics do not."""
+    matcher = FaqMatcher.from_knowledge_base(KB, threshold=0.8)
+    assert matcher.match("how do i get started") == "Just ask me anything.\nYou can also ask for images."
+    assert matcher.match("What's Nviv AI?") == "Nviv AI is a personal AI assistant."
+    assert matcher.match("What are your pricing plans?\n\n[Instruction: Keep your response under 1500 characters.]") == "Free during beta."
+    assert matcher.match("What is the capital of France?") is None
+    assert matcher.match("Draw a cat") is None
+    assert matcher.stats == {"hits": 3, "misses": 2}
+    assert matcher.hit_rate == 0.6
+
+def test_inverted_index_only_holds_question_tokens():
+    """Postings are built for question tokens only."""
+    matcher = FaqMatcher(parse_faq(KB))
+    assert "pricing" in matcher._index
+    assert "beta" not in matcher._index
+    assert matcher.score("unrelated words") == (None, 0.0)
+
+@pytest.mark.asyncio
+async def test_agent_answers_faq_without_model(tmp_path):
+    """Opening FAQ questions skip the model and the exchange is kept in the thread history."""
+    from agent import ChatbotAgent
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = FaqMatcher.from_knowledge_base(KB)
+        # Keep the usage ledger and databases out of backend/data
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        model = MagicMock()
+        model.ainvoke = AsyncMock(return_value=AIMessage(content="model answer"))
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        try:
+            assert await agent.chat("What are your pricing plans?", "t1") == "Free during beta."
+            model.ainvoke.assert_not_awaited()
+            assert agent.faq_matcher.stats["hits"] == 1
+
+            await agent.chat("And after beta?", "t1")
+            # The model sees the fast-path exchange as part of the conversation
+            seen = [m.content for m in model.ainvoke.await_args.args[0][1:]]
+            assert seen == ["What are your pricing plans?", "Free during beta.", "And after beta?"]
+        finally:
+            await agent.cleanup()
+
+@pytest.mark.asyncio
+async def test_agent_skips_faq_with_prior_turns(tmp_path):
+    """An FAQ-like question in an ongoing conversation goes to the model, which sees the context."""
+    from agent import ChatbotAgent
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = FaqMatcher.from_knowledge_base(KB)
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        model = MagicMock()
+        model.ainvoke = AsyncMock(return_value=AIMessage(content="model answer"))
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        try:
+            await agent.chat("I run a team of 20 people", "t1")
+            assert await agent.chat("What are your pricing plans?", "t1") == "model answer"
+            assert model.ainvoke.await_count == 2
+            assert agent.faq_matcher.stats["hits"] == 0
+        finally:
+            await agent.cleanup()
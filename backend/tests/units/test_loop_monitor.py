@@ -0,0 +1,50 @@
+import pytest
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.loop_monitor import LoopLagMonitor
+from utils.metrics import REGISTRY
+
+def blocking_call():
+    time.sleep(0.4)
+
+@pytest.mark.asyncio
+async def test_captures_blocking_stack():
+    """A blocking call on the loop is caught with its stack and its full duration."""
+    monitor = LoopLagMonitor(interval=0.02, threshold=0.1, window=100)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+        blocking_call()
+        await asyncio.sleep(0.1)
+    finally:
+        await monitor.stop()
+
+    stalls = monitor.recent_stalls()
+    assert len(stalls) == 1
+    assert "blocking_call" in stalls[0]["stack"]
+    assert stalls[0]["blocked_seconds"] >= 0.3
+    assert monitor.percentiles()[0.99] >= 0.3
+
+@pytest.mark.asyncio
+async def test_idle_loop_has_no_stalls():
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.2)
+    monitor.start()
+    monitor.start()
+    await asyncio.sleep(0.15)
+    await monitor.stop()
+    assert monitor.recent_stalls() == []
+    assert monitor.percentiles()[0.5] < 0.2
+
+def test_lag_metrics_exported(client, mock_chatbot):
+    # The mocked agent would otherwise return a coroutine from component_stats
+    with patch.object(mock_chatbot.agent, "component_stats", MagicMock(return_value={})):
+        body = client.get("/metrics").text
+    assert "# TYPE event_loop_lag_seconds histogram" in body
+    assert "# TYPE event_loop_lag_quantile_seconds gauge" in body
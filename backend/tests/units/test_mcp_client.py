@@ -165,3 +165,42 @@ async def test_tool_execution_error():
         
         assert "Error:" in result
         assert "Failure reason" in result
+
+@pytest.mark.asyncio
+async def test_get_tools_uses_result_cache():
+    """Test that repeated cacheable tool calls are served from the tool cache."""
+    session_instance = AsyncMock(spec=ClientSession)
+    mock_tool = Tool(name="generate_image", description="Draws", inputSchema={"type": "object", "properties": {"prompt": {"type": "string"}}})
+    session_instance.list_tools.return_value.tools = [mock_tool]
+    session_instance.call_tool.return_value = CallToolResult(content=[TextContent(type="text", text="![Generated Image](/a.jpg)")])
+
+    client = MCPClient("python", ["server.py"])
+    client.session = session_instance
+
+    tools = await client.get_tools()
+    first = await tools[0].ainvoke({"prompt": "a cat"})
+    second = await tools[0].ainvoke({"prompt": "a cat"})
+
+    assert first == second
+    session_instance.call_tool.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_send_tool_keys_idempotency_on_tool_call_id():
+    """Retries of one send tool call collapse; a new tool call with the same arguments is sent."""
+    session_instance = AsyncMock(spec=ClientSession)
+    schema = {"type": "object", "properties": {"to_number": {"type": "string"}, "message_body": {"type": "string"}}}
+    session_instance.list_tools.return_value.tools = [Tool(name="send_twilio_sms", description="Sends", inputSchema=schema)]
+    session_instance.call_tool.return_value = CallToolResult(content=[TextContent(type="text", text="Twilio SMS sent successfully.")])
+
+    client = MCPClient("python", ["server.py"])
+    client.session = session_instance
+
+    tool = (await client.get_tools())[0]
+    assert "tool_call_id" not in tool.tool_call_schema.model_json_schema()["properties"]
+
+    args = {"to_number": "+1", "message_body": "hi"}
+    for call_id in ("call_1", "call_1", "call_2"):
+        await tool.ainvoke({"args": args, "name": "send_twilio_sms", "type": "tool_call", "id": call_id})
+
+    assert session_instance.call_tool.await_count == 2
+    session_instance.call_tool.assert_awaited_with("send_twilio_sms", arguments=args)
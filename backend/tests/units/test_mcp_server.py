@@ -23,10 +23,10 @@ def test_mcp_server_initialization():
             
         import utils.mcp_server
         
-        from config import APP_NAME
+        from config import APP_NAME, LOG_LEVEL
         # Verify initialization
         # It should be called once upon import
-        MockFastMCP.assert_called_once_with(f"{APP_NAME} Communication Server")
+        MockFastMCP.assert_called_once_with(f"{APP_NAME} Communication Server", log_level=LOG_LEVEL.upper())
         
         # Verify tool registration
         assert mock_mcp_instance.add_tool.call_count >= 3
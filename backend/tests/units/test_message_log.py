@@ -0,0 +1,125 @@
+import pytest
+import pytest_asyncio
+import operator
+from typing import Annotated, Sequence, TypedDict
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, StateGraph
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.message_log import create_message_log_checkpointer
+from utils.checkpoint_cache import WriteBehindCheckpointer
+
+def _config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+def _checkpoint(messages):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    return checkpoint
+
+async def _count(saver, table, thread_id="t1"):
+    async with saver.conn.execute(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,)) as cur:
+        return (await cur.fetchone())[0]
+
+@pytest_asyncio.fixture
+async def saver(tmp_path):
+    saver = await create_message_log_checkpointer(str(tmp_path / "chat_messages.sqlite"), snapshot_every=4)
+    yield saver
+    await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_only_new_messages_are_appended(saver):
+    """Each checkpoint appends its message delta and replaces the thread head."""
+    messages, parent = [], None
+    for turn in range(3):
+        messages = messages + [HumanMessage(content=f"q{turn}"), AIMessage(content=f"a{turn}")]
+        parent = await saver.aput(_config("t1", parent and parent["configurable"]["checkpoint_id"]), _checkpoint(messages), {"step": turn}, {})
+
+    assert await _count(saver, "message_log") == 6
+    assert await _count(saver, "thread_heads") == 1
+    latest = await saver.aget_tuple(_config("t1"))
+    assert latest.checkpoint["channel_values"]["messages"] == messages
+    assert latest.config == parent
+    assert latest.metadata["step"] == 2
+
+@pytest.mark.asyncio
+async def test_snapshot_bounds_replay(saver):
+    """A snapshot is taken every `snapshot_every` messages and used on rebuild."""
+    messages = [HumanMessage(content=f"m{i}") for i in range(5)]
+    await saver.aput(_config("t1"), _checkpoint(messages), {}, {})
+    async with saver.conn.execute("SELECT seq FROM message_snapshots WHERE thread_id = 't1'") as cur:
+        assert (await cur.fetchone())[0] == 5
+
+    messages = messages + [AIMessage(content="tail")]
+    await saver.aput(_config("t1"), _checkpoint(messages), {}, {})
+    assert (await saver.aget_tuple(_config("t1"))).checkpoint["channel_values"]["messages"] == messages
+
+@pytest.mark.asyncio
+async def test_rewritten_state_restarts_log(saver):
+    """A shorter message list than what was logged replaces the log."""
+    await saver.aput(_config("t1"), _checkpoint([HumanMessage(content="a"), HumanMessage(content="b")]), {}, {})
+    await saver.aput(_config("t1"), _checkpoint([HumanMessage(content="c")]), {}, {})
+
+    assert await _count(saver, "message_log") == 1
+    assert (await saver.aget_tuple(_config("t1"))).checkpoint["channel_values"]["messages"] == [HumanMessage(content="c")]
+
+@pytest.mark.asyncio
+async def test_pending_writes_follow_head(saver):
+    """Writes are returned for the head and dropped once a newer checkpoint lands."""
+    first = await saver.aput(_config("t1"), _checkpoint([]), {}, {})
+    await saver.aput_writes(first, [("messages", [AIMessage(content="hi")])], task_id="task-1")
+    assert (await saver.aget_tuple(_config("t1"))).pending_writes == [("task-1", "messages", [AIMessage(content="hi")])]
+
+    await saver.aput(_config("t1", first["configurable"]["checkpoint_id"]), _checkpoint([AIMessage(content="hi")]), {}, {})
+    assert (await saver.aget_tuple(_config("t1"))).pending_writes == []
+    # Older checkpoints are not retained
+    assert await saver.aget_tuple(first) is None
+
+@pytest.mark.asyncio
+async def test_delete_thread(saver):
+    """Deleting a thread removes its log, snapshot, head and writes only."""
+    await saver.aput(_config("t1"), _checkpoint([HumanMessage(content=f"m{i}") for i in range(5)]), {}, {})
+    await saver.aput(_config("t2"), _checkpoint([HumanMessage(content="keep")]), {}, {})
+    await saver.adelete_thread("t1")
+
+    assert await saver.aget_tuple(_config("t1")) is None
+    for table in ("message_log", "message_snapshots", "thread_heads"):
+        assert await _count(saver, table) == 0
+    assert await saver.aget_tuple(_config("t2")) is not None
+    assert len([item async for item in saver.alist(None)]) == 1
+
+class _State(TypedDict):
+    messages: Annotated[Sequence[BaseMessage], operator.add]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_graph_state_round_trip(saver, write_behind):
+    """A compiled graph keeps conversation state across turns on the message log."""
+    async def reply(state):
+        return {"messages": [AIMessage(content=f"echo {len(state['messages'])}")]}
+
+    workflow = StateGraph(_State)
+    workflow.add_node("agent", reply)
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", END)
+    memory = WriteBehindCheckpointer(saver) if write_behind else saver
+    app = workflow.compile(checkpointer=memory)
+
+    config = {"configurable": {"thread_id": "t1"}}
+    await app.ainvoke({"messages": [HumanMessage(content="one")]}, config=config)
+    final = await app.ainvoke({"messages": [HumanMessage(content="two")]}, config=config)
+    assert [m.content for m in final["messages"]] == ["one", "echo 1", "two", "echo 3"]
+    if write_behind:
+        await memory.flush()
+
+    assert await _count(saver, "message_log") == 4
+    persisted = await saver.aget_tuple(_config("t1"))
+    assert persisted.checkpoint["channel_values"]["messages"] == final["messages"]
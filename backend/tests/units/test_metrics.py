@@ -0,0 +1,81 @@
+import pytest
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.metrics import MetricsRegistry, REGISTRY, stats_samples
+
+def test_counter_sums_thread_shards():
+    """Each thread records into its own shard; the scrape adds them up."""
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs_total", "Jobs", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc(2, kind="b")
+
+    assert counter.values() == {("a",): 4000, ("b",): 2}
+    text = registry.render()
+    assert '# TYPE jobs_total counter' in text
+    assert 'jobs_total{kind="a"} 4000' in text
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+def test_histogram_render():
+    """Buckets are cumulative, with +Inf, _sum and _count series."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, route="fast")
+    histogram.observe(0.5, route="fast")
+    histogram.observe(5, route="fast")
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{route="fast",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="fast",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="fast",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="fast"} 5.55' in lines
+    assert 'latency_seconds_count{route="fast"} 3' in lines
+
+def test_timer_marks_errors():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("call_seconds", "Calls", ("status",))
+    with histogram.time(status="ok"):
+        pass
+    with pytest.raises(RuntimeError):
+        with histogram.time(status="ok"):
+            raise RuntimeError("boom")
+    assert {key: entry[-1] for key, entry in histogram.snapshot().items()} == {("ok",): 1, ("error",): 1}
+
+def test_stats_samples_and_collectors():
+    """Component stats dicts flatten into gauges; non-numeric values are skipped."""
+    samples = stats_samples("chatbot_pool", {"state": "open", "calls": 3, "latency": {"p95": 0.2, "p50": None}}, ("backend",), ("east",))
+    assert samples == {"chatbot_pool_calls": {("east",): 3.0}, "chatbot_pool_latency_p95": {("east",): 0.2}}
+
+    registry = MetricsRegistry()
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Depth", {("web",): 2}, ("channel",))])
+    assert 'queue_depth{channel="web"} 2' in registry.render()
+
+def test_metrics_endpoint(client, mock_chatbot):
+    """/metrics serves the registry, including the agent's component stats."""
+    stats = MagicMock(return_value={"admission": {"active": 1, "waiting": 3}, "faq": {"hits": 5, "misses": 1}})
+    with patch.object(mock_chatbot.agent, "component_stats", stats):
+        client.get("/health")
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "chatbot_admission_waiting 3" in body
+    assert "chatbot_faq_hits 5" in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in body
+    assert "# TYPE llm_call_duration_seconds histogram" in body
@@ -0,0 +1,131 @@
+import pytest
+import asyncio
+import json
+import httpx
+import openai
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.admission import ServiceBusyError
+from utils.model_pool import BackendHealth, ModelPool, PoolBackend, parse_pool_spec
+from utils.model_registry import ModelRegistry
+
+def _server_error():
+    response = httpx.Response(503, request=httpx.Request("POST", "https://example.test"))
+    return openai.InternalServerError("Service Unavailable", response=response, body=None)
+
+def _backend(name, answer=None, error=None, delay=0.0, weight=1.0, **health_kwargs):
+    async def ainvoke(*args, **kwargs):
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return answer
+
+    model = MagicMock()
+    model.ainvoke = AsyncMock(side_effect=ainvoke)
+    return PoolBackend(model, BackendHealth(name, **health_kwargs), weight)
+
+def test_parse_pool_spec(monkeypatch):
+    monkeypatch.setenv("WESTEU_KEY", "secret")
+    spec = json.dumps([
+        {"provider": "azure", "deployment": "gpt-4o-eastus", "weight": 2},
+        {"provider": "Azure", "deployment": "gpt-4o-westeu", "endpoint": "https://westeu.test/", "api_key_env": "WESTEU_KEY"},
+    ])
+    east, west = parse_pool_spec(spec)
+    assert east["name"] == "azure:gpt-4o-eastus" and east["weight"] == 2.0
+    assert west["provider"] == "azure" and west["api_key"] == "secret" and west["endpoint"] == "https://westeu.test/"
+
+    with pytest.raises(ValueError):
+        parse_pool_spec("")
+    with pytest.raises(ValueError, match="Duplicate"):
+        parse_pool_spec(json.dumps([{"provider": "openai"}, {"provider": "openai"}]))
+
+@pytest.mark.asyncio
+async def test_fails_over_and_opens_circuit():
+    """Backend failures move the call to the next backend and eventually open the circuit."""
+    broken = _backend("broken", error=_server_error(), weight=100, failure_threshold=2, cooldown=60)
+    healthy = _backend("healthy", answer="ok")
+    pool = ModelPool([broken, healthy], strategy="weighted")
+
+    for _ in range(3):
+        assert await pool.ainvoke("hi") == "ok"
+    assert broken.health.state == "open"
+    # Once open, the broken backend is no longer tried
+    assert broken.model.ainvoke.await_count == 2
+    assert pool.stats["failovers"] == 2
+
+@pytest.mark.asyncio
+async def test_request_errors_do_not_fail_over():
+    """A bad request is the caller's problem; it is not retried elsewhere or counted against the backend."""
+    bad = _backend("a", error=ValueError("bad request"))
+    other = _backend("b", answer="ok")
+    pool = ModelPool([bad, other], strategy="least_latency")
+    with pytest.raises(ValueError):
+        await pool.ainvoke("hi")
+    assert other.model.ainvoke.await_count == 0
+    assert bad.health.consecutive_failures == 0
+
+@pytest.mark.asyncio
+async def test_all_circuits_open_is_busy():
+    backend = _backend("only", error=_server_error(), failure_threshold=1, cooldown=60)
+    pool = ModelPool([backend])
+    with pytest.raises(openai.InternalServerError):
+        await pool.ainvoke("hi")
+    with pytest.raises(ServiceBusyError):
+        await pool.ainvoke("hi")
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_circuit():
+    backend = _backend("flaky", answer="ok", failure_threshold=1, cooldown=60)
+    backend.health.record_failure()
+    assert not backend.health.available()
+    backend.health.open_until = 0
+    assert backend.health.state == "half_open"
+
+    assert await ModelPool([backend]).ainvoke("hi") == "ok"
+    assert backend.health.state == "closed"
+
+@pytest.mark.asyncio
+async def test_least_latency_prefers_fast_backend():
+    slow, fast = _backend("slow", answer="slow"), _backend("fast", answer="fast")
+    slow.health.record_success(2.0)
+    fast.health.record_success(0.1)
+    pool = ModelPool([slow, fast], strategy="least_latency")
+    assert await pool.ainvoke("hi") == "fast"
+
+@pytest.mark.asyncio
+async def test_hedges_slow_backend():
+    """A backend slower than its p95 gets a second backend fired; the first answer wins."""
+    slow = _backend("slow", answer="slow", delay=1.0, weight=100, min_samples=5)
+    fast = _backend("fast", answer="fast")
+    for _ in range(5):
+        slow.health.record_success(0.01)
+    pool = ModelPool([slow, fast], strategy="weighted", hedging=True)
+
+    assert await pool.ainvoke("hi") == "fast"
+    assert pool.stats == {"failovers": 0, "hedges": 1, "hedge_wins": 1}
+    # The abandoned call does not count as a failure
+    await asyncio.sleep(0)
+    assert slow.health.counters["failures"] == 0 and slow.health.inflight == 0
+
+def test_registry_builds_pool(monkeypatch):
+    """CHAT_MODEL_PROVIDER=pool builds one model per backend with its overrides and shared health."""
+    created = []
+    creator = MagicMock(side_effect=lambda **kwargs: created.append(MagicMock()) or created[-1])
+    monkeypatch.setitem(ModelRegistry._registry, "pooltest", creator)
+    spec = json.dumps([{"provider": "pooltest", "deployment": "east"}, {"provider": "pooltest", "deployment": "west", "endpoint": "https://west.test/"}])
+    with patch("utils.model_registry.MODEL_POOL", spec):
+        pool = ModelRegistry.get_model("pool", tools=["tool"])
+        again = ModelRegistry.get_model("pool")
+
+    assert isinstance(pool, ModelPool)
+    creator.assert_any_call(deployment="east")
+    creator.assert_any_call(deployment="west", endpoint="https://west.test/")
+    created[0].bind_tools.assert_called_with(["tool"])
+    assert pool.backends[0].model is created[0].bind_tools.return_value
+    assert pool.backends[0].health is again.backends[0].health
+    assert "pooltest:east" in ModelRegistry.pool_stats()
@@ -51,7 +51,7 @@ def test_azure_provider_creation():
             "AZURE_OPENAI_DEPLOYMENT_NAME": "test-deploy",
             "AZURE_OPENAI_API_VERSION": "2024-02-15-preview"
         }
-        with patch.dict(os.environ, envs):
+        with patch.dict(os.environ, envs), patch("utils.adaptive_concurrency.MODEL_ADAPTIVE_CONCURRENCY", False):
             create_azure_model()
             mock_azure.assert_called_with(
                 azure_deployment="test-deploy",
@@ -62,10 +62,21 @@ def test_openai_provider_creation():
     """Test OpenAI provider creation logic."""
     from utils.chat_providers.openai_provider import create_openai_model
     with patch("utils.chat_providers.openai_provider.ChatOpenAI") as mock_openai:
-        with patch.dict(os.environ, {"OPENAI_MODEL": "gpt-4"}):
+        with patch.dict(os.environ, {"OPENAI_MODEL": "gpt-4"}), patch("utils.adaptive_concurrency.MODEL_ADAPTIVE_CONCURRENCY", False):
             create_openai_model()
             mock_openai.assert_called_with(model="gpt-4")
 
+def test_provider_client_retries():
+    """SDK retries are off while the adaptive layer retries; an explicit setting wins."""
+    from utils.chat_providers.openai_provider import create_openai_model
+    with patch("utils.chat_providers.openai_provider.ChatOpenAI") as mock_openai:
+        with patch.dict(os.environ, {"OPENAI_MODEL": "gpt-4"}), patch("utils.adaptive_concurrency.MODEL_ADAPTIVE_CONCURRENCY", True):
+            create_openai_model()
+            mock_openai.assert_called_with(model="gpt-4", max_retries=0)
+            with patch("utils.adaptive_concurrency.MODEL_CLIENT_MAX_RETRIES", "3"):
+                create_openai_model()
+                mock_openai.assert_called_with(model="gpt-4", max_retries=3)
+
 def test_register_builtin_providers():
     """Test that builtin providers are registered correctly."""
     from utils.chat_providers import register_builtin_providers
@@ -115,3 +126,14 @@ def test_audio_factory():
     with patch("utils.model_registry.AudioRegistry.get_provider") as mock_get:
         AudioFactory.get_provider("test")
         mock_get.assert_called_with("test")
+
+@patch("utils.model_registry.ModelRegistry._registry", new_callable=dict)
+def test_model_factory_deployment_override(mock_registry):
+    """A deployment override is passed to the creator; without one it is called as before."""
+    mock_creator = MagicMock(return_value="model")
+    mock_registry["provider"] = mock_creator
+
+    ModelFactory.get_model("provider", deployment="gpt-4o-mini")
+    mock_creator.assert_called_with(deployment="gpt-4o-mini")
+    ModelFactory.get_model("provider")
+    mock_creator.assert_called_with()
@@ -0,0 +1,75 @@
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.model_router import ModelRouter, ROUTE_FAST, ROUTE_PRIMARY, tool_vocabulary
+
+def _tool(name):
+    tool = MagicMock()
+    tool.name = name
+    return tool
+
+TOOLS = [_tool("generate_image"), _tool("send_whatsapp_message")]
+
+def test_tool_vocabulary():
+    assert tool_vocabulary(TOOLS) == {"generate", "image", "send", "whatsapp", "message"}
+
+@pytest.mark.parametrize("messages,expected", [
+    ([HumanMessage(content="hi!")], (ROUTE_FAST, "simple")),
+    ([HumanMessage(content="thanks a lot [Instruction: Keep your response under 1500 characters.]")], (ROUTE_FAST, "simple")),
+    ([HumanMessage(content="can you make an image of a cat")], (ROUTE_PRIMARY, "keywords")),
+    ([HumanMessage(content="why is the sky blue")], (ROUTE_PRIMARY, "keywords")),
+    ([HumanMessage(content=" ".join(["word"] * 20))], (ROUTE_PRIMARY, "long")),
+    ([HumanMessage(content="hi"), AIMessage(content="Shall I go ahead?"), HumanMessage(content="yes")], (ROUTE_PRIMARY, "follow_up")),
+    ([HumanMessage(content="hi"), AIMessage(content="Hello!"), HumanMessage(content="cool")], (ROUTE_FAST, "simple")),
+    ([HumanMessage(content="hi"), ToolMessage(content="done", tool_call_id="1")], (ROUTE_PRIMARY, "not_user_turn")),
+])
+def test_classify(messages, expected):
+    assert ModelRouter(TOOLS).classify(messages) == expected
+
+def test_record_metrics():
+    router = ModelRouter()
+    router.route([HumanMessage(content="hello")])
+    router.record(ROUTE_FAST, 0.2, AIMessage(content="Hi!", usage_metadata={"input_tokens": 30, "output_tokens": 3, "total_tokens": 33}))
+    router.record(ROUTE_FAST, 0.4, AIMessage(content="Hi!"))
+
+    stats = router.stats
+    assert stats["routes"][ROUTE_FAST] == {"calls": 2, "input_tokens": 30, "output_tokens": 3, "latency_p50": 0.2, "latency_p95": 0.2}
+    assert stats["routes"][ROUTE_PRIMARY]["calls"] == 0
+    assert stats["reasons"] == {"fast:simple": 1}
+
+@pytest.mark.asyncio
+async def test_agent_routes_simple_turns_to_fast_model(tmp_path):
+    """Small talk is answered by the fast model; tool-ish requests go to the tool-bound primary."""
+    from agent import ChatbotAgent
+    primary, fast = MagicMock(), MagicMock()
+    primary.ainvoke = AsyncMock(return_value=AIMessage(content="Here is your image."))
+    fast.ainvoke = AsyncMock(return_value=AIMessage(content="Hello!"))
+
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False), patch("agent.FAST_MODEL_DEPLOYMENT", "gpt-4o-mini"):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        agent.response_cache = None
+        # Keep the usage ledger and databases out of backend/data
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        with patch("agent.ModelFactory.get_model", side_effect=lambda provider, tools=None, deployment=None: fast if deployment else primary) as get_model:
+            await agent.initialize()
+        get_model.assert_any_call("openai", deployment="gpt-4o-mini")
+        try:
+            assert await agent.chat("hi", "t1") == "Hello!"
+            assert await agent.chat("please draw a picture of a cat", "t1") == "Here is your image."
+            assert fast.ainvoke.await_count == 1 and primary.ainvoke.await_count == 1
+
+            state = await agent.app.aget_state({"configurable": {"thread_id": "t1"}})
+            assert [m.content for m in state.values["messages"]] == ["hi", "Hello!", "please draw a picture of a cat", "Here is your image."]
+            assert agent.router.stats["routes"][ROUTE_FAST]["calls"] == 1
+        finally:
+            await agent.cleanup()
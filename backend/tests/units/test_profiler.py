@@ -0,0 +1,120 @@
+import pytest
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from unittest.mock import patch
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.profiler import Cooldown, CpuProfiler, MemoryProfiler, ProfilerRateLimited
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+def test_cpu_profile_collapsed_stacks():
+    """Stacks come out root first, with the thread name and a sample count."""
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy worker")
+    worker.start()
+    profiler = CpuProfiler(max_seconds=5)
+    try:
+        assert profiler.start(0.2, interval=0.005)
+        assert not profiler.start(0.2)
+        time.sleep(0.1)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profiler.samples > 0
+    lines = profiler.collapsed().splitlines()
+    busy = [line for line in lines if "test_profiler.py:busy_worker" in line]
+    assert busy and busy[0].startswith("busy_worker;")
+    assert int(busy[0].rsplit(" ", 1)[1]) > 0
+
+def test_memory_snapshot_diff():
+    profiler = MemoryProfiler(max_snapshots=2)
+    try:
+        first = profiler.snapshot()
+        hoard = [bytearray(1024) for _ in range(2000)]
+        second = profiler.snapshot(match="test_profiler.py")
+        assert second["top"][0]["location"].endswith("test_profiler.py:" + str(test_memory_snapshot_diff.__code__.co_firstlineno + 4))
+
+        diff = profiler.diff(match="test_profiler.py")
+        assert (diff["from_id"], diff["to_id"]) == (first["id"], second["id"])
+        assert diff["top"][0]["size_diff_bytes"] >= 2000 * 1024
+
+        profiler.snapshot()
+        assert profiler.snapshot_ids() == [2, 3]
+        with pytest.raises(KeyError):
+            profiler.diff(from_id=1)
+        del hoard
+    finally:
+        profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+def test_memory_tracing_stops_after_time_limit():
+    profiler = MemoryProfiler(max_seconds=0.2)
+    try:
+        first = profiler.snapshot()
+        assert 0 < first["tracing_seconds_left"] <= 0.2
+        profiler.snapshot()
+        deadline = time.monotonic() + 5
+        while tracemalloc.is_tracing() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not tracemalloc.is_tracing()
+        # Snapshots from the expired window can still be diffed
+        assert profiler.diff()["from_id"] == first["id"]
+
+        # A new snapshot starts a fresh window without the old snapshots
+        assert profiler.snapshot()["id"] == 3
+        assert profiler.snapshot_ids() == [3]
+        assert tracemalloc.is_tracing()
+    finally:
+        profiler.stop()
+    assert not tracemalloc.is_tracing()
+
+def test_cooldown():
+    cooldown = Cooldown(interval=60)
+    cooldown.acquire("cpu")
+    cooldown.acquire("memory")
+    with pytest.raises(ProfilerRateLimited) as e:
+        cooldown.acquire("cpu")
+    assert 0 < e.value.retry_after <= 60
+
+def test_profiling_endpoints_require_token(client):
+    with patch("routes.system_routes.ADMIN_API_TOKEN", ""):
+        assert client.post("/admin/profile/cpu").status_code == 404
+    with patch("routes.system_routes.ADMIN_API_TOKEN", "secret"):
+        assert client.post("/admin/profile/cpu").status_code == 403
+        assert client.post("/admin/profile/cpu", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+def test_profiling_endpoints(client):
+    headers = {"X-Admin-Token": "secret"}
+    with patch("routes.system_routes.ADMIN_API_TOKEN", "secret"), \
+         patch("routes.system_routes.profiling_cooldown", Cooldown(interval=60)), \
+         patch("routes.system_routes.cpu_profiler", CpuProfiler()), \
+         patch("routes.system_routes.memory_profiler", MemoryProfiler()):
+        assert client.get("/admin/profile/cpu", headers=headers).status_code == 404
+        assert client.post("/admin/profile/cpu?seconds=5&interval_ms=5", headers=headers).json()["status"] == "running"
+        assert client.get("/admin/profile/cpu", headers=headers).status_code == 409
+        time.sleep(0.05)
+        assert client.post("/admin/profile/cpu/stop", headers=headers).status_code == 200
+        profile = client.get("/admin/profile/cpu", headers=headers)
+        assert profile.status_code == 200
+        assert "cpu-profile.folded" in profile.headers["content-disposition"]
+
+        # Rate limited: a second profile within the cooldown
+        limited = client.post("/admin/profile/cpu", headers=headers)
+        assert limited.status_code == 429
+        assert "Retry-After" in limited.headers
+
+        snapshot = client.post("/admin/profile/memory/snapshot", headers=headers).json()
+        assert snapshot["id"] == 1 and snapshot["traced_bytes"] > 0
+        assert client.post("/admin/profile/memory/snapshot", headers=headers).status_code == 429
+        assert client.get("/admin/profile/memory/diff", headers=headers).status_code == 404
+        assert client.delete("/admin/profile/memory", headers=headers).json() == {"status": "stopped"}
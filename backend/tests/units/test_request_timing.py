@@ -0,0 +1,89 @@
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.request_timing import RequestTiming, measure, record_phase, request_timing, timed
+
+def test_server_timing_header():
+    timing = RequestTiming()
+    timing.add("llm", 0.5)
+    timing.add("llm", 0.25)
+    timing.add("checkpoint_load", 0.002)
+    header = timing.server_timing()
+    assert header.startswith('checkpoint_load;dur=2.0;desc="1 call", llm;dur=750.0;desc="2 calls", total;dur=')
+    assert timing.as_dict()["llm"] == {"count": 2, "ms": 750.0}
+
+@pytest.mark.asyncio
+async def test_nested_phases_count_once():
+    """A checkpointer delegating to another timed checkpointer is one load, not two."""
+    @timed("checkpoint_load")
+    async def backing():
+        await asyncio.sleep(0)
+
+    @timed("checkpoint_load")
+    async def cache():
+        await backing()
+
+    await cache()  # no request being timed: a no-op
+    timing = RequestTiming()
+    token = request_timing.set(timing)
+    try:
+        await cache()
+        # Concurrent tool calls each count
+        async def tool():
+            with measure("tool"):
+                await asyncio.sleep(0.01)
+        await asyncio.gather(tool(), tool())
+        record_phase("llm", 0.1)
+    finally:
+        request_timing.reset(token)
+    assert {phase: values["count"] for phase, values in timing.as_dict().items()} == {"checkpoint_load": 1, "llm": 1, "tool": 2, "total": 1}
+
+def test_chat_endpoint_server_timing(client, mock_chatbot):
+    async def chat(message, thread_id):
+        record_phase("llm", 0.2)
+        return "Timed reply"
+
+    with patch.object(mock_chatbot, "chat", AsyncMock(side_effect=chat)):
+        response = client.post("/chat", json={"message": "hello"})
+        assert response.json() == {"message": "Timed reply"}
+        assert 'llm;dur=200.0;desc="1 call"' in response.headers["Server-Timing"]
+        assert "total;dur=" in response.headers["Server-Timing"]
+
+        debug = client.post("/chat", json={"message": "hello", "debug": True}).json()
+        assert debug["timing"]["llm"] == {"count": 1, "ms": 200.0}
+
+@pytest.mark.asyncio
+async def test_agent_turn_phases(tmp_path):
+    """A real graph turn reports checkpoint reads and writes around the model call."""
+    from agent import ChatbotAgent
+    model = MagicMock()
+    model.ainvoke = AsyncMock(return_value=AIMessage(content="Hello!"))
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        agent.response_cache = None
+        agent.single_flight = None
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        timing = RequestTiming()
+        token = request_timing.set(timing)
+        try:
+            assert await agent.chat("hi", "t1") == "Hello!"
+        finally:
+            request_timing.reset(token)
+            await agent.cleanup()
+    phases = timing.as_dict()
+    assert phases["llm"]["count"] == 1
+    assert phases["checkpoint_load"]["count"] >= 1
+    assert phases["checkpoint_save"]["count"] >= 1
@@ -0,0 +1,134 @@
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.response_cache import SemanticResponseCache, split_instructions
+
+KB = """# Knowledge Base
+
+### Q: What is Nviv AI?
+A: Nviv AI is a personal AI assistant.
+
+### Q: What are your pricing plans?
+A: Free during beta.
+"""
+
+WHATSAPP = "\n\n[Instruction: Keep your response under 1500 characters.]"
+
+@pytest.fixture
+def kb_file(tmp_path):
+    path = tmp_path / "knowledge_base.md"
+    path.write_text(KB)
+    return path
+
+def test_similar_questions_hit(kb_file):
+    """Rephrasings of a cached question return the cached answer; unrelated ones miss."""
+    cache = SemanticResponseCache(str(kb_file), threshold=0.8)
+    cache.store("What is Nviv AI?", "A personal assistant.")
+
+    assert cache.lookup("what's nviv ai") == "A personal assistant."
+    assert cache.lookup("What is the weather in Paris?") is None
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    assert cache.hit_rate == 0.5
+
+def test_different_entities_never_share_an_answer(kb_file):
+    """Questions outside the knowledge base are not stored, and entity tokens must match for a hit."""
+    cache = SemanticResponseCache(str(kb_file), threshold=0.5)
+    cache.store("What's the weather like in Paris today?", "Sunny in Paris.")
+    cache.store("Tell me a story about a dragon named Smaug", "Once upon a time...")
+    assert cache.stats == {**cache.stats, "stores": 0, "not_stored": 2}
+
+    cache.store("What are your pricing plans?", "Free.")
+    assert cache.lookup("What are your pricing plans in London?") is None
+    assert cache.lookup("what are the pricing plans") == "Free."
+
+def test_channel_instructions_are_a_separate_scope(kb_file):
+    """An answer cached for WhatsApp is not served on the web and vice versa."""
+    assert split_instructions("What is Nviv AI?" + WHATSAPP) == ("What is Nviv AI?", WHATSAPP.strip())
+    cache = SemanticResponseCache(str(kb_file))
+    cache.store("What is Nviv AI?" + WHATSAPP, "Short answer.")
+
+    assert cache.lookup("What is Nviv AI?") is None
+    assert cache.lookup("what is nviv ai" + WHATSAPP) == "Short answer."
+
+def test_ttl_expiry(kb_file):
+    """Entries older than the TTL are dropped."""
+    cache = SemanticResponseCache(str(kb_file), ttl_seconds=10)
+    with patch("utils.response_cache.time.monotonic", return_value=100.0):
+        cache.store("What are your pricing plans?", "Free.")
+    with patch("utils.response_cache.time.monotonic", return_value=111.0):
+        assert cache.lookup("What are your pricing plans?") is None
+    assert cache.stats["expired"] == 1
+
+def test_knowledge_base_change_invalidates(kb_file):
+    """Editing knowledge_base.md clears the cache."""
+    cache = SemanticResponseCache(str(kb_file))
+    cache.store("What are your pricing plans?", "Free.")
+
+    kb_file.write_text(KB.replace("Free during beta.", "Paid plans start at $5."))
+    os.utime(kb_file, (1, 1))
+    assert cache.check_source(force=True) is True
+    assert cache.lookup("What are your pricing plans?") is None
+    assert cache.stats["invalidations"] == 1
+
+def test_max_entries(kb_file):
+    """The least recently used entry is evicted beyond max_entries."""
+    cache = SemanticResponseCache(str(kb_file), max_entries=1)
+    cache.store("What is Nviv AI?", "first")
+    cache.store("What are your pricing plans?", "second")
+    assert cache.lookup("What is Nviv AI?") is None
+
+@pytest.mark.asyncio
+async def test_agent_serves_cached_answer_for_new_threads(tmp_path):
+    """The second thread asking the same question skips the model and still records the exchange."""
+    from agent import ChatbotAgent
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False), patch("agent.RESPONSE_CACHE_ENABLED", True):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        # Keep the usage ledger and databases out of backend/data
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        model = MagicMock()
+        model.ainvoke = AsyncMock(return_value=AIMessage(content="Nviv AI is an assistant."))
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        try:
+            assert await agent.chat("What is Nviv AI?", "t1") == "Nviv AI is an assistant."
+            assert await agent.chat("what is nviv ai", "t2") == "Nviv AI is an assistant."
+            assert model.ainvoke.await_count == 1
+
+            state = await agent.app.aget_state({"configurable": {"thread_id": "t2"}})
+            assert [m.content for m in state.values["messages"]] == ["what is nviv ai", "Nviv AI is an assistant."]
+
+            # Threads with prior context always go through the model
+            await agent.chat("What is Nviv AI?", "t2")
+            assert model.ainvoke.await_count == 2
+            # ...and are not counted as hits or misses
+            assert agent.response_cache.stats["hits"] == 1
+            assert agent.response_cache.stats["misses"] == 1
+        finally:
+            await agent.cleanup()
+
+def test_agent_reloads_knowledge_base_without_response_cache(kb_file):
+    """Edits to knowledge_base.md reach the prompt and FAQ index even with the response cache off."""
+    from agent import ChatbotAgent
+    with patch("agent.KNOWLEDGE_BASE_PATH", str(kb_file)), patch("agent.RESPONSE_CACHE_ENABLED", False), \
+         patch("agent.FAQ_FAST_PATH_ENABLED", True):
+        agent = ChatbotAgent()
+        assert agent.response_cache is None
+        assert "Free during beta" in agent.system_message
+
+        kb_file.write_text(KB.replace("Free during beta.", "Ten dollars a month."))
+        os.utime(kb_file, (0, os.path.getmtime(kb_file) + 10))
+        agent._kb_checked = float("-inf")
+        agent._refresh_knowledge_base()
+
+        assert "Ten dollars a month" in agent.system_message
+        assert agent.faq_matcher.match("What are your pricing plans?") == "Ten dollars a month."
@@ -191,3 +191,22 @@ def test_meta_send_message(client):
         with patch('requests.post') as mock_post:
             send_meta_whatsapp_message("to", "text")
             mock_post.assert_called_once()
+
+def test_meta_busy_reply(client):
+    """Verify a shed model call sends the busy message"""
+    from routes.meta_routes import process_meta_whatsapp_background
+    from utils.admission import BUSY_MESSAGE, ServiceBusyError
+
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [{"changes": [{"value": {"messages": [{"type": "text", "text": {"body": "hello"}, "from": "123"}]}}]}]
+    }
+
+    with patch('app_state.chatbot') as mock_bot:
+        mock_bot.chat = AsyncMock(side_effect=ServiceBusyError("busy"))
+
+        with patch('routes.meta_routes.send_meta_whatsapp_message') as mock_send_msg:
+            import asyncio
+            asyncio.run(process_meta_whatsapp_background(payload, "http://host"))
+
+            mock_send_msg.assert_called_once_with("123", BUSY_MESSAGE)
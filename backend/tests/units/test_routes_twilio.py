@@ -135,3 +135,15 @@ def test_twilio_send_reply_exception(client):
                 send_twilio_reply("to", "msg")
                 mock_logger.error.assert_called()
                 assert "Twilio Down" in str(mock_logger.error.call_args)
+
+@pytest.mark.asyncio
+async def test_twilio_busy_reply(client):
+    """Verify a shed model call sends the busy message instead of the generic error."""
+    from routes.twilio_routes import process_twilio_whatsapp_background
+    from utils.admission import BUSY_MESSAGE, ServiceBusyError
+
+    with patch('app_state.chatbot') as mock_bot:
+        mock_bot.chat = AsyncMock(side_effect=ServiceBusyError("busy"))
+        with patch('routes.twilio_routes.send_twilio_reply') as mock_send:
+            await process_twilio_whatsapp_background("Hi", "whatsapp:+1", None, None, "http://host")
+            mock_send.assert_called_once_with("whatsapp:+1", BUSY_MESSAGE)
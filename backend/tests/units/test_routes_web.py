@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 def test_web_chat_endpoint(client, mock_chatbot):
     """Verify the /chat endpoint returns a valid AI response"""
@@ -71,3 +71,11 @@ def test_chat_endpoint_with_reset(mock_chatbot, client):
     mock_chatbot.chat.assert_any_call("hello", thread_id="test_123")
 
 
+
+def test_chat_endpoint_busy(mock_chatbot, client):
+    """Verify shed model calls become a 503 with Retry-After."""
+    from utils.admission import ServiceBusyError
+    with patch.object(mock_chatbot, "chat", AsyncMock(side_effect=ServiceBusyError("busy", retry_after=7))):
+        response = client.post("/chat", json={"message": "hello"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
@@ -0,0 +1,95 @@
+import pytest
+import sqlite3
+from langgraph.checkpoint.base import empty_checkpoint
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.sharded_checkpointer import ShardedCheckpointer, create_sharded_checkpointer, reshard, shard_for, shard_paths
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+THREADS = [f"whatsapp:+1555000{i:04d}" for i in range(40)]
+
+def test_shard_for_is_stable_and_spread():
+    """The same thread always maps to the same shard and threads spread across shards."""
+    assert shard_for("whatsapp:+15550001", 4) == shard_for("whatsapp:+15550001", 4)
+    assert shard_for("anything", 1) == 0
+    assert len({shard_for(t, 4) for t in THREADS}) == 4
+
+def test_shard_paths():
+    """One shard keeps the legacy file name; more shards get numbered files."""
+    assert shard_paths("/data/chat_history.sqlite", 1) == ["/data/chat_history.sqlite"]
+    assert shard_paths("/data/chat_history.sqlite", 2) == ["/data/chat_history.shard-00.sqlite", "/data/chat_history.shard-01.sqlite"]
+
+def test_requires_a_shard():
+    with pytest.raises(ValueError):
+        ShardedCheckpointer([])
+
+@pytest.mark.asyncio
+async def test_routes_operations_to_owning_shard(tmp_path):
+    """get/put/list/delete all go to the shard chosen by thread_id."""
+    saver = await create_sharded_checkpointer(str(tmp_path / "chat_history.sqlite"), 3)
+    try:
+        for thread_id in THREADS[:6]:
+            saved = await saver.aput(_config(thread_id), empty_checkpoint(), {"step": 0}, {})
+            await saver.aput_writes(saved, [("messages", "hi")], task_id="t")
+
+        for thread_id in THREADS[:6]:
+            owner = saver.shard(thread_id)
+            assert await owner.aget_tuple(_config(thread_id)) is not None
+            for other in saver.shards:
+                if other is not owner:
+                    assert await other.aget_tuple(_config(thread_id)) is None
+            assert (await saver.aget_tuple(_config(thread_id))).pending_writes == [("t", "messages", "hi")]
+            assert len([c async for c in saver.alist(_config(thread_id))]) == 1
+
+        # Listing without a thread merges all shards, newest first, honouring the limit
+        everything = [c async for c in saver.alist(None)]
+        assert len(everything) == 6
+        ids = [c.config["configurable"]["checkpoint_id"] for c in everything]
+        assert ids == sorted(ids, reverse=True)
+        assert len([c async for c in saver.alist(None, limit=4)]) == 4
+
+        await saver.adelete_thread(THREADS[0])
+        assert await saver.aget_tuple(_config(THREADS[0])) is None
+        assert await saver.aget_tuple(_config(THREADS[1])) is not None
+    finally:
+        await saver.aclose()
+
+@pytest.mark.asyncio
+async def test_reshard_moves_every_thread(tmp_path):
+    """Offline resharding redistributes rows so the new layout routes correctly."""
+    db_path = str(tmp_path / "chat_history.sqlite")
+    saver = await create_sharded_checkpointer(db_path, 1)
+    try:
+        for thread_id in THREADS:
+            saved = await saver.aput(_config(thread_id), empty_checkpoint(), {"step": 0}, {})
+            await saver.aput_writes(saved, [("messages", thread_id)], task_id="t")
+    finally:
+        await saver.aclose()
+
+    reshard(db_path, 1, 4)
+
+    assert os.path.exists(db_path + ".pre-reshard")
+    assert not os.path.exists(db_path)
+    saver = await create_sharded_checkpointer(db_path, 4)
+    try:
+        for thread_id in THREADS:
+            state = await saver.aget_tuple(_config(thread_id))
+            assert state.pending_writes == [("t", "messages", thread_id)]
+    finally:
+        await saver.aclose()
+
+    counts = []
+    for path in shard_paths(db_path, 4):
+        with sqlite3.connect(path) as conn:
+            counts.append(conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0])
+    assert sum(counts) == len(THREADS)
+
+def test_reshard_missing_source(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        reshard(str(tmp_path / "chat_history.sqlite"), 2, 4)
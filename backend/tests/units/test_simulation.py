@@ -0,0 +1,155 @@
+import pytest
+import base64
+import openai
+from unittest.mock import patch
+from langchain_core.messages import HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.adaptive_concurrency import AdaptiveLimiter, AdaptiveModel, retry_after_seconds
+from utils.chat_providers.simulated_provider import SimulatedChatModel, create_fake_model
+from utils.model_registry import AudioFactory, ImageFactory, ModelRegistry
+from utils.simulation import LatencyProfile, seeded_random, shared_profile
+
+
+@tool
+def generate_image(prompt: str) -> str:
+    """Generate an image from a prompt."""
+    return "![image](/static/x.jpg)"
+
+
+@tool
+def get_weather(city: str) -> str:
+    """Get the weather for a city."""
+    return "sunny"
+
+
+def test_seeded_random_is_order_independent():
+    """Draws depend only on the seed and parts."""
+    first = seeded_random(1, "hello").random()
+    seeded_random(1, "other").random()
+    assert seeded_random(1, "hello").random() == first
+    assert seeded_random(2, "hello").random() != first
+
+
+@pytest.mark.asyncio
+async def test_fake_model_is_deterministic():
+    """Same conversation, same answer; different conversation, different answer."""
+    model = create_fake_model()
+    a = await model.ainvoke([HumanMessage(content="What are your hours?")])
+    b = await model.ainvoke([HumanMessage(content="What are your hours?")])
+    c = await model.ainvoke([HumanMessage(content="Do you have parking?")])
+    assert a.content == b.content
+    assert a.content != c.content
+    assert a.usage_metadata["output_tokens"] == model.output_tokens
+
+
+@pytest.mark.asyncio
+async def test_astream_yields_tokens():
+    """Streaming yields one chunk per token adding up to the full answer."""
+    model = create_fake_model()
+    messages = [HumanMessage(content="hello")]
+    chunks = [chunk async for chunk in model.astream(messages)]
+    assert len(chunks) >= model.output_tokens
+    assert "".join(c.content for c in chunks) == (await model.ainvoke(messages)).content
+
+
+@pytest.mark.asyncio
+async def test_tool_call_prefers_named_tool():
+    """With tool calls forced, the tool named in the message is called with its string args filled."""
+    model = SimulatedChatModel(profile=LatencyProfile.instant(), tool_call_rate=1.0, tokens_per_second=0)
+    bound = model.bind_tools([get_weather, generate_image])
+    result = await bound.ainvoke([HumanMessage(content="please draw an image of a cat")])
+    assert result.tool_calls[0]["name"] == "generate_image"
+    assert result.tool_calls[0]["args"] == {"prompt": "please draw an image of a cat"}
+
+    # After the tool ran, the model answers and passes the tool output through
+    answer = await bound.ainvoke([
+        HumanMessage(content="please draw an image of a cat"), result,
+        ToolMessage(content="![image](/static/x.jpg)", tool_call_id=result.tool_calls[0]["id"]),
+    ])
+    assert not answer.tool_calls
+    assert answer.content.startswith("![image](/static/x.jpg)")
+
+
+@pytest.mark.asyncio
+async def test_registry_provides_simulated_models():
+    """The registry builds both simulated providers and binds tools."""
+    with patch("utils.model_registry.MODEL_ADAPTIVE_CONCURRENCY", False):
+        model = ModelRegistry.get_model("fake", tools=[generate_image])
+        assert (await model.ainvoke([HumanMessage(content="hi")])).content
+        assert isinstance(ModelRegistry.get_model("latency-sim").profile, LatencyProfile)
+
+
+@pytest.mark.asyncio
+async def test_injected_rate_limit_is_retried():
+    """A simulated 429 carries retry-after-ms and is retried by AdaptiveModel."""
+    profile = LatencyProfile(0, sigma=0, rate_limit_rate=1.0, retry_after_ms=10)
+    with pytest.raises(openai.RateLimitError) as excinfo:
+        await profile.await_call()
+    assert retry_after_seconds(excinfo.value) == 0.01
+
+    model = SimulatedChatModel(profile=profile, tokens_per_second=0)
+    wrapped = AdaptiveModel(model, AdaptiveLimiter(initial=4), max_retries=2, backoff_max=0.05)
+
+    def _recover(*args, **kwargs):
+        profile.rate_limit_rate = 0.0
+    with patch("utils.adaptive_concurrency.asyncio.sleep", side_effect=_recover):
+        result = await wrapped.ainvoke([HumanMessage(content="hi")])
+    assert result.content
+    assert profile.stats["rate_limited"] == 2
+    assert wrapped.limiter.counters["retries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_injected_error():
+    """A simulated 500 is an openai.InternalServerError."""
+    profile = LatencyProfile(0, sigma=0, error_rate=1.0)
+    with pytest.raises(openai.InternalServerError):
+        await profile.await_call()
+    assert profile.stats == {"calls": 1, "rate_limited": 0, "errors": 1}
+
+
+def test_simulated_image_provider():
+    """Images are deterministic per prompt; injected failures surface as RuntimeError."""
+    provider = ImageFactory.get_provider("fake")
+    image = provider.generate_image("a red barn")
+    assert image.startswith("data:image/jpeg;base64,")
+    assert base64.b64decode(image.split(",", 1)[1])[:2] == b"\xff\xd8"
+    assert provider.generate_image("a red barn") == image
+    assert provider.generate_image("a blue sea") != image
+
+    failing = ImageFactory.get_provider("fake")
+    failing.profile = LatencyProfile(0, sigma=0, error_rate=1.0)
+    with pytest.raises(RuntimeError):
+        failing.generate_image("a red barn")
+
+
+def test_simulated_audio_provider():
+    """Transcripts are chosen by the audio content."""
+    provider = AudioFactory.get_provider("fake")
+    text = provider.transcribe_audio(b"OggS-audio-1")
+    assert text.endswith("?") or text.endswith(".")
+    assert provider.transcribe_audio(b"OggS-audio-1") == text
+
+
+def test_image_tool_draws_vary_across_calls():
+    """The tool rebuilds the provider per call, but latencies and failures still vary call to call."""
+    from utils.tools.media import generate_image as generate_image_tool
+    delays = []
+    with patch.dict("utils.simulation._shared_profiles", clear=True), \
+         patch.dict(os.environ, {"IMAGE_MODEL_PROVIDER": "latency-sim"}), \
+         patch("utils.simulation.time.sleep", side_effect=delays.append), \
+         patch("utils.tools.media.Image.open"):
+        results = [generate_image_tool(f"a cat {i}") for i in range(5)]
+        assert all(r.startswith("![Generated Image]") for r in results)
+        assert len(set(delays)) == 5
+
+        shared_profile("image", 0).error_rate = 0.5
+        results = [generate_image_tool("a dog") for _ in range(30)]
+    failed = sum(r.startswith("Error") for r in results)
+    assert 0 < failed < 30
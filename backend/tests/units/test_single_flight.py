@@ -0,0 +1,139 @@
+import pytest
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.single_flight import SingleFlight, normalise_message
+
+def test_normalise_message():
+    assert normalise_message("  What IS\n Nviv AI? ") == "what is nviv ai?"
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_call():
+    """Followers get the leader's result without running fn themselves."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    results = await asyncio.gather(*(flight.run("k", fn) for _ in range(3)))
+    assert calls == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert all(result == "answer" for result, _ in results)
+    assert flight.stats == {"leaders": 1, "followers": 2}
+    assert "k" not in flight
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_followers():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(flight.run("k", fn), flight.run("k", fn), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_leader_cancelled():
+    """A cancelled leader does not fail its followers; one of them reruns the call."""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fn():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    leader = asyncio.create_task(flight.run("k", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.run("k", fn))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == (2, False)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+@pytest.mark.asyncio
+async def test_agent_coalesces_identical_first_messages(tmp_path):
+    """Two new threads asking the same thing at once trigger one model call; both record the exchange."""
+    from agent import ChatbotAgent
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        agent.response_cache = None
+        # Keep the usage ledger and databases out of backend/data
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+
+        async def slow_answer(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return AIMessage(content="Hello there.")
+
+        model = MagicMock()
+        model.ainvoke = AsyncMock(side_effect=slow_answer)
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        try:
+            answers = await asyncio.gather(agent.chat("Hi!", "t1"), agent.chat("  hi! ", "t2"))
+            assert answers == ["Hello there.", "Hello there."]
+            assert model.ainvoke.await_count == 1
+
+            state = await agent.app.aget_state({"configurable": {"thread_id": "t2"}})
+            assert [m.content for m in state.values["messages"]] == ["  hi! ", "Hello there."]
+
+            # A thread with history never joins another thread's run
+            await asyncio.gather(agent.chat("Hi!", "t1"), agent.chat("Hi!", "t3"))
+            assert model.ainvoke.await_count == 3
+        finally:
+            await agent.cleanup()
+
+@pytest.mark.asyncio
+async def test_agent_never_coalesces_tool_capable_turns(tmp_path):
+    """With tools bound, only turns the router sends to the tool-free fast model are shared."""
+    from agent import ChatbotAgent
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        agent.response_cache = None
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+
+        async def slow_answer(*args, **kwargs):
+            await asyncio.sleep(0.05)
+            return AIMessage(content="Sent.")
+
+        model = MagicMock()
+        model.ainvoke = AsyncMock(side_effect=slow_answer)
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        agent.tools = [MagicMock()]
+        agent.tools[0].name = "send_twilio_sms"
+        try:
+            message = "Text +15550000000 that I'm running late"
+            await asyncio.gather(agent.chat(message, "t1"), agent.chat(message, "t2"))
+            assert model.ainvoke.await_count == 2
+            assert agent.single_flight.stats == {"leaders": 0, "followers": 0}
+
+            # With a router, short greetings go to the tool-free fast model and may be shared
+            from utils.model_router import ModelRouter
+            agent.router = ModelRouter(agent.tools)
+            assert agent._can_coalesce("Hi!")
+            assert not agent._can_coalesce("Send an sms to +15550000000")
+        finally:
+            await agent.cleanup()
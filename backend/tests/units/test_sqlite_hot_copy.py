@@ -0,0 +1,132 @@
+import pytest
+import shutil
+import sqlite3
+from unittest.mock import patch
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.sqlite_hot_copy import SqliteHotCopy, backup_database
+
+def _make_db(path, rows):
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS t (v TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(r,) for r in rows])
+
+def _rows(path):
+    with sqlite3.connect(path) as conn:
+        return [r[0] for r in conn.execute("SELECT v FROM t ORDER BY v")]
+
+def test_backup_of_live_wal_database(tmp_path):
+    """Backups are consistent while the source still has an open WAL connection."""
+    source, target = str(tmp_path / "live.sqlite"), str(tmp_path / "copy.sqlite")
+    _make_db(source, ["a"])
+    live = sqlite3.connect(source)
+    try:
+        live.execute("INSERT INTO t VALUES ('b')")
+        live.commit()
+        backup_database(source, target)
+    finally:
+        live.close()
+
+    assert _rows(target) == ["a", "b"]
+    assert not os.path.exists(target + "-wal")
+
+def test_restore_keeps_newer_local_files(tmp_path):
+    """Restore copies persisted databases but keeps newer local ones."""
+    persistent, local = tmp_path / "home", tmp_path / "tmp"
+    persistent.mkdir()
+    local.mkdir()
+    _make_db(str(persistent / "chat_history.sqlite"), ["persisted"])
+    _make_db(str(persistent / "tool_cache.sqlite"), ["persisted"])
+    _make_db(str(local / "tool_cache.sqlite"), ["local"])
+
+    hot_copy = SqliteHotCopy(str(persistent), str(local))
+    hot_copy.restore()
+
+    assert _rows(str(local / "chat_history.sqlite")) == ["persisted"]
+    assert _rows(str(local / "tool_cache.sqlite")) == ["local"]
+    assert hot_copy.stats["restored"] == 1
+
+def test_backup_removes_stale_wal_of_target(tmp_path):
+    """A -wal/-shm left next to the target by an earlier process is never applied to the new copy."""
+    source, target = str(tmp_path / "live.sqlite"), str(tmp_path / "copy.sqlite")
+    _make_db(source, ["fresh"])
+    _make_db(target, ["old"])
+    stale = sqlite3.connect(target)
+    try:
+        stale.execute("INSERT INTO t VALUES ('stale')")
+        stale.commit()
+        shutil.copy(target + "-wal", str(tmp_path / "saved-wal"))
+        shutil.copy(target + "-shm", str(tmp_path / "saved-shm"))
+    finally:
+        stale.close()
+    shutil.copy(str(tmp_path / "saved-wal"), target + "-wal")
+    shutil.copy(str(tmp_path / "saved-shm"), target + "-shm")
+
+    backup_database(source, target)
+
+    assert not os.path.exists(target + "-wal")
+    assert not os.path.exists(target + "-shm")
+    with sqlite3.connect(target) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        assert [r[0] for r in conn.execute("SELECT v FROM t")] == ["fresh"]
+
+def test_restore_replaces_older_local_files(tmp_path):
+    """A local file older than its persisted backup (e.g. left by an earlier run) is replaced."""
+    persistent, local = tmp_path / "home", tmp_path / "tmp"
+    persistent.mkdir()
+    local.mkdir()
+    _make_db(str(local / "chat_history.sqlite"), ["stale"])
+    _make_db(str(persistent / "chat_history.sqlite"), ["persisted"])
+    past = os.path.getmtime(str(persistent / "chat_history.sqlite")) - 60
+    os.utime(str(local / "chat_history.sqlite"), (past, past))
+
+    hot_copy = SqliteHotCopy(str(persistent), str(local))
+    hot_copy.restore()
+
+    assert _rows(str(local / "chat_history.sqlite")) == ["persisted"]
+    assert hot_copy.stats["restored"] == 1
+
+@pytest.mark.asyncio
+async def test_periodic_and_final_backup(tmp_path):
+    """aclose stops the periodic task and writes every local database back."""
+    persistent, local = tmp_path / "home", tmp_path / "tmp"
+    local.mkdir()
+    _make_db(str(local / "chat_history.shard-00.sqlite"), ["a"])
+    _make_db(str(local / "chat_history.shard-01.sqlite"), ["b"])
+
+    hot_copy = SqliteHotCopy(str(persistent), str(local), interval=3600)
+    hot_copy.start()
+    await hot_copy.aclose()
+
+    assert _rows(str(persistent / "chat_history.shard-00.sqlite")) == ["a"]
+    assert _rows(str(persistent / "chat_history.shard-01.sqlite")) == ["b"]
+    assert hot_copy.stats["backups"] == 1
+
+def test_agent_uses_local_data_dir(tmp_path):
+    """With SQLITE_HOT_COPY the agent keeps its databases in the local directory."""
+    from agent import ChatbotAgent
+    with patch("agent.SQLITE_HOT_COPY", True), patch("agent.SQLITE_HOT_COPY_DIR", str(tmp_path)):
+        agent = ChatbotAgent()
+    assert agent.db_path == os.path.join(str(tmp_path), "chat_history.sqlite")
+    assert agent.hot_copy.local_dir == str(tmp_path)
+
+@pytest.mark.asyncio
+async def test_agent_backs_up_on_cleanup(tmp_path):
+    """The agent starts the backup task with its storage and takes a final backup on cleanup."""
+    from agent import ChatbotAgent
+    persistent, local = tmp_path / "home", tmp_path / "tmp"
+    local.mkdir()
+    agent = ChatbotAgent()
+    agent.hot_copy = SqliteHotCopy(str(persistent), str(local), interval=3600)
+    agent.db_path = str(local / "chat_history.sqlite")
+
+    await agent._init_memory()
+    assert agent.hot_copy._task is not None
+    await agent.cleanup()
+
+    assert os.path.exists(persistent / "chat_history.sqlite")
@@ -0,0 +1,112 @@
+import pytest
+import io
+import json
+import logging
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+import utils.tracing as tracing
+from utils.structured_logging import (
+    ContextQueueHandler,
+    SamplingFilter,
+    configure_logging,
+    conversation_id,
+    parse_sampling,
+    request_id,
+)
+
+@pytest.fixture
+def json_logs():
+    """Route the root logger to an in-memory JSON stream; restore the app's setup after."""
+    stream = io.StringIO()
+    root = logging.getLogger()
+    previous_handlers, previous_level = list(root.handlers), root.level
+    _, listener = configure_logging(level="INFO", fmt="json", sampling="noisy=0", rate_limit=0, stream=stream)
+
+    def read():
+        listener.stop()
+        listener.start()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    configure_logging()
+    # Put back pytest's capture handlers; the app's queue handler was replaced above
+    for handler in previous_handlers:
+        if not isinstance(handler, ContextQueueHandler):
+            root.addHandler(handler)
+    root.setLevel(previous_level)
+
+def test_parse_sampling():
+    assert parse_sampling("app_state=0.2, utils.image_providers=1.5") == {"app_state": 0.2, "utils.image_providers": 1.0}
+    assert parse_sampling("") == {}
+    with pytest.raises(ValueError):
+        parse_sampling("app_state=often")
+
+def test_json_records_carry_correlation_ids(json_logs):
+    previous = tracing.tracer
+    tracing.configure_tracing("test", exporter=MagicMock(), sample_rate=1.0, enabled=True)
+    request_token = request_id.set("req-1")
+    thread_token = conversation_id.set("whatsapp:+1555")
+    try:
+        with tracing.span("turn") as turn:
+            logging.getLogger("app_state").info("Reply sent to %s", "+1555", extra={"chars": 12})
+        logging.getLogger("noisy.child").info("dropped by sampling")
+        logging.getLogger("noisy").warning("warnings always pass")
+        try:
+            raise ValueError("bad")
+        except ValueError:
+            logging.getLogger("app_state").exception("Failed")
+    finally:
+        request_id.reset(request_token)
+        conversation_id.reset(thread_token)
+        tracing.tracer = previous
+
+    records = json_logs()
+    assert [r["message"] for r in records] == ["Reply sent to +1555", "warnings always pass", "Failed"]
+    first = records[0]
+    assert first["logger"] == "app_state" and first["level"] == "INFO"
+    assert (first["request_id"], first["thread_id"], first["chars"]) == ("req-1", "whatsapp:+1555", 12)
+    assert (first["trace_id"], first["span_id"]) == (turn.trace_id, turn.span_id)
+    assert "ValueError: bad" in records[2]["exception"]
+
+def test_rate_limit_reports_suppressed():
+    rate_filter = SamplingFilter(rate_limit=1)
+    records = [logging.LogRecord("hot", logging.INFO, "", 0, "fetch", (), None) for _ in range(5)]
+    assert [rate_filter.filter(r) for r in records] == [True, True, False, False, False]
+
+    error = logging.LogRecord("hot", logging.ERROR, "", 0, "boom", (), None)
+    assert rate_filter.filter(error)
+
+    with patch("utils.structured_logging.time.monotonic", return_value=1e12):
+        later = logging.LogRecord("hot", logging.INFO, "", 0, "fetch", (), None)
+        assert rate_filter.filter(later)
+    assert later.suppressed == 3
+
+def test_sampling_counts_are_exact_across_threads():
+    """Every record is either let through or counted as suppressed, whichever thread logs it."""
+    import threading
+    sampling_filter = SamplingFilter({"hot": 0.5}, rate_limit=0)
+    passed, reported = [], []
+
+    def emit():
+        for _ in range(2000):
+            record = logging.LogRecord("hot", logging.INFO, "", 0, "fetch", (), None)
+            if sampling_filter.filter(record):
+                passed.append(1)
+                reported.append(getattr(record, "suppressed", 0))
+
+    threads = [threading.Thread(target=emit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(passed) + sum(reported) + sampling_filter._suppressed.get("hot", 0) == 8 * 2000
+
+def test_request_id_header(client):
+    response = client.get("/health", headers={"X-Request-ID": "abc123"})
+    assert response.headers["X-Request-ID"] == "abc123"
+    assert client.get("/health").headers["X-Request-ID"]
@@ -0,0 +1,173 @@
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+# Add src to path
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.tool_cache import ToolCachePolicy, ToolResultCache, DEFAULT_TOOL_POLICIES
+
+@pytest.mark.asyncio
+async def test_cacheable_tool_is_memoised():
+    """Repeated calls with the same key fields hit the cache."""
+    cache = ToolResultCache(policies={"generate_image": ToolCachePolicy(cacheable=True, ttl_seconds=60, key_fields=["prompt"])})
+    call = AsyncMock(return_value="![Generated Image](/static/generated_images/a.jpg)")
+
+    first = await cache.run("generate_image", {"prompt": "a cat"}, call)
+    second = await cache.run("generate_image", {"prompt": "a cat"}, call)
+
+    assert first == second
+    call.assert_awaited_once()
+    assert cache.stats["hits"] == 1
+    assert cache.stats["misses"] == 1
+
+@pytest.mark.asyncio
+async def test_cache_entry_expires():
+    """Entries older than the TTL are executed again."""
+    cache = ToolResultCache(policies={"tool": ToolCachePolicy(cacheable=True, ttl_seconds=10)})
+    call = AsyncMock(return_value="result")
+
+    with patch("utils.tool_cache.time.time", return_value=1000):
+        await cache.run("tool", {"a": "1"}, call)
+    with patch("utils.tool_cache.time.time", return_value=1011):
+        await cache.run("tool", {"a": "1"}, call)
+
+    assert call.await_count == 2
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """Error strings returned by tools are never remembered."""
+    cache = ToolResultCache(policies={"tool": ToolCachePolicy(cacheable=True, ttl_seconds=60)})
+    call = AsyncMock(return_value="Error: upstream failed")
+
+    await cache.run("tool", {}, call)
+    await cache.run("tool", {}, call)
+
+    assert call.await_count == 2
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded():
+    """The least recently used entry is evicted once the bound is reached."""
+    cache = ToolResultCache(policies={"tool": ToolCachePolicy(cacheable=True, ttl_seconds=60)}, max_entries=2)
+    for arg in ["a", "b", "c"]:
+        await cache.run("tool", {"x": arg}, AsyncMock(return_value=arg))
+
+    assert len(cache._entries) == 2
+    call = AsyncMock(return_value="a")
+    await cache.run("tool", {"x": "a"}, call)
+    call.assert_awaited_once()
+
+@pytest.mark.asyncio
+async def test_uncached_tool_always_executes():
+    """Tools without a policy pass straight through."""
+    cache = ToolResultCache(policies={})
+    call = AsyncMock(return_value="ok")
+    await cache.run("other", {}, call)
+    await cache.run("other", {}, call)
+    assert call.await_count == 2
+
+@pytest.mark.asyncio
+async def test_side_effect_tool_suppresses_retries():
+    """A retry of the same SMS tool call is sent only once."""
+    cache = ToolResultCache()
+    call = AsyncMock(return_value="Twilio SMS sent successfully. SID: SM1")
+    args = {"to_number": "+1", "message_body": "hi"}
+
+    await cache.run("send_twilio_sms", args, call, call_id="call_1")
+    result = await cache.run("send_twilio_sms", args, call, call_id="call_1")
+
+    call.assert_awaited_once()
+    assert "SM1" in result
+    assert cache.stats["duplicates_suppressed"] == 1
+
+@pytest.mark.asyncio
+async def test_side_effect_tool_sends_deliberate_repeats():
+    """A new tool call with the same recipient and body is a deliberate resend."""
+    cache = ToolResultCache()
+    call = AsyncMock(return_value="Twilio SMS sent successfully.")
+    args = {"to_number": "+1", "message_body": "hi"}
+
+    await cache.run("send_twilio_sms", args, call, call_id="call_1")
+    await cache.run("send_twilio_sms", args, call, call_id="call_2")
+    await cache.run("send_twilio_sms", args, call)
+    await cache.run("send_twilio_sms", args, call)
+
+    assert call.await_count == 4
+    assert cache.stats["duplicates_suppressed"] == 0
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_execution():
+    """In-flight calls with the same key are joined rather than re-executed."""
+    cache = ToolResultCache()
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = 0
+
+    async def slow_send():
+        nonlocal calls
+        calls += 1
+        started.set()
+        await release.wait()
+        return "WhatsApp message sent successfully."
+
+    args = {"to_number": "+1", "message_body": "hi"}
+    first = asyncio.create_task(cache.run("send_whatsapp_message", args, slow_send, call_id="call_1"))
+    await started.wait()
+    second = asyncio.create_task(cache.run("send_whatsapp_message", args, slow_send, call_id="call_1"))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await first == await second
+    assert calls == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    """A joined caller re-runs the tool when the caller it was waiting on is cancelled."""
+    cache = ToolResultCache(policies={"generate_image": ToolCachePolicy(cacheable=True, ttl_seconds=60)})
+    started = asyncio.Event()
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            started.set()
+            await asyncio.Event().wait()
+        return "img"
+
+    args = {"prompt": "a cat"}
+    leader = asyncio.create_task(cache.run("generate_image", args, generate))
+    await started.wait()
+    follower = asyncio.create_task(cache.run("generate_image", args, generate))
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await follower == "img"
+    assert leader.cancelled()
+    assert calls == 2
+
+@pytest.mark.asyncio
+async def test_sqlite_persistence(tmp_path):
+    """Results survive a new cache instance when persistence is enabled."""
+    db_path = str(tmp_path / "tool_cache.sqlite")
+    policies = {"generate_image": ToolCachePolicy(cacheable=True, ttl_seconds=60, key_fields=["prompt"])}
+    await ToolResultCache(policies=policies, db_path=db_path).run("generate_image", {"prompt": "a dog"}, AsyncMock(return_value="img"))
+
+    call = AsyncMock(return_value="other")
+    result = await ToolResultCache(policies=policies, db_path=db_path).run("generate_image", {"prompt": "a dog"}, call)
+
+    assert result == "img"
+    call.assert_not_awaited()
+
+def test_policy_rejects_cacheable_side_effect():
+    """Side-effecting tools cannot be declared cacheable."""
+    with pytest.raises(ValueError):
+        ToolCachePolicy(cacheable=True, side_effect=True)
+
+def test_default_policies():
+    """Image generation is cached; message sends are idempotency-protected."""
+    assert DEFAULT_TOOL_POLICIES["generate_image"].cacheable
+    assert DEFAULT_TOOL_POLICIES["send_twilio_sms"].side_effect
+    assert not DEFAULT_TOOL_POLICIES["send_whatsapp_message"].cacheable
@@ -0,0 +1,103 @@
+import pytest
+import json
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+import utils.tracing as tracing
+from utils.tracing import JsonlSpanExporter, STATUS_ERROR, configure_tracing, current_traceparent, parse_traceparent, span
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, record):
+        self.spans.append(record)
+
+@pytest.fixture
+def exporter():
+    previous = tracing.tracer
+    memory = MemoryExporter()
+    configure_tracing("test", exporter=memory, sample_rate=1.0, enabled=True)
+    yield memory
+    tracing.tracer = previous
+
+def test_nested_spans_share_trace(exporter):
+    with span("outer", route="fast") as outer:
+        with span("inner") as inner:
+            assert current_traceparent() == f"00-{outer.trace_id}-{inner.span_id}-01"
+        with pytest.raises(RuntimeError):
+            with span("failing"):
+                raise RuntimeError("boom")
+    assert current_traceparent() is None
+
+    inner_record, failing_record, outer_record = exporter.spans
+    assert inner_record["traceId"] == outer_record["traceId"] == failing_record["traceId"]
+    assert inner_record["parentSpanId"] == outer_record["spanId"]
+    assert outer_record["parentSpanId"] == ""
+    assert outer_record["attributes"] == [{"key": "route", "value": {"stringValue": "fast"}}]
+    assert failing_record["status"] == {"code": STATUS_ERROR, "message": "RuntimeError: boom"}
+    assert outer_record["resource"] == {"service.name": "test"}
+
+def test_remote_parent_and_sampling(exporter):
+    """A root span continues an incoming trace and keeps its sampling decision."""
+    header = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+    with span("handler", traceparent=header):
+        pass
+    assert exporter.spans[0]["traceId"] == "a" * 32
+    assert exporter.spans[0]["parentSpanId"] == "b" * 16
+
+    with span("unsampled", traceparent=header[:-2] + "00"):
+        # Still propagated, so the next process also skips it
+        assert current_traceparent().endswith("-00")
+    assert len(exporter.spans) == 1
+
+    tracing.tracer.sample_rate = 0.0
+    with span("dropped"):
+        pass
+    assert len(exporter.spans) == 1
+
+def test_parse_traceparent():
+    assert parse_traceparent("00-" + "1" * 32 + "-" + "2" * 16 + "-01") == ("1" * 32, "2" * 16, True)
+    assert parse_traceparent(None) is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent("00-" + "1" * 32 + "-" + "2" * 16 + "-zz") is None
+
+def test_disabled_tracer_is_noop():
+    previous = tracing.tracer
+    try:
+        configure_tracing("test", exporter=MemoryExporter(), enabled=False)
+        with span("ignored") as s:
+            s.set_attribute("key", "value")
+            assert current_traceparent() is None
+        assert tracing.tracer.exporter.spans == []
+    finally:
+        tracing.tracer = previous
+
+def test_jsonl_exporter_rotates(tmp_path):
+    path = str(tmp_path / "spans.jsonl")
+    exporter = JsonlSpanExporter(path, max_bytes=200, backups=2)
+    for i in range(10):
+        exporter.export({"name": f"span-{i}", "padding": "x" * 50})
+    exporter.shutdown()
+
+    assert os.path.exists(path + ".1")
+    lines = open(path).read().splitlines()
+    assert json.loads(lines[-1])["name"] == "span-9"
+
+@pytest.mark.asyncio
+async def test_tool_call_carries_traceparent(exporter):
+    """MCP tool calls send the active span's traceparent in the request _meta."""
+    from utils.mcp_client import MCPClient
+    client = MCPClient("python", [])
+    client.session = MagicMock()
+    client.session.call_tool = AsyncMock(return_value=MagicMock(isError=False, content=[MagicMock(text="sent")]))
+
+    with span("agent.turn") as turn:
+        await client._call_tool("send_twilio_sms", {"to_number": "+1"})
+    meta = client.session.call_tool.call_args.kwargs["meta"]
+    parsed = parse_traceparent(meta["traceparent"])
+    assert parsed[0] == turn.trace_id and parsed[1] == turn.span_id
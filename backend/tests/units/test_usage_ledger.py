@@ -0,0 +1,114 @@
+import pytest
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock, patch
+from langchain_core.messages import AIMessage
+
+# Add src to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + "/src")
+
+from utils.usage_ledger import (
+    BUDGET_DOWNGRADE,
+    BUDGET_EXCEEDED_MESSAGE,
+    BUDGET_OK,
+    BUDGET_REFUSE,
+    UsageLedger,
+    request_channel,
+    usage_tokens,
+)
+
+def test_usage_tokens():
+    assert usage_tokens(AIMessage(content="x", usage_metadata={"input_tokens": 5, "output_tokens": 2, "total_tokens": 7})) == (5, 2)
+    assert usage_tokens(AIMessage(content="x")) == (0, 0)
+
+@pytest.mark.asyncio
+async def test_batches_and_aggregates(tmp_path):
+    """Calls are summed in memory and written as one row per thread/channel/route."""
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite"))
+    ledger.record("alice", "web", "primary", 100, 20)
+    ledger.record("alice", "web", "primary", 50, 10)
+    ledger.record("alice", "web", "fast", 10, 5)
+    ledger.record("bob", "twilio", "primary", 30, 3)
+
+    assert await ledger.flush() == 3
+    assert await ledger.flush() == 0
+
+    top = await ledger.top_threads()
+    assert [(row["thread_id"], row["calls"], row["total_tokens"]) for row in top] == [("alice", 3, 195), ("bob", 1, 33)]
+    by_channel = {row["channel"]: row["input_tokens"] for row in await ledger.totals("channel")}
+    assert by_channel == {"twilio": 30, "web": 160}
+    with pytest.raises(ValueError):
+        await ledger.totals("thread_id; DROP TABLE token_usage")
+
+    # Later calls add to the persisted rows
+    ledger.record("alice", "web", "primary", 1, 1)
+    await ledger.aclose()
+    assert (await ledger.top_threads())[0]["total_tokens"] == 197
+
+@pytest.mark.asyncio
+async def test_budget(tmp_path):
+    """Threads near the budget are downgraded, threads over it refused; totals survive a restart."""
+    db = str(tmp_path / "usage.sqlite")
+    ledger = UsageLedger(db, daily_budget=1000, downgrade_ratio=0.8)
+    assert await ledger.check_budget("t1") == BUDGET_OK
+    ledger.record("t1", "web", "primary", 700, 100)
+    assert await ledger.check_budget("t1") == BUDGET_DOWNGRADE
+    ledger.record("t1", "web", "fast", 150, 50)
+    assert await ledger.check_budget("t1") == BUDGET_REFUSE
+    await ledger.aclose()
+
+    restarted = UsageLedger(db, daily_budget=1000)
+    assert await restarted.check_budget("t1") == BUDGET_REFUSE
+    assert await restarted.check_budget("t2") == BUDGET_OK
+    assert UsageLedger(db, daily_budget=0).daily_budget == 0
+    assert await UsageLedger(db, daily_budget=0).check_budget("t1") == BUDGET_OK
+
+@pytest.mark.asyncio
+async def test_agent_records_usage_and_enforces_budget(tmp_path):
+    """Model calls are recorded per thread and channel; an exhausted thread is refused without a model call."""
+    from agent import ChatbotAgent
+    model = MagicMock()
+    model.ainvoke = AsyncMock(return_value=AIMessage(content="Hello!", usage_metadata={"input_tokens": 400, "output_tokens": 100, "total_tokens": 500}))
+    with patch("agent.CHECKPOINT_WRITE_BEHIND", False):
+        agent = ChatbotAgent()
+        agent.faq_matcher = None
+        agent.response_cache = None
+        agent.single_flight = None
+        agent.data_dir = str(tmp_path)
+        agent.db_path = str(tmp_path / "chat_history.sqlite")
+        agent.mcp_client = AsyncMock()
+        agent.mcp_client.get_tools.return_value = []
+        with patch("agent.ModelFactory.get_model", return_value=model):
+            await agent.initialize()
+        agent.usage.daily_budget = 1000
+        try:
+            request_channel.set("twilio")
+            assert await agent.chat("hi", "t1") == "Hello!"
+            assert await agent.chat("hi again", "t1") == "Hello!"
+            assert await agent.chat("still there?", "t1") == BUDGET_EXCEEDED_MESSAGE
+            assert model.ainvoke.await_count == 2
+
+            totals = await agent.usage.totals("channel")
+            assert totals == [{"channel": "twilio", "calls": 2, "input_tokens": 800, "output_tokens": 200}]
+        finally:
+            request_channel.set("unknown")
+            await agent.cleanup()
+
+def test_admin_usage_endpoints(client, mock_chatbot, tmp_path):
+    """Usage reports are served behind the admin token."""
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite"))
+    ledger.record("alice", "web", "primary", 100, 20)
+    ledger.record("bob", "twilio", "primary", 30, 3)
+    headers = {"X-Admin-Token": "secret"}
+    with patch("routes.system_routes.ADMIN_API_TOKEN", "secret"), \
+         patch.object(mock_chatbot.agent, "usage", ledger):
+        assert client.get("/admin/usage/threads").status_code == 403
+
+        top = client.get("/admin/usage/threads?limit=1", headers=headers).json()
+        assert [(row["thread_id"], row["total_tokens"]) for row in top] == [("alice", 120)]
+        by_channel = client.get("/admin/usage/totals?group_by=channel", headers=headers).json()
+        assert {row["channel"]: row["calls"] for row in by_channel} == {"twilio": 1, "web": 1}
+        assert client.get("/admin/usage/totals?group_by=thread_id", headers=headers).status_code == 400
+
+        with patch.object(mock_chatbot.agent, "usage", None):
+            assert client.get("/admin/usage/totals", headers=headers).status_code == 404